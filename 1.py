@@ -1,10 +1,14 @@
-import requests
+import os
 import pandas as pd
+from http_cache import PRICE_TTL, cached_get_json
+
+# CoinGecko API base URL (override to point at a mock server)
+COINGECKO_API = os.environ.get('COINGECKO_API', 'https://api.coingecko.com/api/v3')
 
 def get_bitcoin_ethereum_data():
     try:
         # Define the API endpoint
-        url = 'https://api.coingecko.com/api/v3/simple/price'
+        url = f'{COINGECKO_API}/simple/price'
         
         # Define the parameters
         params = {
@@ -14,9 +18,8 @@ def get_bitcoin_ethereum_data():
             'include_24hr_vol': 'true'
         }
         
-        # Make the API request
-        response = requests.get(url, params=params)
-        data = response.json()
+        # Make the API request (served from the local cache when fresh)
+        data = cached_get_json(url, params=params, ttl=PRICE_TTL)
         
         # Print the full API response to check the structure
         print("Full API response:")
@@ -1,28 +1,24 @@
-import requests
 import pandas as pd
+from blockcypher import get_transaction_data, iter_address_transactions
+from utxo_engine import UtxoEngine
 
 def get_blockchain_data(address):
-    # Define the API endpoint
-    url = f'https://api.blockcypher.com/v1/btc/main/addrs/{address}/full'
-
     try:
-        # Make the API request
-        response = requests.get(url)
-        data = response.json()
+        # Make the API request (served from the local archive/cache when fresh)
+        data = get_transaction_data(address)
 
         # Check if there's an error in the response
         if 'error' in data:
             print(f"Error: {data['error']}")
             return None
 
-        # Extract relevant information
-        balance = data['final_balance'] / 1e8  # Convert satoshis to BTC
-        tx_count = data['n_tx']
-        transactions = data['txs']
+        history = {}
+        transactions = iter_address_transactions(address, summary=history, first_page=data)  # Follows paging
+        engine = UtxoEngine()  # Balances are computed locally from the ingested history
 
-        # Create a DataFrame for recent transactions
+        # Create a DataFrame for the address's transactions
         tx_data = []
-        for tx in transactions:
+        for tx in engine.ingesting(transactions):
             tx_info = {
                 'hash': tx['hash'],
                 'block_height': tx['block_height'],
@@ -34,12 +30,24 @@ def get_blockchain_data(address):
 
         # Create a DataFrame from transaction data
         tx_df = pd.DataFrame(tx_data)
+        if 'error' in history:
+            print(f"Error: {history['error']} (history is incomplete)")
+
+        # Extract relevant information
+        local = engine.balances([address]).get(address, {'balance': 0, 'n_tx': 0})
+        engine.close()
+        if 'error' in history or history.get('truncated'):
+            # Transactions are missing or incomplete, so the local figures would be wrong
+            print(f"Note: using the API's balance for {address}; its local history is incomplete")
+            local = {'balance': data['final_balance'], 'n_tx': data['n_tx']}
+        balance = local['balance'] / 1e8  # Convert satoshis to BTC
+        tx_count = local['n_tx']
 
         # Display the results
         print(f"Address: {address}")
         print(f"Balance: {balance} BTC")
         print(f"Transaction Count: {tx_count}")
-        print("\nRecent Transactions:")
+        print("\nTransactions:")
         print(tx_df)
 
     except Exception as e:
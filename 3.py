@@ -1,30 +1,29 @@
-import requests
 import pandas as pd
 import networkx as nx
 import matplotlib.pyplot as plt
+from blockcypher import fetch_addresses, iter_address_transactions
+from utxo_engine import UtxoEngine
+from entity_clusters import AddressClusters
 
-def get_transaction_data(address):
-    url = f'https://api.blockcypher.com/v1/btc/main/addrs/{address}/full'
-    response = requests.get(url)
-    return response.json()
-
-def analyze_addresses(addresses):
+def analyze_addresses(addresses, collapse_entities=True):
     G = nx.DiGraph()  # Create a directed graph
     address_data = []
+    fetched = fetch_addresses(addresses)  # Fetch all addresses concurrently
+    engine = UtxoEngine()  # Balances are computed locally from the ingested history
+    clusters = AddressClusters()  # Addresses spent together are grouped into entities
 
     for address in addresses:
-        data = get_transaction_data(address)
+        data = fetched[address]
         if 'error' in data:
             print(f"Error fetching data for {address}: {data['error']}")
             continue
 
         # Create nodes for the address and its transactions
-        balance = data['final_balance'] / 1e8  # Convert from satoshis to BTC
-        tx_count = data['n_tx']
-        address_data.append((address, balance, tx_count))
-
-        for tx in data['txs']:
+        history = {}
+        transactions = iter_address_transactions(address, summary=history, first_page=data)  # Streams every page
+        for tx in engine.ingesting(transactions):
             tx_hash = tx['hash']
+            clusters.add_transaction(tx)
             G.add_node(address)  # Add the address as a node
             G.add_node(tx_hash)  # Add the transaction as a node
             G.add_edge(address, tx_hash)  # Create an edge from the address to the transaction
@@ -37,6 +36,28 @@ def analyze_addresses(addresses):
                         G.add_node(recipient)
                         G.add_edge(tx_hash, recipient)  # Create an edge from the transaction to the recipient
 
+        if 'error' in history:
+            print(f"Error fetching history for {address}: {history['error']} (graph is incomplete)")
+
+        local = engine.balances([address]).get(address, {'balance': 0, 'n_tx': 0})
+        if 'error' in history or history.get('truncated'):
+            # Transactions are missing or incomplete, so the local figures would be wrong
+            print(f"Note: using the API's balance for {address}; its local history is incomplete")
+            local = {'balance': data['final_balance'], 'n_tx': data['n_tx']}
+        elif local['balance'] != data['final_balance']:
+            print(f"Note: local balance for {address} differs from the API ({data['final_balance']} satoshis)")
+        balance = local['balance'] / 1e8  # Convert from satoshis to BTC
+        tx_count = local['n_tx']
+        address_data.append((address, balance, tx_count))
+
+    engine.close()
+
+    if collapse_entities:
+        # Merge the nodes of addresses that belong to one entity
+        summary = clusters.summary()
+        print(f"Entities: {summary['clusters']} from {summary['addresses']} addresses "
+              f"({summary['multi_address_clusters']} multi-address, {summary['skipped_coinjoins']} CoinJoins skipped)")
+        G = nx.relabel_nodes(G, clusters.label_mapping(), copy=True)
     return G, address_data
 
 def plot_graph(G):
@@ -1,20 +1,17 @@
-import requests
-
-def get_transaction_data(address):
-    url = f'https://api.blockcypher.com/v1/btc/main/addrs/{address}/full'
-    response = requests.get(url)
-    return response.json()
+from blockcypher import fetch_addresses, iter_address_transactions
 
 def monitor_transactions(addresses, threshold_amount=0.5):
     suspicious_transactions = []
+    fetched = fetch_addresses(addresses)  # Fetch all addresses concurrently
 
     for address in addresses:
-        data = get_transaction_data(address)
+        data = fetched[address]
         if 'error' in data:
             print(f"Error fetching data for {address}: {data['error']}")
             continue
 
-        for tx in data['txs']:
+        history = {}
+        for tx in iter_address_transactions(address, summary=history, first_page=data):  # Streams every page
             tx_hash = tx['hash']
             total_amount = tx['total'] / 1e8  # Convert from satoshis to BTC
             fee_amount = tx['fee'] / 1e8 if 'fee' in tx else 0  # Handle fee if present
@@ -29,6 +26,9 @@ def monitor_transactions(addresses, threshold_amount=0.5):
                     'time': tx['received']
                 })
 
+        if 'error' in history:
+            print(f"Error fetching history for {address}: {history['error']} (results are incomplete)")
+
     return suspicious_transactions
 
 def display_suspicious_transactions(suspicious_transactions):
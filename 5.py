@@ -1,58 +1,50 @@
-import pandas as pd
-from datetime import datetime
+import report_store
+from report_store import format_report_id, parse_report_id
 
-# File path for storing reports
-REPORTS_FILE = 'reports.csv'
-
-# Initialize the reports DataFrame if it doesn't exist
-try:
-    reports_df = pd.read_csv(REPORTS_FILE)
-except FileNotFoundError:
-    reports_df = pd.DataFrame(columns=['report_id', 'address', 'tx_hash', 'total_amount', 'reported_by', 'notes', 'timestamp'])
-
-def generate_report_id():
-    return f"RPT-{len(reports_df) + 1:04d}"
+# Reports are kept in the reports table of blockchain_data.db
+conn = report_store.connect()
+report_store.import_legacy_reports(conn)
 
 def submit_report(address, tx_hash, total_amount, reported_by, notes=""):
-    report_id = generate_report_id()
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    new_report = pd.DataFrame([{
-        'report_id': report_id,
-        'address': address,
-        'tx_hash': tx_hash,
-        'total_amount': total_amount,
-        'reported_by': reported_by,
-        'notes': notes,
-        'timestamp': timestamp
-    }])
-    
-    global reports_df
-    reports_df = pd.concat([reports_df, new_report], ignore_index=True)
-    reports_df.to_csv(REPORTS_FILE, index=False)
+    report_id = report_store.submit_report(conn, address, tx_hash, total_amount, reported_by, notes)
     
-    print(f"Report submitted successfully! Report ID: {report_id}")
+    print(f"Report submitted successfully! Report ID: {format_report_id(report_id)}")
 
 def view_reports():
+    reports_df = report_store.list_reports(conn)
     if reports_df.empty:
         print("No reports available.")
         return
     
+    reports_df['report_id'] = reports_df['report_id'].map(format_report_id)
     print(reports_df[['report_id', 'address', 'tx_hash', 'total_amount', 'reported_by', 'timestamp']])
 
 def add_note_to_report(report_id, note, added_by):
-    global reports_df
-    if report_id not in reports_df['report_id'].values:
+    numeric_id = parse_report_id(report_id)
+    if numeric_id is None or not report_store.add_note(conn, numeric_id, note, added_by):
         print(f"Report ID {report_id} not found.")
         return
     
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    note_entry = f"{added_by} ({timestamp}): {note}"
+    print(f"Note added to Report ID {report_id}.")
+
+def find_reports(tx_hash=None, address=None, reported_by=None):
+    reports = report_store.find_reports(conn, tx_hash=tx_hash, address=address, reported_by=reported_by)
+    if not reports:
+        print("No matching reports found.")
+        return
     
-    reports_df.loc[reports_df['report_id'] == report_id, 'notes'] += f"\n{note_entry}"
-    reports_df.to_csv(REPORTS_FILE, index=False)
+    for report in reports:
+        print(f"{format_report_id(report['report_id'])}: {report['address']} {report['tx_hash']} "
+              f"{report['total_amount']} BTC, reported by {report['reported_by']} at {report['timestamp']}")
+
+def search_notes(query):
+    notes = report_store.search_notes(conn, query)
+    if not notes:
+        print("No matching notes found.")
+        return
     
-    print(f"Note added to Report ID {report_id}.")
+    for note in notes:
+        print(f"{format_report_id(note['report_id'])} - {note['added_by']} ({note['timestamp']}): {note['snippet']}")
 
 def main():
     while True:
@@ -60,7 +52,9 @@ def main():
         print("1. Submit a Report")
         print("2. View All Reports")
         print("3. Add Note to a Report")
-        print("4. Exit")
+        print("4. Find Reports")
+        print("5. Search Notes")
+        print("6. Exit")
         
         choice = input("Select an option: ").strip()
         
@@ -84,6 +78,18 @@ def main():
             add_note_to_report(report_id, note, added_by)
         
         elif choice == '4':
+            tx_hash = input("Transaction Hash (optional): ").strip()
+            address = input("Bitcoin Address (optional): ").strip()
+            reported_by = input("Reported By (optional): ").strip()
+            
+            find_reports(tx_hash, address, reported_by)
+        
+        elif choice == '5':
+            query = input("Enter keywords to search for: ").strip()
+            
+            search_notes(query)
+        
+        elif choice == '6':
             print("Exiting...")
             break
         
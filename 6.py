@@ -1,13 +1,16 @@
-from cryptography.fernet import Fernet
-import bcrypt
+from cryptography.fernet import Fernet, InvalidToken
 import hashlib
 import os
 import json
+import time
+from auth_service import USER_DATA_FILE, AuthService
+from record_store import RECORD_STORE_FILE, RecordStore
+import merkle
 
 # Constants for encryption and password hashing
 ENCRYPTION_KEY_FILE = 'encryption_key.key'
-USER_DATA_FILE = 'users.json'
-DATA_FILE = 'sensitive_data.json'
+DATA_FILE = 'sensitive_data.json'  # Single-blob format used before the record store
+LEGACY_RECORD_KEY = 'legacy'
 
 # Generate or load encryption key
 def load_or_generate_key():
@@ -28,82 +31,107 @@ def encrypt_data(fernet, data):
 def decrypt_data(fernet, encrypted_data):
     return fernet.decrypt(encrypted_data.encode()).decode()
 
-# Hash passwords securely
-def hash_password(password):
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode(), salt)
-    return hashed.decode()
+# User store (kept in memory, reloaded when the file changes)
+_auth_service = None
 
-# Verify password
-def verify_password(stored_password, provided_password):
-    return bcrypt.checkpw(provided_password.encode(), stored_password.encode())
+def get_auth_service():
+    global _auth_service
+    if _auth_service is None:
+        _auth_service = AuthService(USER_DATA_FILE)
+    return _auth_service
 
 # Register a new user
 def register_user(username, password):
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r') as user_file:
-            users = json.load(user_file)
-    else:
-        users = {}
-
-    if username in users:
+    if not get_auth_service().register(username, password):
         print("Username already exists.")
         return False
     
-    users[username] = hash_password(password)
-    with open(USER_DATA_FILE, 'w') as user_file:
-        json.dump(users, user_file)
-    
     print(f"User {username} registered successfully.")
     return True
 
-# Authenticate user
+# Authenticate user, returning a session token (None on failure)
 def authenticate_user(username, password):
-    if not os.path.exists(USER_DATA_FILE):
+    auth = get_auth_service()
+    if not auth.has_users():
         print("No registered users.")
-        return False
-    
-    with open(USER_DATA_FILE, 'r') as user_file:
-        users = json.load(user_file)
+        return None
     
-    if username in users and verify_password(users[username], password):
+    token = auth.authenticate(username, password)
+    if token is not None:
         print(f"User {username} authenticated successfully.")
-        return True
     else:
         print("Authentication failed.")
-        return False
-
-# Save encrypted data
-def save_sensitive_data(fernet, data):
-    encrypted_data = encrypt_data(fernet, data)
-    data_hash = hashlib.sha256(data.encode()).hexdigest()
-
-    with open(DATA_FILE, 'w') as data_file:
-        json.dump({'data': encrypted_data, 'hash': data_hash}, data_file)
-    
-    print("Sensitive data saved securely.")
+    return token
+
+# Reuse the current session, logging in only when it is missing or expired
+def ensure_session(token):
+    if get_auth_service().validate_session(token) is not None:
+        return token
+    return authenticate_user(input("Enter username: ").strip(), input("Enter password: ").strip())
+
+# Save encrypted data as one record of the store
+def save_sensitive_data(store, record_key, data, saved_by=None):
+    store.put(record_key, {'data': data, 'saved_by': saved_by, 'saved_at': time.time()})
+    print(f"Sensitive data saved securely as record '{record_key}'.")
+
+# Load and verify one record (Fernet's HMAC authenticates each record)
+def load_sensitive_data(store, record_key):
+    try:
+        record = store.get(record_key)
+    except (InvalidToken, ValueError):
+        print("Data integrity check failed!")
+        return None
 
-# Load and verify sensitive data
-def load_sensitive_data(fernet):
-    if not os.path.exists(DATA_FILE):
-        print("No sensitive data found.")
+    if record is None:
+        print(f"No sensitive data found for '{record_key}'.")
         return None
+    print("Data integrity verified.")
+    return record['data']
+
+# Move the old single-blob file into the store once
+def migrate_legacy_data(fernet, store):
+    if not os.path.exists(DATA_FILE) or LEGACY_RECORD_KEY in store:
+        return
     
     with open(DATA_FILE, 'r') as data_file:
         stored_data = json.load(data_file)
     
     decrypted_data = decrypt_data(fernet, stored_data['data'])
-    current_hash = hashlib.sha256(decrypted_data.encode()).hexdigest()
-
-    if current_hash == stored_data['hash']:
-        print("Data integrity verified.")
-        return decrypted_data
+    if hashlib.sha256(decrypted_data.encode()).hexdigest() == stored_data['hash']:
+        save_sensitive_data(store, LEGACY_RECORD_KEY, decrypted_data)
     else:
-        print("Data integrity check failed!")
+        print(f"Data integrity check failed for {DATA_FILE}, not migrated!")
+
+# Check a dataset against its Merkle index, creating the index on first use
+def verify_dataset(path):
+    if not os.path.exists(path):
+        print(f"{path} not found.")
         return None
+    if not os.path.exists(merkle.index_path(path)):
+        index = merkle.build_index(path)
+        print(f"Indexed {index['rows']} rows. Merkle root: {index['root']}")
+        return True
+    
+    index = merkle.load_index(path)
+    result = merkle.verify_file(path, index)
+    if result['header_changed']:
+        print("Data integrity check failed! The header line changed.")
+    if result['tampered_chunks']:
+        rows = [merkle.chunk_rows_range(index, chunk) for chunk in result['tampered_chunks']]
+        print(f"Data integrity check failed! Changed rows in ranges: {rows}")
+    elif result['header_changed']:
+        print(f"The {index['rows']} indexed data rows are unchanged.")
+    else:
+        print(f"Data integrity verified ({index['rows']} indexed rows, root {index['root']}).")
+    if result['unindexed_rows']:
+        print(f"{result['unindexed_rows']} rows appended after indexing are not covered by the index.")
+    return not (result['header_changed'] or result['tampered_chunks'])
 
 def main():
     fernet = load_or_generate_key()
+    store = RecordStore(RECORD_STORE_FILE, cipher=fernet)
+    migrate_legacy_data(fernet, store)
+    session = None
 
     while True:
         print("\nData Privacy and Security System")
@@ -111,7 +139,8 @@ def main():
         print("2. Login")
         print("3. Save Sensitive Data")
         print("4. Load Sensitive Data")
-        print("5. Exit")
+        print("5. Verify Dataset Integrity")
+        print("6. Exit")
         
         choice = input("Select an option: ").strip()
 
@@ -123,24 +152,41 @@ def main():
         elif choice == '2':
             username = input("Enter username: ").strip()
             password = input("Enter password: ").strip()
-            if authenticate_user(username, password):
+            token = authenticate_user(username, password)
+            if token:
+                session = token
                 print("Access granted.")
             else:
                 print("Access denied.")
 
         elif choice == '3':
-            if authenticate_user(input("Enter username: ").strip(), input("Enter password: ").strip()):
-                data = input("Enter sensitive data to save: ").strip()
-                save_sensitive_data(fernet, data)
+            session = ensure_session(session)
+            if session:
+                record_key = input("Enter record key: ").strip()
+                if record_key:
+                    data = input("Enter sensitive data to save: ").strip()
+                    save_sensitive_data(store, record_key, data, get_auth_service().validate_session(session))
+                else:
+                    print("A record key is required.")
         
         elif choice == '4':
-            if authenticate_user(input("Enter username: ").strip(), input("Enter password: ").strip()):
-                data = load_sensitive_data(fernet)
-                if data:
-                    print(f"Loaded Sensitive Data: {data}")
+            session = ensure_session(session)
+            if session:
+                record_key = input(f"Enter record key ({len(store)} stored, blank to list): ").strip()
+                if not record_key:
+                    print("Records:", ", ".join(store.keys()) or "none")
+                else:
+                    data = load_sensitive_data(store, record_key)
+                    if data:
+                        print(f"Loaded Sensitive Data: {data}")
         
         elif choice == '5':
+            verify_dataset(input("Enter dataset path: ").strip())
+        
+        elif choice == '6':
             print("Exiting...")
+            get_auth_service().close()
+            store.close()
             break
         
         else:
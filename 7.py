@@ -2,8 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from report_engine import write_transaction_report
 
 # Sample data for transactions
 data = {
@@ -48,37 +47,9 @@ def visualize_transaction_proportions(df):
     fig = px.pie(transaction_counts, values='count', names='transaction_type', title='Transaction Type Proportions')
     fig.show()
 
-# Function to generate a simple PDF report
+# Function to generate a paginated PDF report
 def generate_report(df, filename='transaction_report.pdf'):
-    report = canvas.Canvas(filename, pagesize=letter)
-    report.setTitle('Transaction Report')
-    
-    # Title
-    report.setFont('Helvetica-Bold', 16)
-    report.drawString(100, 750, 'Transaction Report')
-
-    # Summary
-    total_transactions = len(df)
-    completed_transactions = df[df['status'] == 'completed'].shape[0]
-    pending_transactions = df[df['status'] == 'pending'].shape[0]
-    failed_transactions = df[df['status'] == 'failed'].shape[0]
-    
-    report.setFont('Helvetica', 12)
-    report.drawString(100, 700, f'Total Transactions: {total_transactions}')
-    report.drawString(100, 680, f'Completed Transactions: {completed_transactions}')
-    report.drawString(100, 660, f'Pending Transactions: {pending_transactions}')
-    report.drawString(100, 640, f'Failed Transactions: {failed_transactions}')
-    
-    # Detailed table
-    report.drawString(100, 600, 'Transaction Details:')
-    text = report.beginText(100, 580)
-    text.setFont('Helvetica', 10)
-    for index, row in df.iterrows():
-        text.textLine(f"ID: {row['transaction_id']}, Type: {row['transaction_type']}, Amount: ${row['amount']}, Status: {row['status']}, Date: {row['timestamp'].strftime('%Y-%m-%d')}")
-    report.drawText(text)
-    
-    # Save the PDF
-    report.save()
+    write_transaction_report(df, filename)
     print(f'Report saved as {filename}')
 
 # Main function to run the visualizations and generate the report
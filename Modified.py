@@ -2,16 +2,19 @@ import pandas as pd
 import plotly.express as px
 import streamlit as st
 import numpy as np
-from cryptography.fernet import Fernet
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 import plotly.graph_objects as go
 import networkx as nx
 import random
+import uuid
 from datetime import datetime
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
+from figure_cache import get_or_build_figure
+from summary_cube import get_summary_cube, type_counts
+from report_service import ReportService
+from report_store import format_report_id
+from entity_clusters import cluster_frame, propagate_flags
+from column_crypto import ENCRYPTION_KEY_FILE, SENSITIVE_COLUMNS, get_cipher
+from pseudonymize import PSEUDONYM_COLUMNS, pseudonymize_frame
+from job_queue import JobQueue, JobQueueFull, fraud_training_job, report_job
 
 # Upload CSV functionality
 def upload_transaction_data():
@@ -19,7 +22,7 @@ def upload_transaction_data():
     uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
     
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
+        df = pseudonymize_frame(pd.read_csv(uploaded_file))  # Analyses only see keyed pseudonyms
         st.write("Uploaded Data:")
         st.write(df)
         return df
@@ -36,7 +39,7 @@ def collect_transaction_data(df):
 def analyze_blockchain(df):
     if 'transaction_type' in df.columns:
         st.write("Analyzing blockchain data (example: counting transactions by type)...")
-        transaction_counts = df.groupby('transaction_type').size().reset_index(name='counts')
+        transaction_counts = type_counts(get_summary_cube(df), name='counts')
         st.write(transaction_counts)
     else:
         st.warning("The 'transaction_type' column is missing from the uploaded data.")
@@ -44,24 +47,99 @@ def analyze_blockchain(df):
 # Anonymity and Pseudonymity
 def analyze_anonymity_pseudonymity(df):
     if 'address' in df.columns:
-        st.write("Analyzing anonymity and pseudonymity (example: display addresses)...")
+        st.write("Analyzing anonymity and pseudonymity (addresses are keyed pseudonyms)...")
         unique_addresses = df['address'].unique()
         st.write(unique_addresses)
+        pseudonymized = [column for column in PSEUDONYM_COLUMNS if column in df.columns]
+        st.write(f"{len(unique_addresses)} distinct addresses; pseudonymized columns: {', '.join(pseudonymized)}")
+        show_entity_clusters(df)
     else:
         st.warning("The 'address' column is missing from the uploaded data.")
 
+def show_entity_clusters(df):
+    # Rows sharing a transaction id are inputs spent together (common-input-ownership)
+    if 'transaction_id' not in df.columns:
+        return
+    clustered, clusters = cluster_frame(df)
+    summary = clusters.summary()
+    st.write(f"Entities: {summary['clusters']} from {summary['addresses']} addresses "
+             f"({summary['multi_address_clusters']} with more than one address)")
+    st.write(clusters.cluster_sizes().head(20).rename_axis('cluster_id'))
+
+# Background Jobs
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+def session_owner():
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+def show_job_progress(job_id, status):
+    st.write(f"Job {status['state']}...")
+    st.progress(status['progress'] or 0.0)
+    st.button("Refresh Status", key=f"refresh_{job_id}")
+
+def show_job_status(job_id, label, mime):
+    status = get_job_queue().status(job_id)
+    if status is None:
+        return
+
+    if status['state'] == 'done':
+        with open(status['artifact_path'], 'rb') as artifact:
+            st.download_button(label=label, data=artifact, file_name=status['filename'], mime=mime)
+    elif status['state'] == 'failed':
+        st.error(f"Job failed: {status['error']}")
+    else:
+        show_job_progress(job_id, status)
+
+def fraud_predictions(df):
+    """
+    IsolationForest predictions for df['amount'], trained in the job queue.
+    Returns None (after showing the job's progress) until training has finished.
+    """
+    fingerprint = int(pd.util.hash_pandas_object(df['amount'], index=False).sum())
+    job = st.session_state.get('fraud_job')
+    status = get_job_queue().status(job[1]) if job is not None and job[0] == fingerprint else None
+    if status is None:  # New data, or the previous result expired
+        try:
+            job_id = get_job_queue().submit('training', fraud_training_job, df['amount'].to_numpy(),
+                                            filename="fraud_predictions.npy", owner=session_owner())
+        except JobQueueFull as e:
+            st.warning(str(e))
+            return None
+        st.session_state['fraud_job'] = (fingerprint, job_id)
+        status = get_job_queue().status(job_id)
+
+    if status['state'] == 'done':
+        return np.load(status['artifact_path'])
+    if status['state'] == 'failed':
+        st.error(f"Fraud model training failed: {status['error']}")
+    else:
+        show_job_progress(status['job_id'], status)
+    return None
+
 # Fraud Detection Using Isolation Forest
 def fraud_detection(df):
     st.write("Detecting suspicious and fraudulent transactions using machine learning...")
 
     if 'amount' in df.columns:
-        scaler = StandardScaler()
-        df['amount_scaled'] = scaler.fit_transform(df[['amount']])
-        model = IsolationForest(contamination=0.05, random_state=42)
-        df['fraud_prediction'] = model.fit_predict(df[['amount_scaled']])
+        predictions = fraud_predictions(df)
+        if predictions is None:
+            return df
+        df['fraud_prediction'] = predictions
         df['is_suspicious'] = df['fraud_prediction'] == -1
         st.write("Flagged Suspicious Transactions:")
         st.write(df[df['is_suspicious']])
+
+        if {'transaction_id', 'address'} <= set(df.columns):
+            # Extend suspicion to every transaction of the same entity
+            df['cluster_id'] = cluster_frame(df)[0]['cluster_id']
+            df['entity_suspicious'] = propagate_flags(df, 'is_suspicious')
+            linked = df[df['entity_suspicious'] & ~df['is_suspicious']]
+            st.write(f"Transactions linked to suspicious entities: {len(linked)}")
+            st.write(linked)
         return df
     else:
         st.warning("The 'amount' column is missing from the uploaded data.")
@@ -81,12 +159,18 @@ def monitor_transactions(df):
         st.warning("Suspicious transactions have not been flagged. Please run fraud detection first.")
 
 # User Reporting and Collaboration
+@st.cache_resource
+def get_report_service():
+    return ReportService()
+
 def submit_report(transaction_id, reported_by, notes):
     report = {
         "transaction_id": transaction_id,
         "reported_by": reported_by,
         "notes": notes
     }
+    report_id = get_report_service().submit_report(None, None, None, reported_by, notes, transaction_id=transaction_id)
+    report["report_id"] = format_report_id(report_id)
     st.write("Report submitted:", report)
 
 def user_reporting_collaboration():
@@ -99,76 +183,60 @@ def user_reporting_collaboration():
         submit_report(transaction_id, reported_by, notes)
 
 # Data Privacy and Security
-def encrypt_data(key, data):
-    fernet = Fernet(key)
-    encrypted_data = fernet.encrypt(data.encode())
-    return encrypted_data
+def encrypt_data(data):
+    return get_cipher().encrypt(data)
 
-def decrypt_data(key, encrypted_data):
-    fernet = Fernet(key)
-    decrypted_data = fernet.decrypt(encrypted_data).decode()
-    return decrypted_data
+def decrypt_data(encrypted_data):
+    return get_cipher().decrypt(encrypted_data)
 
-def data_privacy_security():
+def data_privacy_security(df=None):
     st.write("Data Privacy and Security")
-    key = Fernet.generate_key()
-    st.write("Encryption Key:", key.decode())
+    st.write("Encryption Key File:", ENCRYPTION_KEY_FILE)
 
     data_to_encrypt = st.text_input("Data to Encrypt")
     if st.button("Encrypt Data"):
-        encrypted_data = encrypt_data(key, data_to_encrypt)
-        st.write("Encrypted Data:", encrypted_data.decode())
+        st.session_state['encrypted_data'] = encrypt_data(data_to_encrypt)
+    if 'encrypted_data' in st.session_state:
+        st.write("Encrypted Data:", st.session_state['encrypted_data'])
         if st.button("Decrypt Data"):
-            decrypted_data = decrypt_data(key, encrypted_data)
-            st.write("Decrypted Data:", decrypted_data)
+            st.write("Decrypted Data:", decrypt_data(st.session_state['encrypted_data']))
+
+    if df is not None:
+        sensitive_columns = [column for column in SENSITIVE_COLUMNS if column in df.columns]
+        columns = st.multiselect("Columns to Encrypt", list(df.columns), default=sensitive_columns)
+        if columns and st.button("Encrypt Columns"):
+            encrypted_df = get_cipher().encrypt_columns(df, columns)
+            st.write(encrypted_df.head())
+            st.download_button("Download Encrypted CSV", encrypted_df.to_csv(index=False),
+                               file_name="encrypted_transactions.csv", mime="text/csv")
 
 # Visualization and Reporting Tools
+def build_transaction_proportions_figure(df):
+    transaction_counts = type_counts(get_summary_cube(df))
+
+    return px.pie(transaction_counts, values='count', names='transaction_type', title='Transaction Type Proportions')
+
 def visualize_transaction_proportions(df):
     if 'transaction_type' in df.columns:
-        transaction_counts = df['transaction_type'].value_counts().reset_index()
-        transaction_counts.columns = ['transaction_type', 'count']
-
-        fig = px.pie(transaction_counts, values='count', names='transaction_type', title='Transaction Type Proportions')
+        fig = get_or_build_figure('transaction_proportions', df, build_transaction_proportions_figure, columns=['transaction_type'])
         st.plotly_chart(fig)
     else:
         st.warning("The 'transaction_type' column is missing from the uploaded data.")
 
-def generate_report(df):
-    buffer = BytesIO()
-    report = canvas.Canvas(buffer, pagesize=letter)
-    report.setTitle('Transaction Report')
-
-    report.setFont('Helvetica-Bold', 16)
-    report.drawString(100, 750, 'Transaction Report')
-
-    total_transactions = len(df)
-    completed_transactions = df[df['status'] == 'completed'].shape[0]
-    pending_transactions = df[df['status'] == 'pending'].shape[0]
-    failed_transactions = df[df['status'] == 'failed'].shape[0]
-
-    report.setFont('Helvetica', 12)
-    report.drawString(100, 700, f'Total Transactions: {total_transactions}')
-    report.drawString(100, 680, f'Completed Transactions: {completed_transactions}')
-    report.drawString(100, 660, f'Pending Transactions: {pending_transactions}')
-    report.drawString(100, 640, f'Failed Transactions: {failed_transactions}')
-
-    report.save()
-    buffer.seek(0)
-    return buffer
-
 def visualization_reporting_tools(df):
     st.write("Visualization and Reporting Tools")
 
     visualize_transaction_proportions(df)
 
     if st.button("Generate PDF Report"):
-        report_buffer = generate_report(df)
-        st.download_button(
-            label="Download Report as PDF",
-            data=report_buffer,
-            file_name="transaction_report.pdf",
-            mime="application/pdf"
-        )
+        try:
+            st.session_state['report_job_id'] = get_job_queue().submit(
+                'report', report_job, df, filename="transaction_report.pdf", owner=session_owner())
+        except JobQueueFull as e:
+            st.warning(str(e))
+
+    if 'report_job_id' in st.session_state:
+        show_job_status(st.session_state['report_job_id'], "Download Report as PDF", "application/pdf")
 
 # Peer-to-Peer Transaction Count
 def peer_to_peer_transaction_count(df):
@@ -220,54 +288,59 @@ def simulate_transactions(df):
         return df
 
 # Neuron-Like 3D Visualization of Blockchain Connections (Fraudulent Transactions Only)
+def build_neuron_like_network_figure(df):
+    # Filter fraudulent transactions
+    fraudulent_df = df[df['is_suspicious']]
+
+    # Create a NetworkX graph
+    G = nx.Graph()
+
+    # Add nodes and edges from the DataFrame
+    for i, row in fraudulent_df.iterrows():
+        G.add_node(row['address'])
+        G.add_node(row['recipient'])
+        G.add_edge(row['address'], row['recipient'], weight=row['amount'], fraudulent=row['is_suspicious'])
+
+    # Generate random 3D positions for each node
+    pos = {node: (np.random.uniform(-1, 1), np.random.uniform(-1, 1), np.random.uniform(-1, 1)) for node in G.nodes()}
+
+    # Extract edges with fraudulent information
+    edge_x, edge_y, edge_z = [], [], []
+    for edge in G.edges(data=True):
+        x0, y0, z0 = pos[edge[0]]
+        x1, y1, z1 = pos[edge[1]]
+        edge_x.extend([x0, x1, None])
+        edge_y.extend([y0, y1, None])
+        edge_z.extend([z0, z1, None])
+
+    # Create 3D plot for the edges
+    fig = go.Figure(data=[go.Scatter3d(
+        x=edge_x,
+        y=edge_y,
+        z=edge_z,
+        mode='lines',
+        line=dict(color='black', width=2)
+    )])
+
+    # Add nodes to the plot
+    node_x, node_y, node_z = zip(*pos.values())
+    fig.add_trace(go.Scatter3d(
+        x=node_x,
+        y=node_y,
+        z=node_z,
+        mode='markers',
+        marker=dict(size=6, color='red', symbol='circle')
+    ))
+
+    fig.update_layout(title="Blockchain Neuron-Like Visualization", showlegend=False)
+    return fig
+
 def visualize_neuron_like_blockchain_network(df):
     if 'is_suspicious' in df.columns:
         st.write("3D Neuron-Like Visualization of Blockchain Connections with Fraudulent Transactions Highlighted")
 
-        # Filter fraudulent transactions
-        fraudulent_df = df[df['is_suspicious']]
-
-        # Create a NetworkX graph
-        G = nx.Graph()
-
-        # Add nodes and edges from the DataFrame
-        for i, row in fraudulent_df.iterrows():
-            G.add_node(row['address'])
-            G.add_node(row['recipient'])
-            G.add_edge(row['address'], row['recipient'], weight=row['amount'], fraudulent=row['is_suspicious'])
-
-        # Generate random 3D positions for each node
-        pos = {node: (np.random.uniform(-1, 1), np.random.uniform(-1, 1), np.random.uniform(-1, 1)) for node in G.nodes()}
-
-        # Extract edges with fraudulent information
-        edge_x, edge_y, edge_z = [], [], []
-        for edge in G.edges(data=True):
-            x0, y0, z0 = pos[edge[0]]
-            x1, y1, z1 = pos[edge[1]]
-            edge_x.extend([x0, x1, None])
-            edge_y.extend([y0, y1, None])
-            edge_z.extend([z0, z1, None])
-
-        # Create 3D plot for the edges
-        fig = go.Figure(data=[go.Scatter3d(
-            x=edge_x,
-            y=edge_y,
-            z=edge_z,
-            mode='lines',
-            line=dict(color='black', width=2)
-        )])
-
-        # Add nodes to the plot
-        node_x, node_y, node_z = zip(*pos.values())
-        fig.add_trace(go.Scatter3d(
-            x=node_x,
-            y=node_y,
-            z=node_z,
-            mode='markers',
-            marker=dict(size=6, color='red', symbol='circle')
-        ))
-
-        fig.update_layout(title="Blockchain Neuron-Like Visualization", showlegend=False)
+        fig = get_or_build_figure('neuron_like_network', df, build_neuron_like_network_figure,
+                                  columns=['address', 'recipient', 'amount', 'is_suspicious'])
         st.plotly_chart(fig)
     else:
         st.warning("Fraudulent transaction data not available. Please run fraud detection first.")
@@ -283,7 +356,7 @@ def main():
         df = fraud_detection(df)
         monitor_transactions(df)
         user_reporting_collaboration()
-        data_privacy_security()
+        data_privacy_security(df)
         visualization_reporting_tools(df)
         peer_to_peer_transaction_count(df)
         df = simulate_transactions(df)
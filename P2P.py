@@ -1,4 +1,15 @@
+import os
+import struct
 import requests
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from http_cache import PERMANENT, get_cached, get_json, put_cached, transaction_ttl
+from chain_archive import archive_block, archive_raw_block, archive_transaction, get_block, get_raw_block, get_transaction
+from raw_block import RawBlock
+from entity_clusters import AddressClusters
+
+# Blockchain.com API base URL (override to point at a mock server)
+BLOCKCHAIN_INFO_API = os.environ.get('BLOCKCHAIN_INFO_API', 'https://blockchain.info')
 
 def get_block_info(hash_id):
     """
@@ -10,12 +21,15 @@ def get_block_info(hash_id):
     Returns:
         dict: Block information if the request is successful.
     """
-    API_URL = f"https://blockchain.info/rawblock/{hash_id}"
+    API_URL = f"{BLOCKCHAIN_INFO_API}/rawblock/{hash_id}"
 
     try:
-        response = requests.get(API_URL)
-        response.raise_for_status()
-        block_info = response.json()
+        # Read from the local archive first; blocks fetched by hash never change, so the
+        # archive is their only store (not the response cache as well)
+        block_info = get_block(hash_id)
+        if block_info is None:
+            block_info = get_json(API_URL, raise_for_status=True)
+            archive_block(block_info)
 
         # Print key block details
         print("\n--- Block Information ---")
@@ -31,22 +45,87 @@ def get_block_info(hash_id):
         print(f"Error fetching block data: {e}")
         return None
 
-def get_transaction_details(tx_id):
+# Errors RawBlock raises on truncated or malformed data
+RAW_BLOCK_ERRORS = (ValueError, struct.error, IndexError)
+
+def _verified_raw_block(data, hash_id):
+    block = RawBlock(data)
+    if block.header['hash'] != hash_id.lower():
+        raise ValueError(f"Block data hashes to {block.header['hash']}, not {hash_id}.")
+    if not block.verify_merkle_root():
+        raise ValueError(f"Merkle root of block {hash_id} does not match its transactions.")
+    return block
+
+def get_raw_block_info(hash_id):
+    """
+    Fetch a block's binary serialization (about a third of the JSON size) and decode it.
+    
+    Args:
+        hash_id (str): Block hash to query.
+        
+    Returns:
+        RawBlock: The decoded block if the request is successful.
+    """
+    API_URL = f"{BLOCKCHAIN_INFO_API}/rawblock/{hash_id}"
+
+    try:
+        # Read from the local archive first; blocks fetched by hash never change
+        block = None
+        data = get_raw_block(hash_id)
+        if data is not None:
+            try:
+                block = _verified_raw_block(data, hash_id)
+            except RAW_BLOCK_ERRORS:
+                block = None  # A bad copy in the archive; fetch the block again
+        if block is None:
+            response = requests.get(API_URL, params={"format": "hex"}, timeout=30)
+            response.raise_for_status()
+            data = bytes.fromhex(response.text.strip())
+            block = _verified_raw_block(data, hash_id)
+            archive_raw_block(hash_id, data)  # Only blocks that decoded and matched their hash
+
+        print("\n--- Block Information (raw) ---")
+        print(f"Hash: {block.header['hash']}")
+        print(f"Height: {block.header['height']}")
+        print(f"Time: {block.header['time']}")
+        print(f"Block Size: {block.size} bytes")
+        print(f"Number of Transactions: {len(block)}")
+
+        return block
+
+    except (requests.exceptions.RequestException,) + RAW_BLOCK_ERRORS as e:
+        print(f"Error fetching raw block data: {e}")
+        return None
+
+# Parallel requests used to fill in transactions missing from a block payload
+MAX_FETCH_WORKERS = 8
+
+def get_transaction_details(tx_id, verbose=True):
     """
     Fetch transaction details using Blockchain.com API.
     
     Args:
         tx_id (str): Transaction ID to query.
+        verbose (bool): Print the inputs and outputs.
         
     Returns:
         dict: Transaction details if the request is successful.
     """
-    API_URL = f"https://blockchain.info/rawtx/{tx_id}"
+    API_URL = f"{BLOCKCHAIN_INFO_API}/rawtx/{tx_id}"
 
     try:
-        response = requests.get(API_URL)
-        response.raise_for_status()
-        transaction_info = response.json()
+        # Read from the local archive first; confirmed transactions are archived, and
+        # unconfirmed ones kept briefly in the response cache
+        transaction_info = get_transaction(tx_id) or get_cached(API_URL)
+        if transaction_info is None:
+            transaction_info = get_json(API_URL, raise_for_status=True)
+            ttl = transaction_ttl(transaction_info)
+            if ttl is PERMANENT:
+                archive_transaction(transaction_info)
+            else:
+                put_cached(API_URL, None, transaction_info, ttl)
+        if not verbose:
+            return transaction_info
 
         # Display key transaction details
         print("\n--- Transaction Details ---")
@@ -68,9 +147,85 @@ def get_transaction_details(tx_id):
         print(f"Error fetching transaction details: {e}")
         return None
 
+def _needs_details(tx, position):
+    """
+    Check whether a block payload entry lacks data we need (inputs, outputs or input values).
+    """
+    if "inputs" not in tx or "out" not in tx:
+        return True
+    if position == 0:
+        return False  # Coinbase input has no previous output
+    return any("value" not in (tx_input.get("prev_out") or {}) for tx_input in tx["inputs"])
+
+def parse_block_transactions(block_data, fetch_missing=True, max_workers=MAX_FETCH_WORKERS):
+    """
+    Parse every transaction of a block payload into columnar tables in one pass.
+    
+    The rawblock payload already carries inputs and outputs, so transactions are only
+    fetched (in parallel) when the payload is missing them.
+    
+    Args:
+        block_data (dict): Block information from get_block_info.
+        fetch_missing (bool): Fetch transactions whose inputs/outputs are incomplete.
+        max_workers (int): Parallel requests for missing transactions.
+        
+    Returns:
+        dict: 'transactions', 'inputs' and 'outputs' DataFrames. Input and output rows
+            point at their transaction through tx_pos (its row in 'transactions').
+    """
+    transactions = list(block_data.get("tx", []))
+
+    missing = [i for i, tx in enumerate(transactions) if _needs_details(tx, i)]
+    if missing and fetch_missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            details = executor.map(lambda i: get_transaction_details(transactions[i].get("hash"), verbose=False), missing)
+            for i, transaction_info in zip(missing, details):
+                if transaction_info:
+                    transactions[i] = transaction_info
+
+    tx_columns = {"tx_hash": [], "tx_index": [], "fee": [], "size": [], "input_count": [], "output_count": [], "total_out": []}
+    input_columns = {"tx_pos": [], "prev_tx_index": [], "prev_n": [], "address": [], "value": []}
+    output_columns = {"tx_pos": [], "n": [], "address": [], "value": [], "spent": []}
+
+    for position, tx in enumerate(transactions):
+        inputs = tx.get("inputs", [])
+        outputs = tx.get("out", [])
+        total_out = 0
+
+        for tx_input in inputs:
+            prev_out = tx_input.get("prev_out") or {}
+            input_columns["tx_pos"].append(position)
+            input_columns["prev_tx_index"].append(prev_out.get("tx_index", -1))
+            input_columns["prev_n"].append(prev_out.get("n", -1))
+            input_columns["address"].append(prev_out.get("addr"))
+            input_columns["value"].append(prev_out.get("value", 0))
+
+        for tx_output in outputs:
+            value = tx_output.get("value", 0)
+            total_out += value
+            output_columns["tx_pos"].append(position)
+            output_columns["n"].append(tx_output.get("n", -1))
+            output_columns["address"].append(tx_output.get("addr"))
+            output_columns["value"].append(value)
+            output_columns["spent"].append(bool(tx_output.get("spent", False)))
+
+        tx_columns["tx_hash"].append(tx.get("hash"))
+        tx_columns["tx_index"].append(tx.get("tx_index", -1))
+        tx_columns["fee"].append(tx.get("fee", 0))
+        tx_columns["size"].append(tx.get("size", 0))
+        tx_columns["input_count"].append(len(inputs))
+        tx_columns["output_count"].append(len(outputs))
+        tx_columns["total_out"].append(total_out)
+
+    return {
+        "transactions": pd.DataFrame(tx_columns).astype({"tx_index": "int64", "fee": "int64", "size": "int64", "total_out": "int64"}),
+        "inputs": pd.DataFrame(input_columns).astype({"tx_pos": "int64", "prev_tx_index": "int64", "prev_n": "int64", "value": "int64"}),
+        "outputs": pd.DataFrame(output_columns).astype({"tx_pos": "int64", "n": "int64", "value": "int64"}),
+    }
+
 def visualize_transactions(block_data):
     """
-    Visualize all transactions in a block by fetching and displaying details.
+    Visualize all transactions in a block, parsed directly from the block payload.
     
     Args:
         block_data (dict): Block information containing transactions.
@@ -80,24 +235,68 @@ def visualize_transactions(block_data):
         print("No transactions found in this block.")
         return
 
+    parsed = parse_block_transactions(block_data)
+    _print_block_summary(parsed)
+
+    # Addresses spent together in a transaction belong to one entity
+    clusters = AddressClusters()
+    clusters.add_block_frames(parsed)
+    summary = clusters.summary()
+    print(f"Entities: {summary['clusters']} from {summary['addresses']} addresses "
+          f"(largest spans {summary['largest_cluster']}, {summary['skipped_coinjoins']} CoinJoins skipped)")
+
+def visualize_raw_block(raw_block):
+    """
+    Visualize all transactions of a block decoded from its binary serialization.
+    Fees are not shown: a raw block doesn't carry the values of the outputs it spends.
+    
+    Args:
+        raw_block (RawBlock): Block from get_raw_block_info.
+    """
+    if len(raw_block) == 0:
+        print("No transactions found in this block.")
+        return
+
+    _print_block_summary(raw_block.to_frames(addresses=False), fees_known=False)
+
+def _print_block_summary(parsed, fees_known=True):
+    tx_df = parsed["transactions"]
+
     print(f"\n--- Visualizing Transactions in Block ---")
-    for i, tx in enumerate(transactions[:5], start=1):  # Limit to first 5 transactions for simplicity
-        tx_id = tx.get("hash")
-        print(f"\nTransaction {i}: {tx_id}")
-        transaction_details = get_transaction_details(tx_id)
-        if not transaction_details:
-            print("Failed to fetch details for this transaction.")
+    print(f"Transactions: {len(tx_df)}")
+    print(f"Inputs: {len(parsed['inputs'])}, Outputs: {len(parsed['outputs'])}")
+    print(f"Total Output Value: {tx_df['total_out'].sum() / 1e8} BTC")
+    if fees_known:
+        print(f"Total Fees: {tx_df['fee'].sum() / 1e8} BTC")
+
+    summary = pd.DataFrame({
+        "Transaction Hash": tx_df["tx_hash"],
+        "Inputs": tx_df["input_count"],
+        "Outputs": tx_df["output_count"],
+        "Output Value (BTC)": tx_df["total_out"] / 1e8,  # Convert Satoshis to BTC
+    })
+    if fees_known:
+        summary["Fee (BTC)"] = tx_df["fee"] / 1e8
+    print(summary.to_string(index=False, max_rows=50))
 
 if __name__ == "__main__":
     # Replace with a valid block hash
     block_hash = input("Enter the block hash ID: ").strip()
 
     if block_hash:
-        block_data = get_block_info(block_hash)
-        if block_data:
-            print("\nBlock data retrieved successfully!")
-            visualize_transactions(block_data)
+        if input("Use the binary raw block format? (y/N): ").strip().lower() == "y":
+            raw_block = get_raw_block_info(block_hash)
+            if raw_block:
+                print("\nBlock data retrieved successfully!")
+                visualize_raw_block(raw_block)
+            else:
+                print("Failed to retrieve block data.")
         else:
-            print("Failed to retrieve block data.")
+            block_data = get_block_info(block_hash)
+            if block_data:
+                print("\nBlock data retrieved successfully!")
+                visualize_transactions(block_data)
+            else:
+                print("Failed to retrieve block data.")
     else:
         print("No block hash ID provided.")
@@ -1,48 +1,215 @@
-import matplotlib.pyplot as plt
+import argparse
+import os
+import time
+import webbrowser
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
 import numpy as np
+import pandas as pd
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives import hashes
-import webbrowser
-import time
 
-# Convert hex to binary for visualization
-hex_data = bytes.fromhex("30450221009c185e79a9af94089c321cfc7bed36f00b5b3fa06d830fc40f4edb529e6d94a302206ee800f2a79d77afe16506bffee98895571d122b525486865377fac307c6747f01")
-binary_data = np.unpackbits(np.frombuffer(hex_data, dtype=np.uint8))
-
-# Plot as image
-plt.imshow(binary_data.reshape(-1, 8), cmap="binary")
-plt.title("Binary Visualization of Signature")
-plt.show()
-
-# Public key in compressed format (replace with actual public key if needed)
-public_key_hex = "0381d31725526b08f59afe0725aded229d4f34d2b2902c1035ff5b454c3e6b00f9"
-public_key_bytes = bytes.fromhex(public_key_hex)
-
-# Load the ECC public key
-public_key = ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256K1(), public_key_bytes)
-
-# Example message to verify (replace with actual message that was signed)
-message = b"Your original message here"
-
-# Verify the signature
-try:
-    public_key.verify(
-        hex_data,
-        message,
-        ec.ECDSA(hashes.SHA256())
-    )
-    print("Signature is valid.")
-    
-    # Add a slight delay before redirection to ensure the message is printed first
-    time.sleep(2)
-    
-    # Redirect to a valid URL
-    webbrowser.open('http://example.com')  # Redirect to your desired URL
-except Exception as e:
-    print(f"Signature verification failed: {e}")
-    
-    # Add a slight delay before redirection to ensure the error is printed first
-    time.sleep(2)
-    
-    # Redirect to an error URL
-    webbrowser.open('http://example.com/fail')  # Redirect to an error URL
+# Example signature, public key and message for the interactive demo
+DEMO_SIGNATURE_HEX = "30450221009c185e79a9af94089c321cfc7bed36f00b5b3fa06d830fc40f4edb529e6d94a302206ee800f2a79d77afe16506bffee98895571d122b525486865377fac307c6747f01"
+DEMO_PUBLIC_KEY_HEX = "0381d31725526b08f59afe0725aded229d4f34d2b2902c1035ff5b454c3e6b00f9"
+DEMO_MESSAGE = b"Your original message here"
+
+# Signatures handed to a worker process at a time
+CHUNK_SIZE = 2000
+
+# Parsed public keys kept per process
+KEY_CACHE_SIZE = 2 ** 16
+
+_ECDSA_SHA256 = ec.ECDSA(hashes.SHA256())
+
+def _to_bytes(value):
+    # Hex strings (signatures, keys) and raw bytes are both accepted
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    return bytes.fromhex(value.strip())
+
+def _message_bytes(message):
+    return bytes(message) if isinstance(message, (bytes, bytearray, memoryview)) else str(message).encode()
+
+# Load the ECC public key (compressed or uncompressed SEC1 encoding)
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def load_public_key(public_key_bytes):
+    return ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256K1(), public_key_bytes)
+
+def verify_signature(public_key, message, signature):
+    """
+    Verify one DER-encoded secp256k1 ECDSA signature over SHA-256(message).
+
+    Returns:
+        bool: True if the signature is valid; False if it is invalid or any input is malformed.
+    """
+    try:
+        load_public_key(_to_bytes(public_key)).verify(_to_bytes(signature), _message_bytes(message), _ECDSA_SHA256)
+        return True
+    except (InvalidSignature, ValueError, TypeError, AttributeError):
+        return False
+
+def _verify_chunk(triples):
+    # Runs in a worker process; its own key cache persists across chunks
+    return [verify_signature(public_key, message, signature) for public_key, message, signature in triples]
+
+# Batch verification
+def verify_batch(public_keys, messages, signatures, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Verify many (public key, message, signature) triples across a process pool.
+
+    Rows are grouped by public key before being split into chunks, so each worker
+    parses a repeated key once and reuses it from its cache. Malformed rows count as
+    invalid instead of failing the batch.
+
+    Args:
+        public_keys (list): SEC1-encoded public keys (hex or bytes).
+        messages (list): Signed messages (bytes, or str encoded as UTF-8).
+        signatures (list): DER-encoded signatures (hex or bytes).
+        processes (int): Worker processes (default: all cores; 1 verifies in this process).
+        chunk_size (int): Triples sent to a worker at a time.
+
+    Returns:
+        ndarray: Boolean result per triple, in input order.
+    """
+    count = len(public_keys)
+    if not count == len(messages) == len(signatures):
+        raise ValueError("public_keys, messages and signatures must have the same length.")
+    processes = processes or os.cpu_count() or 1
+    results = np.zeros(count, dtype=bool)
+    if count == 0:
+        return results
+
+    key_codes, _ = pd.factorize(pd.Series(public_keys, dtype=object).map(
+        lambda key: bytes(key) if isinstance(key, (bytearray, memoryview)) else key))
+    order = np.argsort(key_codes, kind='stable')
+    triples = [(public_keys[i], messages[i], signatures[i]) for i in order.tolist()]
+
+    if processes == 1 or count <= chunk_size:
+        results[order] = _verify_chunk(triples)
+        return results
+
+    chunks = [triples[start:start + chunk_size] for start in range(0, count, chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results[order] = [valid for chunk in pool.map(_verify_chunk, chunks) for valid in chunk]
+    return results
+
+def verify_frame(df, public_key_column='public_key', message_column='message', signature_column='signature',
+                 processes=None):
+    """
+    Verify every row of a DataFrame and return a copy with a boolean 'valid' column.
+    """
+    verified = df.copy()
+    verified['valid'] = verify_batch(df[public_key_column].tolist(), df[message_column].tolist(),
+                                     df[signature_column].tolist(), processes=processes)
+    return verified
+
+def load_triples(path):
+    """
+    Read a CSV with 'public_key', 'signature' (hex) and either 'message' (text) or
+    'message_hex' columns. Returns a DataFrame with the message column as bytes.
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if 'message_hex' in df.columns:
+        df['message'] = [bytes.fromhex(message) for message in df.pop('message_hex')]
+    missing = {'public_key', 'message', 'signature'} - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing columns in {path}: {', '.join(sorted(missing))}")
+    return df
+
+# Benchmark
+def make_test_triples(count, distinct_keys=100, invalid_every=10, seed=0):
+    """
+    Sign synthetic messages with a few generated keys; every invalid_every-th
+    signature is checked against the wrong message.
+    """
+    rng = np.random.default_rng(seed)
+    private_keys = [ec.generate_private_key(ec.SECP256K1()) for _ in range(distinct_keys)]
+    public_keys = [key.public_key().public_bytes(serialization.Encoding.X962,
+                                                 serialization.PublicFormat.CompressedPoint).hex()
+                   for key in private_keys]
+    key_index = rng.integers(0, distinct_keys, count)
+    rows, expected = [], []
+    for i, k in enumerate(key_index.tolist()):
+        message = f"message {i}".encode()
+        signature = private_keys[k].sign(message, _ECDSA_SHA256).hex()
+        valid = not (invalid_every and i % invalid_every == 0)
+        rows.append((public_keys[k], message if valid else message + b"!", signature))
+        expected.append(valid)
+    return pd.DataFrame(rows, columns=['public_key', 'message', 'signature']), np.array(expected)
+
+def benchmark(count=20000, processes=None):
+    """
+    Print verifications per second with one process and with the full pool,
+    and the per-core rate of each.
+    """
+    df, expected = make_test_triples(count)
+    processes = processes or os.cpu_count() or 1
+    for workers in dict.fromkeys([1, processes]):
+        start = time.perf_counter()
+        valid = verify_frame(df, processes=workers)['valid'].to_numpy()
+        elapsed = time.perf_counter() - start
+        status = "results match" if np.array_equal(valid, expected) else "RESULT MISMATCH"
+        print(f"{workers} process(es): {count} signatures in {elapsed:.2f} s, {count / elapsed:.0f} verifications/s, "
+              f"{count / elapsed / workers:.0f} per core ({status})")
+
+# Interactive demo
+def visualize_signature(signature_bytes):
+    import matplotlib.pyplot as plt
+
+    # Convert hex to binary for visualization
+    binary_data = np.unpackbits(np.frombuffer(signature_bytes, dtype=np.uint8))
+
+    # Plot as image
+    plt.imshow(binary_data.reshape(-1, 8), cmap="binary")
+    plt.title("Binary Visualization of Signature")
+    plt.show()
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify secp256k1 ECDSA signatures.")
+    parser.add_argument('--batch', metavar='CSV', help="Verify every row of a CSV file (headless).")
+    parser.add_argument('--output', help="Write batch results to this CSV instead of printing a summary.")
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Benchmark N generated signatures.")
+    parser.add_argument('--headless', action='store_true', help="Verify the demo signature without plotting or a browser.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.processes)
+        return
+
+    if args.batch:
+        df = load_triples(args.batch)
+        start = time.perf_counter()
+        verified = verify_frame(df, processes=args.processes)
+        elapsed = time.perf_counter() - start
+        if args.output:
+            if verified['message'].map(lambda message: isinstance(message, bytes)).all():
+                verified = verified.rename(columns={'message': 'message_hex'})
+                verified['message_hex'] = verified['message_hex'].map(bytes.hex)
+            verified.to_csv(args.output, index=False)
+        print(f"Verified {len(verified)} signatures in {elapsed:.2f} s: {int(verified['valid'].sum())} valid, "
+              f"{int((~verified['valid']).sum())} invalid.")
+        return
+
+    hex_data = bytes.fromhex(DEMO_SIGNATURE_HEX)
+    if not args.headless:
+        visualize_signature(hex_data)
+
+    # Verify the signature
+    if verify_signature(DEMO_PUBLIC_KEY_HEX, DEMO_MESSAGE, hex_data):
+        print("Signature is valid.")
+        url = 'http://example.com'  # Redirect to your desired URL
+    else:
+        print("Signature verification failed.")
+        url = 'http://example.com/fail'  # Redirect to an error URL
+
+    if not args.headless:
+        # Add a slight delay before redirection to ensure the message is printed first
+        time.sleep(2)
+        webbrowser.open(url)
+
+if __name__ == "__main__":
+    main()
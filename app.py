@@ -2,14 +2,23 @@ import pandas as pd
 import plotly.express as px
 import streamlit as st
 import numpy as np
-from cryptography.fernet import Fernet
 from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 import plotly.graph_objects as go
 import networkx as nx
 import random
+import uuid
 from datetime import datetime
+from figure_cache import get_or_build_figure
+from summary_cube import get_summary_cube, type_counts
+from report_engine import write_transaction_report
+from job_queue import JobQueue, JobQueueFull, export_job, report_job
+from transaction_export import EXPORT_FORMATS, export_filename, fraudulent_rows
+from report_service import ReportService
+from report_store import format_report_id
+from price_service import get_usd_valued, refresh_frame_prices_async
+from entity_clusters import cluster_frame
+from column_crypto import ENCRYPTION_KEY_FILE, SENSITIVE_COLUMNS, get_cipher
+from pseudonymize import PSEUDONYM_COLUMNS, pseudonymize_frame
 
 # Upload CSV functionality with error handling
 def upload_transaction_data():
@@ -18,7 +27,7 @@ def upload_transaction_data():
     
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
+            df = pseudonymize_frame(pd.read_csv(uploaded_file))  # Analyses only see keyed pseudonyms
             st.write("Data loaded successfully!")
             st.write(df.head())  # Display first few rows to confirm structure
             return df
@@ -42,7 +51,7 @@ def analyze_blockchain(df):
     if df is not None:
         st.write("Analyzing blockchain data (example: counting transactions by type)...")
         try:
-            st.write(df.groupby('transaction_type').size().reset_index(name='counts'))
+            st.write(type_counts(get_summary_cube(df), name='counts'))
         except Exception as e:
             st.error(f"Error analyzing blockchain: {e}")
     else:
@@ -51,15 +60,28 @@ def analyze_blockchain(df):
 # Anonymity and Pseudonymity
 def analyze_anonymity_pseudonymity(df):
     if df is not None:
-        st.write("Analyzing anonymity and pseudonymity (example: display addresses)...")
+        st.write("Analyzing anonymity and pseudonymity (addresses are keyed pseudonyms)...")
         try:
             unique_addresses = df['address'].unique()
             st.write(unique_addresses)
+            pseudonymized = [column for column in PSEUDONYM_COLUMNS if column in df.columns]
+            st.write(f"{len(unique_addresses)} distinct addresses; pseudonymized columns: {', '.join(pseudonymized)}")
+            show_entity_clusters(df)
         except KeyError as e:
             st.error(f"Missing column for analysis: {e}")
     else:
         st.warning("No data to analyze. Please upload a valid CSV file.")
 
+def show_entity_clusters(df):
+    # Rows sharing a transaction id are inputs spent together (common-input-ownership)
+    if 'transaction_id' not in df.columns:
+        return
+    clustered, clusters = cluster_frame(df)
+    summary = clusters.summary()
+    st.write(f"Entities: {summary['clusters']} from {summary['addresses']} addresses "
+             f"({summary['multi_address_clusters']} with more than one address)")
+    st.write(clusters.cluster_sizes().head(20).rename_axis('cluster_id'))
+
 # Transaction Monitoring
 def monitor_transactions(df):
     if df is not None:
@@ -70,16 +92,34 @@ def monitor_transactions(df):
         st.subheader("Fraudulent Transactions")
         fraudulent = df[df['is_fraudulent']]
         st.write(fraudulent)
+        export_controls('flagged_export', df, row_filter=fraudulent_rows, filename_stem='flagged_transactions')
+
+        st.subheader("High-Value Transactions (USD)")
+        usd_threshold = st.number_input("Flag transactions above (USD)", min_value=0.0, value=1000000.0, step=100000.0)
+        try:
+            valued = get_usd_valued(df, refresh=False)  # Cached prices only; fetching runs in the background
+            if not refresh_frame_prices_async(df).done():
+                st.info("Fetching USD prices in the background; values use the prices cached so far.")
+                st.button("Refresh USD Values")
+            st.write(valued[valued['amount_usd'] >= usd_threshold])
+        except KeyError as e:
+            st.error(f"Missing column for USD valuation: {e}")
     else:
         st.warning("No data to monitor. Please upload a valid CSV file.")
 
 # User Reporting and Collaboration
+@st.cache_resource
+def get_report_service():
+    return ReportService()
+
 def submit_report(transaction_id, reported_by, notes):
     report = {
         "transaction_id": transaction_id,
         "reported_by": reported_by,
         "notes": notes
     }
+    report_id = get_report_service().submit_report(None, None, None, reported_by, notes, transaction_id=transaction_id)
+    report["report_id"] = format_report_id(report_id)
     st.write("Report submitted:", report)
 
 def user_reporting_collaboration():
@@ -92,69 +132,90 @@ def user_reporting_collaboration():
         submit_report(transaction_id, reported_by, notes)
 
 # Data Privacy and Security
-def encrypt_data(key, data):
-    fernet = Fernet(key)
-    encrypted_data = fernet.encrypt(data.encode())
-    return encrypted_data
+def encrypt_data(data):
+    return get_cipher().encrypt(data)
 
-def decrypt_data(key, encrypted_data):
-    fernet = Fernet(key)
-    decrypted_data = fernet.decrypt(encrypted_data).decode()
-    return decrypted_data
+def decrypt_data(encrypted_data):
+    return get_cipher().decrypt(encrypted_data)
 
-def data_privacy_security():
+def data_privacy_security(df=None):
     st.write("Data Privacy and Security")
-    key = Fernet.generate_key()
-    st.write("Encryption Key:", key.decode())
-    
+    st.write("Encryption Key File:", ENCRYPTION_KEY_FILE)
+
     data_to_encrypt = st.text_input("Data to Encrypt")
     if st.button("Encrypt Data"):
-        encrypted_data = encrypt_data(key, data_to_encrypt)
-        st.write("Encrypted Data:", encrypted_data.decode())
+        st.session_state['encrypted_data'] = encrypt_data(data_to_encrypt)
+    if 'encrypted_data' in st.session_state:
+        st.write("Encrypted Data:", st.session_state['encrypted_data'])
         if st.button("Decrypt Data"):
-            decrypted_data = decrypt_data(key, encrypted_data)
-            st.write("Decrypted Data:", decrypted_data)
+            st.write("Decrypted Data:", decrypt_data(st.session_state['encrypted_data']))
+
+    if df is not None:
+        sensitive_columns = [column for column in SENSITIVE_COLUMNS if column in df.columns]
+        columns = st.multiselect("Columns to Encrypt", list(df.columns), default=sensitive_columns)
+        if columns and st.button("Encrypt Columns"):
+            encrypted_df = get_cipher().encrypt_columns(df, columns)
+            st.write(encrypted_df.head())
+            st.download_button("Download Encrypted CSV", encrypted_df.to_csv(index=False),
+                               file_name="encrypted_transactions.csv", mime="text/csv")
 
 # Visualization and Reporting Tools
+def build_transaction_proportions_figure(df):
+    transaction_counts = type_counts(get_summary_cube(df))
+    
+    return px.pie(transaction_counts, values='count', names='transaction_type', title='Transaction Type Proportions')
+
 def visualize_transaction_proportions(df):
     if df is not None:
-        transaction_counts = df['transaction_type'].value_counts().reset_index()
-        transaction_counts.columns = ['transaction_type', 'count']
-        
-        fig = px.pie(transaction_counts, values='count', names='transaction_type', title='Transaction Type Proportions')
+        fig = get_or_build_figure('transaction_proportions', df, build_transaction_proportions_figure, columns=['transaction_type'])
         st.plotly_chart(fig)
     else:
         st.warning("No data to visualize. Please upload a valid CSV file.")
 
 def generate_report(df):
     buffer = BytesIO()
-    report = canvas.Canvas(buffer, pagesize=letter)
-    report.setTitle('Transaction Report')
-    
-    report.setFont('Helvetica-Bold', 16)
-    report.drawString(100, 750, 'Transaction Report')
-    
-    total_transactions = len(df)
-    completed_transactions = df[df['status'] == 'completed'].shape[0]
-    pending_transactions = df[df['status'] == 'pending'].shape[0]
-    failed_transactions = df[df['status'] == 'failed'].shape[0]
+    write_transaction_report(df, buffer)
+    return buffer
+
+# Background Jobs
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+def session_owner():
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+def show_job_status(job_id, label, mime):
+    status = get_job_queue().status(job_id)
+    if status is None:
+        return
     
-    report.setFont('Helvetica', 12)
-    report.drawString(100, 700, f'Total Transactions: {total_transactions}')
-    report.drawString(100, 680, f'Completed Transactions: {completed_transactions}')
-    report.drawString(100, 660, f'Pending Transactions: {pending_transactions}')
-    report.drawString(100, 640, f'Failed Transactions: {failed_transactions}')
+    if status['state'] == 'done':
+        with open(status['artifact_path'], 'rb') as artifact:
+            st.download_button(label=label, data=artifact, file_name=status['filename'], mime=mime)
+    elif status['state'] == 'failed':
+        st.error(f"Job failed: {status['error']}")
+    else:
+        st.write(f"Job {status['state']}...")
+        st.progress(status['progress'] or 0.0)
+        st.button("Refresh Status", key=f"refresh_{job_id}")
+
+def export_controls(key, source, row_filter=None, filename_stem='export'):
+    fmt = st.selectbox("Export format", EXPORT_FORMATS, key=f"{key}_format")
+    compress = st.checkbox("Compress export", key=f"{key}_compress")
     
-    report.drawString(100, 600, 'Transaction Details:')
-    text = report.beginText(100, 580)
-    text.setFont('Helvetica', 10)
-    for index, row in df.iterrows():
-        text.textLine(f"ID: {row['transaction_id']}, Type: {row['transaction_type']}, Amount: ${row['amount']}, Status: {row['status']}, Fraudulent: {row['is_fraudulent']}, Date: {row['timestamp']}")
-    report.drawText(text)
+    if st.button("Export", key=f"{key}_button"):
+        try:
+            st.session_state[f"{key}_job_id"] = get_job_queue().submit(
+                'export', export_job, source, fmt, row_filter=row_filter, compress=compress,
+                filename=export_filename(filename_stem, fmt, compress), owner=session_owner())
+        except JobQueueFull as e:
+            st.warning(str(e))
     
-    report.save()
-    buffer.seek(0)
-    return buffer
+    if f"{key}_job_id" in st.session_state:
+        show_job_status(st.session_state[f"{key}_job_id"], "Download Export", "application/octet-stream")
 
 def visualization_reporting_tools(df):
     if df is not None:
@@ -162,13 +223,14 @@ def visualization_reporting_tools(df):
         visualize_transaction_proportions(df)
         
         if st.button("Generate PDF Report"):
-            report_buffer = generate_report(df)
-            st.download_button(
-                label="Download Report as PDF",
-                data=report_buffer,
-                file_name="transaction_report.pdf",
-                mime="application/pdf"
-            )
+            try:
+                st.session_state['report_job_id'] = get_job_queue().submit(
+                    'report', report_job, df, filename="transaction_report.pdf", owner=session_owner())
+            except JobQueueFull as e:
+                st.warning(str(e))
+        
+        if 'report_job_id' in st.session_state:
+            show_job_status(st.session_state['report_job_id'], "Download Report as PDF", "application/pdf")
     else:
         st.warning("No data to visualize or generate a report. Please upload a valid CSV file.")
 
@@ -178,6 +240,7 @@ def peer_to_peer_transaction_count(df):
         st.write("Counting peer-to-peer transactions...")
         peer_count = df.groupby(['address', 'recipient']).size().reset_index(name='transaction_count')
         st.write(peer_count)
+        export_controls('peer_count_export', peer_count, filename_stem='peer_to_peer_counts')
     else:
         st.warning("No data to count. Please upload a valid CSV file.")
 
@@ -231,7 +294,7 @@ def main():
         analyze_anonymity_pseudonymity(df)
         monitor_transactions(df)
         user_reporting_collaboration()
-        data_privacy_security()
+        data_privacy_security(df)
         visualization_reporting_tools(df)
         peer_to_peer_transaction_count(df)
         simulate_transactions(df)
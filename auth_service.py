@@ -0,0 +1,202 @@
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+USER_DATA_FILE = 'users.json'
+
+SESSION_TTL = 30 * 60  # Seconds a session stays valid after its last use
+HASH_WORKERS = min(8, os.cpu_count() or 1)  # bcrypt releases the GIL, so threads run hashes in parallel
+
+# Hash passwords securely
+def hash_password(password):
+    salt = bcrypt.gensalt()
+    hashed = bcrypt.hashpw(password.encode(), salt)
+    return hashed.decode()
+
+# Verify password
+def verify_password(stored_password, provided_password):
+    return bcrypt.checkpw(provided_password.encode(), stored_password.encode())
+
+# Checked against for unknown users, so a miss takes as long as a wrong password.
+# Computed on the first unknown-user login rather than at import.
+_dummy_hash = None
+_dummy_hash_lock = threading.Lock()
+
+def _get_dummy_hash():
+    global _dummy_hash
+    if _dummy_hash is None:
+        with _dummy_hash_lock:
+            if _dummy_hash is None:
+                _dummy_hash = hash_password(secrets.token_hex(16))
+    return _dummy_hash
+
+def _write_json_atomic(path, data):
+    temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_file, 'w') as output_file:
+        json.dump(data, output_file)
+        output_file.flush()
+        os.fsync(output_file.fileno())
+    os.replace(temp_file, path)  # Readers see the old or the new file, never a partial one
+
+class AuthService:
+    """
+    Keeps the user table in memory and hands out session tokens.
+
+    The user file is re-read only when its modification time or size changes, and
+    registrations replace it atomically (write to a temporary file, then rename).
+    bcrypt work runs on a thread pool, so concurrent logins don't queue behind each
+    other, and a successful login returns a token that later operations check with a
+    dictionary lookup instead of another bcrypt hash.
+    """
+
+    def __init__(self, user_file=USER_DATA_FILE, workers=HASH_WORKERS, session_ttl=SESSION_TTL):
+        self.user_file = user_file
+        self.session_ttl = session_ttl
+        self.workers = workers
+        self._users = {}
+        self._signature = None
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+
+    # User table
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.user_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        # Caller holds the lock
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        if signature is None:
+            self._users = {}
+        else:
+            with open(self.user_file, 'r') as user_file:
+                self._users = json.load(user_file)
+        self._signature = signature
+
+    def users(self):
+        with self._lock:
+            self._refresh()
+            return dict(self._users)
+
+    def has_users(self):
+        with self._lock:
+            self._refresh()
+            return bool(self._users)
+
+    # Registration
+    def register_async(self, username, password):
+        return self._pool.submit(self._register, username, password)
+
+    def register(self, username, password):
+        """
+        Add a user. Returns False if the username is taken.
+        """
+        return self.register_async(username, password).result()
+
+    def _register(self, username, password):
+        with self._lock:
+            self._refresh()
+            if username in self._users:
+                return False
+        hashed = hash_password(password)  # Outside the lock: other logins keep going
+        with self._lock:
+            self._refresh()
+            if username in self._users:
+                return False
+            users = dict(self._users)
+            users[username] = hashed
+            _write_json_atomic(self.user_file, users)
+            self._users, self._signature = users, self._file_signature()
+        return True
+
+    # Login and sessions
+    def authenticate_async(self, username, password):
+        return self._pool.submit(self._authenticate, username, password)
+
+    def authenticate(self, username, password):
+        """
+        Check a password and open a session.
+
+        Returns:
+            str: Session token, or None if the credentials are wrong.
+        """
+        return self.authenticate_async(username, password).result()
+
+    def _authenticate(self, username, password):
+        with self._lock:
+            self._refresh()
+            stored = self._users.get(username)
+        valid = verify_password(stored or _get_dummy_hash(), password)
+        if stored is None or not valid:
+            return None
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = (username, time.monotonic() + self.session_ttl)
+        return token
+
+    def validate_session(self, token):
+        """
+        Return the username of a live session (extending its expiry), or None.
+        """
+        if token is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            username, expires = session
+            if expires < now or username not in self._users:
+                del self._sessions[token]
+                return None
+            self._sessions[token] = (username, now + self.session_ttl)
+            return username
+
+    def logout(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            self._sessions.clear()
+
+# Benchmark: concurrent logins on the pool versus one at a time
+def benchmark(logins=16):
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        service = AuthService(os.path.join(scratch_dir, 'users.json'))
+        for i in range(4):
+            service.register(f"user{i}", f"password{i}")
+
+        start = time.perf_counter()
+        for i in range(logins):
+            verify_password(service.users()[f"user{i % 4}"], f"password{i % 4}")
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tokens = [future.result() for future in [service.authenticate_async(f"user{i % 4}", f"password{i % 4}")
+                                                 for i in range(logins)]]
+        pooled = time.perf_counter() - start
+
+        start = time.perf_counter()
+        checks = sum(service.validate_session(token) is not None for token in tokens for _ in range(1000))
+        session_time = time.perf_counter() - start
+        service.close()
+
+    print(f"{logins} logins: {serial:.2f} s one at a time, {pooled:.2f} s on {service.workers} threads")
+    print(f"{checks} session checks in {session_time * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,271 @@
+import asyncio
+import os
+import random
+import time
+
+import aiohttp
+
+import chain_archive
+from chain_archive import archive_address_snapshot, get_address_snapshot
+from http_cache import ADDRESS_TTL, cached_get_json, get_cached, get_json, put_cached
+
+# BlockCypher API settings (override the base URL to point at a mock server)
+BLOCKCYPHER_API = os.environ.get('BLOCKCYPHER_API', 'https://api.blockcypher.com/v1/btc/main')
+BLOCKCYPHER_TOKEN = os.environ.get('BLOCKCYPHER_TOKEN')
+REQUEST_TIMEOUT = 30
+
+# Concurrency and rate limiting for bulk fetches. The free tier allows 3 requests/second;
+# raise BLOCKCYPHER_RATE to match a paid plan's limit.
+DEFAULT_CONCURRENCY = 20
+DEFAULT_RATE = float(os.environ.get('BLOCKCYPHER_RATE', '3'))
+
+# Transactions per page when walking an address's history (BlockCypher's maximum is 50)
+HISTORY_PAGE_LIMIT = 50
+
+# Inputs/outputs returned per transaction by /full (BlockCypher's default is 20). Larger
+# transactions are still cut off and carry next_inputs/next_outputs links.
+TX_IO_LIMIT = 1000
+
+# Retry settings for transient errors
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def address_full_url(address):
+    return f"{BLOCKCYPHER_API}/addrs/{address}/full"
+
+def _with_token(params):
+    params = dict(params or {})
+    if BLOCKCYPHER_TOKEN:
+        params['token'] = BLOCKCYPHER_TOKEN
+    return params
+
+def _address_params(params):
+    return {'txlimit': TX_IO_LIMIT, **(params or {})}
+
+def is_truncated(tx):
+    """
+    True if BlockCypher cut off the transaction's inputs or outputs (see TX_IO_LIMIT).
+    """
+    return 'next_inputs' in tx or 'next_outputs' in tx
+
+def _archived_address(address):
+    # Offline runs accept snapshots of any age; otherwise only fresh ones
+    return get_address_snapshot(address, max_age=None if chain_archive.OFFLINE else ADDRESS_TTL)
+
+# Fetch one address (blocking; address snapshots are kept in the archive, not the response cache)
+def get_transaction_data(address):
+    data = _archived_address(address)
+    if data is not None:
+        return data
+
+    data = get_json(address_full_url(address), params=_with_token(_address_params(None)), timeout=REQUEST_TIMEOUT)
+    if 'error' not in data:
+        archive_address_snapshot(address, data)
+    return data
+
+# Walk an address's complete history, one page at a time
+def iter_address_transactions(address, summary=None, first_page=None, page_limit=HISTORY_PAGE_LIMIT, after=None):
+    """
+    Yield every transaction of an address, newest first, following BlockCypher's paging cursor.
+
+    Pages are requested with before=<height> and overlap by one block, so transactions of
+    a block split across two pages aren't lost; duplicates from the overlap are skipped.
+    Only the current page is held in memory.
+
+    Args:
+        address (str): Bitcoin address.
+        summary (dict): If given, filled with the address fields of the first page
+            (final_balance, n_tx, ...), 'error' if a page fails to load or transactions
+            had to be skipped, and 'truncated' (the number of transactions with inputs
+            or outputs cut off).
+        first_page (dict): An already fetched first page (e.g. from fetch_addresses).
+        page_limit (int): Transactions per page request.
+        after (int): Only return transactions above this block height.
+
+    Yields:
+        dict: Transaction objects as returned by the /full endpoint.
+    """
+    base_params = _address_params({'limit': page_limit})
+    if after is not None:
+        base_params['after'] = after
+
+    before = None
+    overlap_hashes = set()
+    data = first_page
+    while True:
+        if data is None:
+            params = dict(base_params)
+            if before is not None:
+                params['before'] = before
+            data = cached_get_json(address_full_url(address), params=_with_token(params), ttl=ADDRESS_TTL,
+                                   timeout=REQUEST_TIMEOUT)
+
+        if 'error' in data:
+            if summary is not None:
+                summary['error'] = data['error']
+            return
+        if summary is not None and before is None:
+            summary.update({key: value for key, value in data.items() if key not in ('txs', 'hasMore')})
+
+        txs = data.get('txs', [])
+        for tx in txs:
+            if tx['hash'] not in overlap_hashes:
+                if summary is not None and is_truncated(tx):
+                    summary['truncated'] = summary.get('truncated', 0) + 1
+                yield tx
+
+        if not data.get('hasMore'):
+            return
+        confirmed_heights = [tx['block_height'] for tx in txs if tx.get('block_height', -1) >= 0]
+        if not confirmed_heights:
+            # A page of unconfirmed transactions gives the height cursor nothing to continue from
+            if summary is not None:
+                summary.setdefault('error', f"Could not page past {len(txs)} unconfirmed transactions of {address}")
+            return
+
+        lowest = min(confirmed_heights)
+        if before == lowest + 1:
+            # A single block holds more transactions than a page; the height cursor can't
+            # split it, so skip the rest of that block rather than loop forever
+            if summary is not None:
+                summary.setdefault('error', f"Block {lowest} has more than {len(txs)} transactions for {address}; "
+                                            "some were skipped")
+            before, overlap_hashes = lowest, set()
+        else:
+            before = lowest + 1
+            overlap_hashes = {tx['hash'] for tx in txs if tx.get('block_height') == lowest}
+        data = None
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter.
+
+    Allows bursts of up to `capacity` requests, refilling at `rate` tokens per second.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def _backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX) * random.uniform(0.5, 1.5)
+
+def _record(stats, key, value=1):
+    if stats is None:
+        return
+    if key == 'latencies':
+        stats.setdefault(key, []).append(value)
+    else:
+        stats[key] = stats.get(key, 0) + value
+
+async def fetch_json(session, url, params, limiter, semaphore, max_retries=MAX_RETRIES, stats=None):
+    """
+    GET a JSON document, retrying 429/5xx responses and network errors with exponential backoff.
+
+    Returns:
+        dict: The decoded response, or {'error': message} once retries are exhausted.
+    """
+    error = None
+    for attempt in range(max_retries + 1):
+        retry_after = None
+        async with semaphore:
+            await limiter.acquire()
+            started = time.perf_counter()
+            try:
+                async with session.get(url, params=_with_token(params)) as response:
+                    if response.status not in RETRY_STATUSES:
+                        data = await response.json(content_type=None)
+                        _record(stats, 'latencies', time.perf_counter() - started)
+                        return data
+                    retry_after = response.headers.get('Retry-After')
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = str(e) or type(e).__name__
+
+        if attempt < max_retries:
+            _record(stats, 'retries')
+            await asyncio.sleep(_backoff_delay(attempt, retry_after))
+
+    _record(stats, 'errors')
+    return {'error': f"Request failed after {max_retries + 1} attempts: {error}"}
+
+async def fetch_addresses_async(addresses, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                                params_by_address=None, max_retries=MAX_RETRIES, stats=None, use_cache=True):
+    limiter = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    params_by_address = params_by_address or {}
+
+    # Plain snapshots are stored in the archive; responses to extra parameters (paging,
+    # after=) are partial, so they go to the response cache instead
+    results = {}
+    for address in dict.fromkeys(addresses):
+        params = params_by_address.get(address)
+        if not use_cache:
+            results[address] = None
+        elif params:
+            results[address] = get_cached(address_full_url(address), _address_params(params))
+        else:
+            results[address] = _archived_address(address)
+    missing = [address for address, data in results.items() if data is None]
+    _record(stats, 'cache_hits', len(results) - len(missing))
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        fetched = await asyncio.gather(*(
+            fetch_json(session, address_full_url(address), _address_params(params_by_address.get(address)), limiter,
+                       semaphore, max_retries, stats)
+            for address in missing
+        ))
+
+    for address, data in zip(missing, fetched):
+        results[address] = data
+        if 'error' not in data:
+            params = params_by_address.get(address)
+            if params:
+                put_cached(address_full_url(address), _address_params(params), data, ADDRESS_TTL)
+            else:
+                archive_address_snapshot(address, data)
+    return results
+
+# Fetch many addresses concurrently (blocking wrapper)
+def fetch_addresses(addresses, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, params_by_address=None,
+                    max_retries=MAX_RETRIES, stats=None, use_cache=True):
+    """
+    Fetch the /full endpoint for many addresses at once.
+
+    Args:
+        addresses (list): Bitcoin addresses to fetch.
+        concurrency (int): Maximum requests in flight.
+        rate (float): Maximum requests per second (token bucket).
+        params_by_address (dict): Extra query parameters per address.
+        max_retries (int): Retries per address for 429/5xx and network errors.
+        stats (dict): If given, filled with 'latencies', 'retries', 'errors' and 'cache_hits'.
+        use_cache (bool): Serve fresh archived/cached responses; False always asks the API
+            (responses are still stored).
+
+    Returns:
+        dict: Address -> response JSON (or {'error': ...}), in input order.
+    """
+    return asyncio.run(fetch_addresses_async(addresses, concurrency, rate, params_by_address, max_retries, stats,
+                                             use_cache))
@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Local archive of fetched blocks, transactions and address snapshots
+ARCHIVE_FILE = 'chain_archive.db'
+
+# Set BLOCKCHAIN_OFFLINE=1 to serve address lookups from archived snapshots of any age
+OFFLINE = os.environ.get('BLOCKCHAIN_OFFLINE') == '1'
+
+_local = threading.local()
+
+def _connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != ARCHIVE_FILE:
+        conn = sqlite3.connect(ARCHIVE_FILE, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS blocks (
+                        hash TEXT PRIMARY KEY,
+                        height INTEGER,
+                        time INTEGER,
+                        tx_count INTEGER,
+                        header BLOB)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS transactions (
+                        hash TEXT PRIMARY KEY,
+                        block_hash TEXT,
+                        block_height INTEGER,
+                        position INTEGER,
+                        payload BLOB)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS tx_addresses (
+                        address TEXT,
+                        tx_hash TEXT,
+                        block_height INTEGER,
+                        PRIMARY KEY (address, tx_hash)) WITHOUT ROWID""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS address_snapshots (
+                        address TEXT PRIMARY KEY,
+                        fetched_at REAL,
+                        payload BLOB)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS raw_blocks (
+                        hash TEXT PRIMARY KEY,
+                        data BLOB)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_blocks_height ON blocks(height)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_block ON transactions(block_hash, position)")
+        _local.conn, _local.path = conn, ARCHIVE_FILE
+    return conn
+
+def _pack(data):
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode())
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob))
+
+def _transaction_addresses(tx):
+    addresses = {(tx_input.get("prev_out") or {}).get("addr") for tx_input in tx.get("inputs", [])}
+    addresses.update(tx_output.get("addr") for tx_output in tx.get("out", []))
+    addresses.discard(None)
+    return addresses
+
+def _insert_transaction(conn, tx, block_hash=None, block_height=None, position=None):
+    block_height = tx.get("block_height", block_height)
+    conn.execute("INSERT OR REPLACE INTO transactions (hash, block_hash, block_height, position, payload) VALUES (?, ?, ?, ?, ?)",
+                 (tx["hash"], block_hash, block_height, position, _pack(tx)))
+    conn.executemany("INSERT OR REPLACE INTO tx_addresses (address, tx_hash, block_height) VALUES (?, ?, ?)",
+                     [(address, tx["hash"], block_height) for address in _transaction_addresses(tx)])
+
+# Ingest blockchain.info rawblock / rawtx payloads
+def archive_block(block):
+    """
+    Store a rawblock payload: the header plus every transaction, indexed by height,
+    transaction hash and address.
+    """
+    conn = _connection()
+    header = {key: value for key, value in block.items() if key != "tx"}
+    transactions = block.get("tx", [])
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR REPLACE INTO blocks (hash, height, time, tx_count, header) VALUES (?, ?, ?, ?, ?)",
+                     (block["hash"], block.get("height"), block.get("time"), len(transactions), _pack(header)))
+        for position, tx in enumerate(transactions):
+            _insert_transaction(conn, tx, block["hash"], block.get("height"), position)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:  # A failed COMMIT leaves the long-lived connection inside the transaction
+            conn.execute("ROLLBACK")
+        raise
+
+def archive_transaction(tx):
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _insert_transaction(conn, tx)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+def _load_block(conn, row):
+    block = _unpack(row[0])
+    block["tx"] = [_unpack(payload) for (payload,) in conn.execute(
+        "SELECT payload FROM transactions WHERE block_hash = ? ORDER BY position", (block["hash"],))]
+    return block
+
+def get_block(block_hash):
+    conn = _connection()
+    row = conn.execute("SELECT header, tx_count FROM blocks WHERE hash = ?", (block_hash,)).fetchone()
+    if row is None:
+        return None
+    block = _load_block(conn, row)
+    return block if len(block["tx"]) == row[1] else None  # Incomplete archive entries are refetched
+
+def get_block_by_height(height):
+    conn = _connection()
+    row = conn.execute("SELECT header, tx_count FROM blocks WHERE height = ? LIMIT 1", (height,)).fetchone()
+    return _load_block(conn, row) if row is not None else None
+
+# Binary block serializations (see raw_block.py)
+def archive_raw_block(block_hash, data):
+    _connection().execute("INSERT OR REPLACE INTO raw_blocks (hash, data) VALUES (?, ?)", (block_hash, zlib.compress(data)))
+
+def get_raw_block(block_hash):
+    row = _connection().execute("SELECT data FROM raw_blocks WHERE hash = ?", (block_hash,)).fetchone()
+    return zlib.decompress(row[0]) if row is not None else None
+
+def get_transaction(tx_hash):
+    row = _connection().execute("SELECT payload FROM transactions WHERE hash = ?", (tx_hash,)).fetchone()
+    return _unpack(row[0]) if row is not None else None
+
+def get_address_transactions(address, limit=None):
+    """
+    Return archived transactions touching an address, newest block first.
+    """
+    query = """SELECT t.payload FROM tx_addresses a JOIN transactions t ON t.hash = a.tx_hash
+               WHERE a.address = ? ORDER BY a.block_height DESC"""
+    params = (address,)
+    if limit is not None:
+        query += " LIMIT ?"
+        params += (limit,)
+    return [_unpack(payload) for (payload,) in _connection().execute(query, params)]
+
+# BlockCypher address payloads (balances change, so these are timestamped snapshots)
+def archive_address_snapshot(address, data):
+    _connection().execute("INSERT OR REPLACE INTO address_snapshots (address, fetched_at, payload) VALUES (?, ?, ?)",
+                          (address, time.time(), _pack(data)))
+
+def get_address_snapshot(address, max_age=None):
+    """
+    Return the archived address payload, or None if there is none or it is older than max_age seconds.
+    """
+    row = _connection().execute("SELECT fetched_at, payload FROM address_snapshots WHERE address = ?", (address,)).fetchone()
+    if row is None or (max_age is not None and time.time() - row[0] > max_age):
+        return None
+    return _unpack(row[1])
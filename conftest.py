@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+class FailingCommit:
+    """Connection wrapper whose first COMMIT fails, as it would with SQLITE_BUSY."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.fail_next_commit = True
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT" and self.fail_next_commit:
+            self.fail_next_commit = False
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+@pytest.fixture
+def failing_commit():
+    """Wrap a connection so that its next COMMIT raises sqlite3.OperationalError."""
+    return FailingCommit
+
+@pytest.fixture
+def mock_server(monkeypatch, tmp_path):
+    """Start mock API servers with the given config and point the fetch modules at them."""
+    import blockcypher
+    import chain_archive
+    import http_cache
+    from mock_api import point_fetchers_at, start_mock_server
+
+    servers = []
+
+    def start(**config):
+        server = start_mock_server(**config)
+        servers.append(server)
+        # point_fetchers_at patches module globals and the environment; undo that afterwards
+        monkeypatch.setattr(blockcypher, 'BLOCKCYPHER_API', blockcypher.BLOCKCYPHER_API)
+        monkeypatch.setattr(http_cache, 'CACHE_FILE', http_cache.CACHE_FILE)
+        monkeypatch.setattr(chain_archive, 'ARCHIVE_FILE', chain_archive.ARCHIVE_FILE)
+        monkeypatch.setenv('BLOCKCHAIN_INFO_API', '')
+        monkeypatch.setenv('COINGECKO_API', '')
+        scratch_dir = tmp_path / f"mock_api_{len(servers)}"
+        scratch_dir.mkdir()
+        point_fetchers_at(server.base_url, str(scratch_dir))
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.io as pio
+
+# Cache settings for serialized Plotly figures
+FIGURE_CACHE_DIR = '.figure_cache'
+MAX_MEMORY_FIGURES = 32
+MAX_DISK_BYTES = 64 * 1024 * 1024  # 64 MB
+
+# In-memory LRU tier: cache key -> figure JSON
+_memory_cache = OrderedDict()
+
+# Fingerprint the data a chart is built from
+def frame_fingerprint(df, columns=None):
+    """
+    Hash the contents of a DataFrame (or a subset of its columns).
+
+    Args:
+        df (pd.DataFrame): Data the chart is built from.
+        columns (list): Only hash these columns, if given.
+
+    Returns:
+        str: Hex digest that changes whenever the data changes.
+    """
+    data = df if columns is None else df[list(columns)]
+    digest = hashlib.sha256()
+    digest.update(','.join(map(str, data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def figure_cache_key(chart_name, fingerprint, **params):
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(f"{chart_name}|{fingerprint}|{payload}".encode()).hexdigest()
+
+def _disk_path(key):
+    return os.path.join(FIGURE_CACHE_DIR, f"{key}.json")
+
+def _remember(key, fig_json):
+    _memory_cache[key] = fig_json
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MAX_MEMORY_FIGURES:
+        _memory_cache.popitem(last=False)
+
+def _load_cached_figure(key):
+    fig_json = _memory_cache.get(key)
+    if fig_json is not None:
+        _memory_cache.move_to_end(key)
+        return fig_json
+
+    path = _disk_path(key)
+    try:
+        with open(path, 'r') as cache_file:
+            fig_json = cache_file.read()
+        os.utime(path)  # Mark as recently used for eviction
+    except OSError:
+        return None
+
+    _remember(key, fig_json)
+    return fig_json
+
+def _evict_disk_cache():
+    try:
+        entries = [os.path.join(FIGURE_CACHE_DIR, name) for name in os.listdir(FIGURE_CACHE_DIR)]
+    except OSError:
+        return
+
+    stats = []
+    for path in entries:
+        try:
+            stats.append((os.path.getmtime(path), os.path.getsize(path), path))
+        except OSError:
+            continue
+
+    total_size = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):  # Oldest access first
+        if total_size <= MAX_DISK_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_size -= size
+
+def _store_cached_figure(key, fig_json):
+    _remember(key, fig_json)
+
+    try:
+        os.makedirs(FIGURE_CACHE_DIR, exist_ok=True)
+        temp_path = f"{_disk_path(key)}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as cache_file:
+            cache_file.write(fig_json)
+        os.replace(temp_path, _disk_path(key))
+    except OSError as e:
+        print(f"Could not write figure cache entry: {e}")
+        return
+
+    _evict_disk_cache()
+
+# Return a cached figure, building and caching it only when the data or parameters changed
+def get_or_build_figure(chart_name, df, build_figure, columns=None, **params):
+    """
+    Look up a chart by data hash and parameters, building it on a miss.
+
+    Args:
+        chart_name (str): Name of the chart, part of the cache key.
+        df (pd.DataFrame): Data passed to build_figure.
+        build_figure (callable): Called as build_figure(df, **params) on a miss.
+        columns (list): Columns the chart reads; other columns don't affect the key.
+        **params: Chart parameters, part of the cache key.
+
+    Returns:
+        plotly.graph_objects.Figure: The cached or freshly built figure.
+    """
+    key = figure_cache_key(chart_name, frame_fingerprint(df, columns), **params)
+    fig_json = _load_cached_figure(key)
+
+    if fig_json is None:
+        fig = build_figure(df, **params)
+        fig_json = pio.to_json(fig, validate=False)
+        _store_cached_figure(key, fig_json)
+
+    return pio.from_json(fig_json, skip_invalid=True)
+
+def clear_figure_cache():
+    _memory_cache.clear()
+    if os.path.isdir(FIGURE_CACHE_DIR):
+        for name in os.listdir(FIGURE_CACHE_DIR):
+            try:
+                os.remove(os.path.join(FIGURE_CACHE_DIR, name))
+            except OSError:
+                continue
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+
+import requests
+
+# Local response cache for blockchain and price API calls
+CACHE_FILE = 'http_cache.db'
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # 256 MB of compressed responses
+EVICTION_CHECK_INTERVAL = 50  # Check the size cap every N writes
+REQUEST_TIMEOUT = 30
+
+# Expiry policies (seconds); PERMANENT entries never expire
+PERMANENT = None
+ADDRESS_TTL = 5 * 60
+PRICE_TTL = 60
+UNCONFIRMED_TX_TTL = 60
+
+# Query parameters that don't change the response
+IGNORED_PARAMS = {'token'}
+
+_local = threading.local()
+_writes_since_check = 0  # Shared by every thread that writes; guarded by _writes_lock
+_writes_lock = threading.Lock()
+
+def _connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != CACHE_FILE:
+        conn = sqlite3.connect(CACHE_FILE, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        url TEXT,
+                        body BLOB,
+                        size INTEGER,
+                        expires_at REAL,
+                        last_access REAL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        _local.conn, _local.path = conn, CACHE_FILE
+    return conn
+
+def cache_key(url, params=None):
+    kept = sorted((k, str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+    return hashlib.sha256(f"{url}?{urlencode(kept)}".encode()).hexdigest()
+
+def get_cached(url, params=None):
+    """
+    Return the cached JSON for a request, or None if it is missing or expired.
+    """
+    conn = _connection()
+    key = cache_key(url, params)
+    row = conn.execute("SELECT body, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+
+    body, expires_at = row
+    now = time.time()
+    if expires_at is not None and expires_at < now:
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        return None
+
+    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+    return json.loads(zlib.decompress(body))
+
+def put_cached(url, params, data, ttl=PERMANENT):
+    global _writes_since_check
+    conn = _connection()
+    body = zlib.compress(json.dumps(data, separators=(',', ':')).encode())
+    now = time.time()
+    expires_at = None if ttl is None else now + ttl
+    conn.execute("INSERT OR REPLACE INTO responses (key, url, body, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                 (cache_key(url, params), url, body, len(body), expires_at, now))
+
+    with _writes_lock:
+        _writes_since_check += 1
+        check = _writes_since_check >= EVICTION_CHECK_INTERVAL
+        if check:
+            _writes_since_check = 0
+    if check:
+        evict()
+
+def evict(max_bytes=None):
+    """
+    Drop expired entries, then least recently used ones until the cache fits its size cap.
+    """
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    conn = _connection()
+    conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+
+    total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total_size <= max_bytes:
+        return
+
+    target = max_bytes * 0.9  # Leave headroom so we don't evict on every write
+    to_delete = []
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+        if total_size <= target:
+            break
+        to_delete.append((key,))
+        total_size -= size
+    conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+# GET a JSON document without caching it (for callers that archive the result themselves)
+def get_json(url, params=None, raise_for_status=False, timeout=REQUEST_TIMEOUT):
+    response = requests.get(url, params=params, timeout=timeout)
+    if raise_for_status:
+        response.raise_for_status()
+    return response.json()
+
+# GET a JSON document through the cache
+def cached_get_json(url, params=None, ttl=PERMANENT, raise_for_status=False, timeout=REQUEST_TIMEOUT):
+    """
+    Fetch JSON from the cache, or from the network on a miss.
+
+    Args:
+        url (str): Endpoint URL.
+        params (dict): Query parameters; part of the cache key (except API tokens).
+        ttl: Seconds until the entry expires, PERMANENT for immutable objects, or a
+            callable taking the response data and returning one of those.
+        raise_for_status (bool): Raise requests.HTTPError on 4xx/5xx responses.
+        timeout (int): Request timeout in seconds.
+
+    Returns:
+        dict: The decoded JSON response.
+    """
+    data = get_cached(url, params)
+    if data is not None:
+        return data
+
+    response = requests.get(url, params=params, timeout=timeout)
+    if raise_for_status:
+        response.raise_for_status()
+    data = response.json()
+
+    if response.ok and not (isinstance(data, dict) and 'error' in data):
+        put_cached(url, params, data, ttl(data) if callable(ttl) else ttl)
+    return data
+
+def transaction_ttl(data):
+    # Confirmed transactions never change; unconfirmed ones may still be replaced
+    confirmed = data.get('block_height') not in (None, -1)
+    return PERMANENT if confirmed else UNCONFIRMED_TX_TTL
@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from report_engine import write_transaction_report
+from transaction_export import export_rows
+
+# Queue settings
+JOB_ARTIFACT_DIR = 'job_artifacts'
+MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # Leave cores free for interactive work
+MAX_ACTIVE_JOBS = 20
+MAX_ACTIVE_JOBS_PER_OWNER = 2
+ARTIFACT_TTL_SECONDS = 60 * 60
+
+class JobQueueFull(RuntimeError):
+    pass
+
+def _run_job(job_id, progress_table, func, artifact_path, args, kwargs):
+    def report_progress(done, total=None):
+        fraction = min(done / total, 1.0) if total else None
+        progress_table[job_id] = ('running', fraction)
+
+    progress_table[job_id] = ('running', 0.0)
+    try:
+        result = func(artifact_path, *args, progress=report_progress, **kwargs)
+    except Exception:
+        progress_table[job_id] = ('failed', None)
+        raise RuntimeError(traceback.format_exc())
+    progress_table[job_id] = ('done', 1.0)
+    return result
+
+class JobQueue:
+    """
+    Local job queue that runs long jobs on a process pool, off the Streamlit script thread.
+
+    A job function is called as func(artifact_path, *args, progress=callback, **kwargs),
+    writes its output to artifact_path and reports progress with callback(done, total).
+    Finished artifacts stay on disk for download until they expire, counted from when
+    the job finished.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_active_jobs=MAX_ACTIVE_JOBS,
+                 max_active_per_owner=MAX_ACTIVE_JOBS_PER_OWNER, artifact_dir=JOB_ARTIFACT_DIR):
+        context = multiprocessing.get_context('spawn')
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        self._manager = context.Manager()
+        self._progress = self._manager.dict()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.max_active_jobs = max_active_jobs
+        self.max_active_per_owner = max_active_per_owner
+        self.artifact_dir = artifact_dir
+        os.makedirs(artifact_dir, exist_ok=True)
+
+    def _active_jobs(self, owner=None):
+        return [job for job in self._jobs.values()
+                if not job['future'].done() and (owner is None or job['owner'] == owner)]
+
+    def submit(self, kind, func, *args, filename='artifact', owner=None, **kwargs):
+        """
+        Queue a job and return its ID.
+
+        Raises:
+            JobQueueFull: Too many jobs are queued or running, overall or for this owner.
+        """
+        self.cleanup()
+        with self._lock:
+            if len(self._active_jobs()) >= self.max_active_jobs:
+                raise JobQueueFull("Too many jobs are running. Please try again shortly.")
+            if owner is not None and len(self._active_jobs(owner)) >= self.max_active_per_owner:
+                raise JobQueueFull("You already have the maximum number of jobs running.")
+
+            job_id = uuid.uuid4().hex
+            artifact_path = os.path.join(self.artifact_dir, f"{job_id}-{filename}")
+            self._progress[job_id] = ('queued', 0.0)
+            future = self._executor.submit(_run_job, job_id, self._progress, func, artifact_path, args, kwargs)
+            job = {
+                'kind': kind,
+                'owner': owner,
+                'filename': filename,
+                'artifact_path': artifact_path,
+                'submitted': time.time(),
+                'finished': None,
+                'future': future,
+            }
+            self._jobs[job_id] = job
+        future.add_done_callback(lambda _: job.update(finished=time.time()))
+        return job_id
+
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        state, progress = self._progress.get(job_id, ('queued', 0.0))
+        status = {
+            'job_id': job_id,
+            'kind': job['kind'],
+            'state': state,
+            'progress': progress,
+            'filename': job['filename'],
+            'artifact_path': None,
+            'result': None,
+            'error': None,
+            'submitted': job['submitted'],
+            'finished': job['finished'],
+        }
+
+        future = job['future']
+        if future.done():
+            error = future.exception()
+            if error is not None:
+                status['state'] = 'failed'
+                status['error'] = str(error)
+            else:
+                status['state'] = 'done'
+                status['progress'] = 1.0
+                status['result'] = future.result()
+                status['artifact_path'] = job['artifact_path']
+        return status
+
+    def list_jobs(self, owner=None):
+        return [self.status(job_id) for job_id, job in list(self._jobs.items())
+                if owner is None or job['owner'] == owner]
+
+    def cleanup(self, max_age=ARTIFACT_TTL_SECONDS):
+        # Jobs expire max_age seconds after finishing, however long they were queued or running
+        cutoff = time.time() - max_age
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job['finished'] is not None and job['finished'] < cutoff:
+                    try:
+                        os.remove(job['artifact_path'])
+                    except OSError:
+                        pass
+                    self._progress.pop(job_id, None)
+                    del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
+
+# Job functions (module level so worker processes can import them)
+def report_job(artifact_path, df, progress=None):
+    total = len(df)
+    write_transaction_report(df, artifact_path, progress=lambda done: progress(done, total))
+    return total
+
+def fraud_training_job(artifact_path, amounts, contamination=0.05, random_state=42, progress=None):
+    """
+    Fit an IsolationForest on scaled transaction amounts and save its predictions
+    (-1 for outliers, 1 otherwise) to artifact_path as a .npy array.
+
+    Returns:
+        int: Number of transactions flagged as outliers.
+    """
+    # Imported here: only the worker processes need scikit-learn
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+
+    progress(0, 2)
+    scaled = StandardScaler().fit_transform(np.asarray(amounts, dtype=float).reshape(-1, 1))
+    predictions = IsolationForest(contamination=contamination, random_state=random_state).fit_predict(scaled)
+    progress(1, 2)
+    with open(artifact_path, 'wb') as artifact:
+        np.save(artifact, predictions)
+    return int((predictions == -1).sum())
+
+def export_job(artifact_path, source, fmt, row_filter=None, columns=None, compress=False, progress=None):
+    total = len(source) if hasattr(source, '__len__') else None
+    compression = ('zstd' if fmt == 'parquet' else 'gzip') if compress else None
+    return export_rows(source, artifact_path, fmt, row_filter=row_filter, columns=columns,
+                       compression=compression, progress=lambda done: progress(done, total))
@@ -0,0 +1,443 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from raw_block import COINBASE_PREV_N, merkle_root, script_address, sha256d
+
+# Default behaviour of the mock server
+DEFAULT_CONFIG = {
+    'latency': 0.05,         # Mean response delay (seconds)
+    'latency_jitter': 0.5,   # Delay varies by +/- this fraction
+    'error_rate': 0.0,       # Fraction of requests answered with HTTP 500
+    'rate_limit': None,      # Requests/second before answering HTTP 429
+    'txs_per_address': 120,  # History length of every synthetic address
+    'new_blocks': 0,         # Blocks mined after the history; raise it to simulate new activity
+    'txs_per_block': 40,     # Transactions in every synthetic block
+    'seed': 42,
+}
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+COIN_PRICES = {'bitcoin': 60000.0, 'ethereum': 3000.0, 'litecoin': 80.0, 'ripple': 0.5}
+
+def _digest(*parts):
+    return hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()
+
+def _fake_address(*parts):
+    number = int(_digest('addr', *parts), 16)
+    chars = []
+    for _ in range(33):
+        number, remainder = divmod(number, 58)
+        chars.append(BASE58_ALPHABET[remainder])
+    return '1' + ''.join(chars)
+
+# Synthetic BlockCypher address history
+def _address_tx(address, key, height, rng):
+    value = rng.randint(10000, 500000000)
+    n_outputs = 30 if rng.random() < 0.05 else 1  # Some payouts have more outputs than BlockCypher returns by default
+    return {
+        'hash': _digest('tx', address, key),
+        'block_height': height,
+        'received': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1700000000 - (850000 - height) * 600)),
+        'total': value,
+        'fee': rng.randint(200, 20000),
+        'inputs': [{'prev_hash': _digest('prev', address, key), 'output_index': 0,
+                    'output_value': value + 1000, 'addresses': [address]}],
+        'outputs': [{'value': value // n_outputs + (value % n_outputs if n == 0 else 0),
+                     'addresses': [_fake_address(address, key, n) if n else _fake_address(address, key)]}
+                    for n in range(n_outputs)],
+    }
+
+def _limit_io(tx, txlimit, url):
+    # Like BlockCypher, cut inputs/outputs beyond txlimit and link to the rest
+    if len(tx['inputs']) <= txlimit and len(tx['outputs']) <= txlimit:
+        return tx
+    tx = dict(tx)
+    for key, link in (('inputs', 'next_inputs'), ('outputs', 'next_outputs')):
+        if len(tx[key]) > txlimit:
+            tx[key] = tx[key][:txlimit]
+            tx[link] = f"{url}/txs/{tx['hash']}?{key[:-1]}start={txlimit}&limit={txlimit}"
+    return tx
+
+def address_history(address, config):
+    # New blocks: each touches roughly one address in five
+    txs = []
+    for height in range(850000 + config['new_blocks'], 850000, -1):
+        rng = random.Random(f"{config['seed']}-{address}-{height}")
+        if rng.random() < 0.2:
+            txs.append(_address_tx(address, f"new-{height}", height, rng))
+
+    rng = random.Random(f"{config['seed']}-{address}")
+    height = 850000
+    history = []
+    while len(history) < config['txs_per_address']:
+        for _ in range(rng.choice([1, 1, 2, 3, 5])):
+            history.append(_address_tx(address, len(history), height, rng))
+        height -= rng.randint(1, 20)
+    return txs + history[:config['txs_per_address']]
+
+def address_page(address, query, config):
+    limit = min(int(query.get('limit', ['10'])[0]), 50)
+    txlimit = int(query.get('txlimit', ['20'])[0])
+    before = int(query['before'][0]) if 'before' in query else None
+    after = int(query['after'][0]) if 'after' in query else None
+
+    txs = address_history(address, config)
+    selected = [tx for tx in txs
+                if (before is None or tx['block_height'] < before) and (after is None or tx['block_height'] > after)]
+    page = [_limit_io(tx, txlimit, 'https://api.blockcypher.com/v1/btc/main') for tx in selected[:limit]]
+    balance = sum(tx['total'] for tx in txs) % 10**10
+    data = {'address': address, 'final_balance': balance, 'balance': balance, 'n_tx': len(txs), 'txs': page}
+    if len(selected) > limit:
+        data['hasMore'] = True
+    return data
+
+# Synthetic blockchain.info transactions and blocks
+def raw_transaction(tx_hash, config, height=850000, coinbase=False):
+    rng = random.Random(f"{config['seed']}-{tx_hash}")
+    if coinbase:
+        inputs = [{'prev_out': None, 'script': '03' + tx_hash[:16]}]
+    else:
+        inputs = [{'prev_out': {'addr': _fake_address(tx_hash, 'in', i), 'value': rng.randint(10000, 10**8),
+                                'tx_index': rng.randint(1, 10**15), 'n': rng.randint(0, 3)}}
+                  for i in range(rng.randint(1, 3))]
+    in_value = sum((i['prev_out'] or {}).get('value', 0) for i in inputs) or 312500000
+    fee = 0 if coinbase else min(in_value // 100, 50000)
+    outputs, remaining = [], in_value - fee
+    for n in range(rng.randint(1, 3)):
+        value = remaining if n == 2 else remaining // 2
+        remaining -= value
+        outputs.append({'addr': _fake_address(tx_hash, 'out', n), 'value': value, 'n': n,
+                        'tx_index': int(tx_hash[:12], 16), 'spent': rng.random() < 0.5})
+    return {'hash': tx_hash, 'tx_index': int(tx_hash[:12], 16), 'block_height': height, 'fee': fee,
+            'size': 250, 'inputs': inputs, 'out': outputs}
+
+def _varint(n):
+    if n < 0xfd:
+        return bytes([n])
+    if n <= 0xffff:
+        return b'\xfd' + struct.pack('<H', n)
+    if n <= 0xffffffff:
+        return b'\xfe' + struct.pack('<I', n)
+    return b'\xff' + struct.pack('<Q', n)
+
+OUTPUT_SCRIPT_TEMPLATES = [
+    (b'\x76\xa9\x14', 20, b'\x88\xac'),  # P2PKH
+    (b'\xa9\x14', 20, b'\x87'),           # P2SH
+    (b'\x00\x14', 20, b''),                # P2WPKH
+    (b'\x00\x20', 32, b''),                # P2WSH
+    (b'\x51\x20', 32, b''),                # P2TR
+    (b'\x6a\x08', 8, b''),                 # OP_RETURN
+]
+
+def _synthetic_block(block_hash, config):
+    """
+    Build a block as both its binary serialization and the matching rawblock JSON.
+    Transaction hashes are real txids of the serialization, roughly half the
+    transactions are segwit, and outputs cover the standard script types.
+    """
+    rng = random.Random(f"{config['seed']}-{block_hash}")
+    height = int(block_hash[:6], 16) % 900000
+    txids, serialized, txs = [], [], []
+
+    for i in range(config['txs_per_block']):
+        coinbase = i == 0
+        segwit = not coinbase and rng.random() < 0.5
+        if coinbase:
+            inputs = [(bytes(32), COINBASE_PREV_N, b'\x03' + height.to_bytes(3, 'little') + rng.randbytes(8))]
+        else:
+            inputs = [(rng.randbytes(32), rng.randint(0, 3), b'' if segwit else rng.randbytes(106))
+                      for _ in range(rng.randint(1, 3))]
+        outputs = []
+        for _ in range(rng.randint(1, 3)):
+            prefix, length, suffix = rng.choice(OUTPUT_SCRIPT_TEMPLATES)
+            outputs.append((rng.randint(546, 10**8), prefix + rng.randbytes(length) + suffix))
+
+        body = _varint(len(inputs)) + b''.join(prev + struct.pack('<I', n) + _varint(len(script)) + script + b'\xff\xff\xff\xff'
+                                               for prev, n, script in inputs)
+        body += _varint(len(outputs)) + b''.join(struct.pack('<q', value) + _varint(len(script)) + script
+                                                 for value, script in outputs)
+        version, locktime = struct.pack('<i', 2), struct.pack('<I', 0)
+        txid = sha256d(version + body + locktime)
+        if segwit:
+            witness = b''.join(b'\x02\x48' + rng.randbytes(72) + b'\x21' + rng.randbytes(33) for _ in inputs)
+            data = version + b'\x00\x01' + body + witness + locktime
+        else:
+            data = version + body + locktime
+        txids.append(txid)
+        serialized.append(data)
+
+        total_out = sum(value for value, _ in outputs)
+        fee = 0 if coinbase else rng.randint(200, 20000)
+        tx_index = int.from_bytes(txid[:6], 'little')
+        json_inputs = []
+        for j, (prev, n, script) in enumerate(inputs):
+            prev_out = None if coinbase else {
+                'addr': _fake_address(prev.hex(), n), 'value': (total_out + fee) // len(inputs) + (j == 0) * ((total_out + fee) % len(inputs)),
+                'tx_index': int.from_bytes(prev[:6], 'little'), 'n': n}
+            json_inputs.append({'prev_out': prev_out, 'script': script.hex()})
+        json_outputs = []
+        for n, (value, script) in enumerate(outputs):
+            output = {'value': value, 'n': n, 'script': script.hex(), 'tx_index': tx_index, 'spent': rng.random() < 0.5}
+            address = script_address(script)
+            if address is not None:
+                output['addr'] = address
+            json_outputs.append(output)
+        txs.append({'hash': txid[::-1].hex(), 'tx_index': tx_index, 'block_height': height, 'fee': fee,
+                    'size': len(data), 'inputs': json_inputs, 'out': json_outputs})
+
+    header = struct.pack('<i32s32sIII', 0x20000000, sha256d(block_hash.encode()), merkle_root(txids),
+                         1700000000, 0x17034219, rng.getrandbits(32))
+    serialization = header + _varint(len(serialized)) + b''.join(serialized)
+    block = {'hash': sha256d(header)[::-1].hex(), 'height': height, 'time': 1700000000, 'size': len(serialization),
+             'n_tx': len(txs), 'mrkl_root': merkle_root(txids)[::-1].hex(), 'tx': txs}
+    return block, serialization
+
+def raw_block(block_hash, config):
+    return _synthetic_block(block_hash, config)[0]
+
+def serialize_block(block_hash, config):
+    return _synthetic_block(block_hash, config)[1]
+
+def coin_market_chart(coin, query):
+    start = int(float(query.get('from', ['0'])[0]))
+    end = int(float(query.get('to', [str(int(time.time()))])[0]))
+    base = COIN_PRICES.get(coin, 1.0)
+    step = 3600
+    prices = [[ts * 1000, round(base * (1 + 0.05 * ((ts // step) % 7 - 3) / 3), 4)]
+              for ts in range(start - start % step, end + 1, step)]
+    return {'prices': prices}
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, data, headers=None):
+        self._send_text(status, json.dumps(data), headers, 'application/json')
+
+    def _send_text(self, status, text, headers=None, content_type='text/plain'):
+        body = text.encode()
+        self._release()  # The client can send its next request as soon as it reads this response
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.record_request()
+        self._in_flight = True
+        try:
+            self._respond()
+        finally:
+            self._release()
+
+    def _release(self):
+        if self._in_flight:
+            self._in_flight = False
+            self.server.release_request()
+
+    def _respond(self):
+        server = self.server
+        config = server.config
+
+        delay = config['latency'] * (1 + random.uniform(-config['latency_jitter'], config['latency_jitter']))
+        time.sleep(max(delay, 0))
+
+        if not server.admit():
+            self._send_json(429, {'error': 'Limits reached.'}, {'Retry-After': '1'})
+            return
+        if config['error_rate'] and random.random() < config['error_rate']:
+            self._send_json(500, {'error': 'Internal server error.'})
+            return
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+
+        if len(parts) == 6 and parts[:3] == ['v1', 'btc', 'main'] and parts[3] == 'addrs' and parts[5] == 'full':
+            self._send_json(200, address_page(parts[4], query, config))
+        elif len(parts) == 2 and parts[0] == 'rawblock':
+            block, serialization = server.block(parts[1])
+            if query.get('format') == ['hex']:
+                self._send_text(200, serialization.hex())
+            else:
+                self._send_json(200, block)
+        elif len(parts) == 2 and parts[0] == 'rawtx':
+            self._send_json(200, raw_transaction(parts[1], config))
+        elif parts == ['api', 'v3', 'simple', 'price']:
+            ids = query.get('ids', [''])[0].split(',')
+            self._send_json(200, {coin: {'usd': COIN_PRICES.get(coin, 1.0), 'usd_market_cap': 1e12, 'usd_24h_vol': 1e10}
+                                  for coin in ids if coin})
+        elif len(parts) == 6 and parts[:3] == ['api', 'v3', 'coins'] and parts[4:] == ['market_chart', 'range']:
+            self._send_json(200, coin_market_chart(parts[3], query))
+        else:
+            self._send_json(404, {'error': f'Unknown endpoint {url.path}'})
+
+class MockApiServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the BlockCypher, blockchain.info and CoinGecko APIs.
+
+    Serves deterministic synthetic data with configurable latency, error rate,
+    rate limiting (HTTP 429 + Retry-After) and BlockCypher-style paging.
+    """
+
+    daemon_threads = True
+    request_queue_size = 256  # The default backlog of 5 drops connections under load
+
+    def __init__(self, address=('127.0.0.1', 0), **config):
+        super().__init__(address, MockApiHandler)
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.request_count = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0  # Most requests handled at once, to check client concurrency limits
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._block_names = {}  # Hash of each served block -> the name it was generated from
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def record_request(self):
+        with self._lock:
+            self.request_count += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release_request(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def block(self, name):
+        """
+        (rawblock JSON, serialization) of the block generated from name. A synthetic block's
+        hash differs from the name it was requested by; once served, it is also found by its hash.
+        """
+        with self._lock:
+            name = self._block_names.get(name, name)
+        block, serialization = _synthetic_block(name, self.config)
+        with self._lock:
+            self._block_names[block['hash']] = name
+        return block, serialization
+
+    def admit(self):
+        rate_limit = self.config['rate_limit']
+        if not rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            return self._window_count <= rate_limit
+
+def start_mock_server(**config):
+    server = MockApiServer(**config)
+    threading.Thread(target=server.serve_forever, name='mock-api', daemon=True).start()
+    return server
+
+def point_fetchers_at(base_url, scratch_dir):
+    """
+    Redirect the fetch modules to a mock server and give them scratch caches in
+    scratch_dir (which the caller owns and removes).
+    """
+    import blockcypher
+    import chain_archive
+    import http_cache
+
+    blockcypher.BLOCKCYPHER_API = f"{base_url}/v1/btc/main"
+    http_cache.CACHE_FILE = os.path.join(scratch_dir, 'http_cache.db')
+    chain_archive.ARCHIVE_FILE = os.path.join(scratch_dir, 'chain_archive.db')
+    # Modules imported later read these; already imported ones are patched directly
+    os.environ['BLOCKCHAIN_INFO_API'] = base_url
+    os.environ['COINGECKO_API'] = f"{base_url}/api/v3"
+    if 'P2P' in sys.modules:
+        sys.modules['P2P'].BLOCKCHAIN_INFO_API = base_url
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+# Load harness for the fetch layer
+def run_load_test(addresses=1000, concurrency=50, rate=1000, latency=0.05, error_rate=0.02, rate_limit=None,
+                  history_addresses=5):
+    """
+    Measure throughput, latency percentiles and retries of the BlockCypher fetch layer
+    against the mock server.
+    """
+    import blockcypher
+
+    server = start_mock_server(latency=latency, error_rate=error_rate, rate_limit=rate_limit)
+    with tempfile.TemporaryDirectory(prefix='mock_api_') as scratch_dir:
+        point_fetchers_at(server.base_url, scratch_dir)
+        watchlist = [_fake_address('watch', i) for i in range(addresses)]
+
+        print(f"Mock server at {server.base_url} (latency {latency * 1000:.0f} ms, error rate {error_rate:.0%}, "
+              f"rate limit {rate_limit or 'none'})")
+
+        stats = {}
+        start = time.perf_counter()
+        results = blockcypher.fetch_addresses(watchlist, concurrency=concurrency, rate=rate, stats=stats)
+        elapsed = time.perf_counter() - start
+        failed = sum('error' in data for data in results.values())
+        latencies = stats.get('latencies', [])
+
+        print(f"\nConcurrent fetch of {addresses} addresses (concurrency {concurrency}, rate {rate}/s)")
+        print(f"  Wall time:   {elapsed:.2f} s")
+        print(f"  Throughput:  {addresses / elapsed:.1f} addresses/s")
+        print(f"  Latency p50: {_percentile(latencies, 0.50) * 1000:.1f} ms")
+        print(f"  Latency p99: {_percentile(latencies, 0.99) * 1000:.1f} ms")
+        print(f"  Retries:     {stats.get('retries', 0)}")
+        print(f"  Failed:      {failed}")
+        print(f"  Requests:    {server.request_count}")
+        print(f"  Sequential estimate: {addresses * latency:.1f} s at {latency * 1000:.0f} ms per request")
+
+        if history_addresses:
+            server.config['error_rate'] = 0.0
+            pages_before = server.request_count
+            start = time.perf_counter()
+            tx_count = sum(1 for address in watchlist[:history_addresses]
+                           for _ in blockcypher.iter_address_transactions(address))
+            elapsed = time.perf_counter() - start
+            expected = history_addresses * server.config['txs_per_address']
+            print(f"\nPaged history of {history_addresses} addresses")
+            print(f"  Transactions: {tx_count} (expected {expected})")
+            print(f"  Pages:        {server.request_count - pages_before} in {elapsed:.2f} s")
+
+        server.shutdown()
+        server.server_close()
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the blockchain fetch layer against a local mock API.")
+    parser.add_argument('--addresses', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--rate-limit', type=int, default=None)
+    parser.add_argument('--serve', action='store_true', help="Only run the mock server until interrupted.")
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    if args.serve:
+        mock = MockApiServer(('127.0.0.1', args.port), latency=args.latency, error_rate=args.error_rate,
+                             rate_limit=args.rate_limit)
+        print(f"Mock API listening on {mock.base_url}")
+        mock.serve_forever()
+    else:
+        run_load_test(args.addresses, args.concurrency, args.rate, args.latency, args.error_rate, args.rate_limit)
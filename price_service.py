@@ -0,0 +1,272 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from figure_cache import frame_fingerprint
+from http_cache import get_json
+
+# CoinGecko API base URL (override to point at a mock server)
+COINGECKO_API = os.environ.get('COINGECKO_API', 'https://api.coingecko.com/api/v3')
+
+# Local price history store
+PRICE_FILE = 'price_history.db'
+
+# Transaction types (see 8.py) and their CoinGecko ids
+ASSET_IDS = {'BTC': 'bitcoin', 'ETH': 'ethereum', 'LTC': 'litecoin', 'XRP': 'ripple'}
+
+# CoinGecko returns hourly points for ranges up to 90 days, daily points beyond
+FETCH_WINDOW = 90 * 24 * 3600
+
+# How stale the newest price may be when valuing a transaction (seconds)
+DEFAULT_TOLERANCE = 2 * 24 * 3600
+
+NAT_SECONDS = np.iinfo(np.int64).min
+
+# Recently valued frames, keyed by data fingerprint and price version
+MAX_CACHED_FRAMES = 4
+_valued_cache = OrderedDict()
+
+# Bumped whenever new prices are stored, so valuations made before go stale
+_prices_version = 0
+_prices_version_lock = threading.Lock()
+
+# Background refreshes, so interactive callers never wait on the API
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='price-refresh')
+_refreshes = OrderedDict()
+_refreshes_lock = threading.Lock()
+
+_local = threading.local()
+
+def _connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != PRICE_FILE:
+        conn = sqlite3.connect(PRICE_FILE, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS prices (
+                        asset TEXT,
+                        ts INTEGER,
+                        price REAL,
+                        PRIMARY KEY (asset, ts)) WITHOUT ROWID""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS coverage (
+                        asset TEXT PRIMARY KEY,
+                        start_ts INTEGER,
+                        end_ts INTEGER)""")
+        _local.conn, _local.path = conn, PRICE_FILE
+    return conn
+
+def _to_epoch_seconds(values):
+    # Epoch seconds for one timestamp, or an int64 array for many (NaT becomes NAT_SECONDS)
+    if not pd.api.types.is_list_like(values):
+        return int(pd.Timestamp(values).timestamp())  # Naive timestamps count as UTC
+    timestamps = pd.DatetimeIndex(pd.to_datetime(values, utc=True))
+    seconds = timestamps.asi8 // 10**9
+    seconds[timestamps.isna()] = NAT_SECONDS
+    return seconds
+
+def _fetch_range(asset, start, end):
+    url = f"{COINGECKO_API}/coins/{ASSET_IDS[asset]}/market_chart/range"
+    points = []
+    for window_start in range(start, end, FETCH_WINDOW):
+        params = {'vs_currency': 'usd', 'from': window_start, 'to': min(window_start + FETCH_WINDOW, end)}
+        data = get_json(url, params=params, raise_for_status=True)  # The price store is the cache
+        points.extend((asset, int(ms // 1000), float(price)) for ms, price in data.get('prices', []))
+    return points
+
+# Keep the local series covering a time range, fetching only what is missing
+def refresh_prices(asset, start, end=None):
+    """
+    Extend the cached price series of an asset so it covers [start, end].
+
+    Only the parts of the range outside the already covered span are fetched,
+    so repeated refreshes cost one small request for the newest prices. A part that
+    returns no prices isn't marked as covered, so it is asked for again next time.
+
+    Args:
+        asset (str): 'BTC', 'ETH', 'LTC' or 'XRP'.
+        start: Start of the range (anything pd.to_datetime accepts, or epoch seconds).
+        end: End of the range (default: now).
+
+    Returns:
+        int: Number of price points stored.
+    """
+    if asset not in ASSET_IDS:
+        raise ValueError(f"Unknown asset: {asset}")
+    now = int(time.time())
+    start = start if isinstance(start, (int, np.integer)) else _to_epoch_seconds(start)
+    end = now if end is None else min(end if isinstance(end, (int, np.integer)) else _to_epoch_seconds(end), now)
+    if start >= end:
+        return 0
+
+    conn = _connection()
+    covered = conn.execute("SELECT start_ts, end_ts FROM coverage WHERE asset = ?", (asset,)).fetchone()
+    if covered is None:
+        missing = [(start, end)]
+    else:
+        missing = [(start, covered[0]) if start < covered[0] else None,
+                   (covered[1], end) if end > covered[1] else None]
+        missing = [gap for gap in missing if gap]
+    if not missing:
+        return 0
+
+    points = []
+    new_start, new_end = covered if covered is not None else (None, None)
+    for gap_start, gap_end in missing:
+        gap_points = _fetch_range(asset, int(gap_start), int(gap_end))
+        if not gap_points:
+            continue  # Nothing came back; leave the gap uncovered
+        points.extend(gap_points)
+        new_start = gap_start if new_start is None else min(new_start, gap_start)
+        new_end = gap_end if new_end is None else max(new_end, gap_end)
+    if not points:
+        return 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("INSERT OR REPLACE INTO prices (asset, ts, price) VALUES (?, ?, ?)", points)
+        conn.execute("INSERT OR REPLACE INTO coverage (asset, start_ts, end_ts) VALUES (?, ?, ?)",
+                     (asset, int(new_start), int(new_end)))
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    global _prices_version
+    with _prices_version_lock:
+        _prices_version += 1
+    return len(points)
+
+def get_price_series(asset, start=None, end=None):
+    """
+    Return the cached price series of an asset as a DataFrame with 'timestamp' (UTC) and 'price'.
+    """
+    query = "SELECT ts, price FROM prices WHERE asset = ?"
+    params = [asset]
+    if start is not None:
+        query += " AND ts >= ?"
+        params.append(_to_epoch_seconds(start))
+    if end is not None:
+        query += " AND ts <= ?"
+        params.append(_to_epoch_seconds(end))
+    rows = _connection().execute(query + " ORDER BY ts", params).fetchall()
+    series = pd.DataFrame(rows, columns=['ts', 'price'])
+    series['timestamp'] = pd.to_datetime(series.pop('ts'), unit='s', utc=True)
+    return series[['timestamp', 'price']]
+
+def _price_arrays(asset):
+    rows = _connection().execute("SELECT ts, price FROM prices WHERE asset = ? ORDER BY ts", (asset,)).fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    ts, prices = zip(*rows)
+    return np.asarray(ts, dtype=np.int64), np.asarray(prices, dtype=np.float64)
+
+def _asset_rows(df, time_column, asset_column):
+    # (asset, row positions, epoch seconds) for every known asset with timestamped rows
+    tx_ts = _to_epoch_seconds(df[time_column])
+    codes, assets = pd.factorize(df[asset_column])
+    for code, asset in enumerate(assets):
+        if asset not in ASSET_IDS:
+            continue
+        rows = np.flatnonzero((codes == code) & (tx_ts != NAT_SECONDS))
+        if len(rows):
+            yield asset, rows, tx_ts[rows]
+
+def _refresh_asset(asset, asset_ts):
+    try:
+        # Step back one interval so the first transactions have an earlier price
+        refresh_prices(asset, int(asset_ts.min()) - 3600, int(asset_ts.max()) + 1)
+        return True
+    except Exception as e:
+        print(f"Could not refresh {asset} prices, using cached data: {e}")
+        return False
+
+def refresh_frame_prices(df, time_column='timestamp', asset_column='transaction_type'):
+    """
+    Extend the cached price series to cover the time range of every asset in df.
+
+    Returns:
+        bool: True if every asset was refreshed, False if a fetch failed.
+    """
+    return all([_refresh_asset(asset, asset_ts) for asset, _, asset_ts in _asset_rows(df, time_column, asset_column)])
+
+def refresh_frame_prices_async(df, time_column='timestamp', asset_column='transaction_type'):
+    """
+    Run refresh_frame_prices on a background thread, once per frame: calls for the same
+    data share one Future, and a refresh that failed is retried by the next call.
+
+    Returns:
+        Future: Resolves to the result of refresh_frame_prices.
+    """
+    key = frame_fingerprint(df)
+    with _refreshes_lock:
+        future = _refreshes.get(key)
+        if future is None or (future.done() and (future.exception() is not None or not future.result())):
+            future = _refreshes[key] = _refresh_executor.submit(refresh_frame_prices, df, time_column, asset_column)
+        _refreshes.move_to_end(key)
+        while len(_refreshes) > MAX_CACHED_FRAMES:
+            _refreshes.popitem(last=False)
+    return future
+
+# Value transactions in USD at the price in effect when they happened
+def attach_usd_value(df, amount_column='amount', time_column='timestamp', asset_column='transaction_type',
+                     refresh=True, tolerance=DEFAULT_TOLERANCE):
+    """
+    Add 'price_usd' and 'amount_usd' columns using an as-of join on the cached price series.
+
+    Every transaction gets the latest price at or before its timestamp. The join is a
+    binary search over each asset's sorted series, so millions of rows are valued in one
+    vectorized pass without sorting the frame.
+
+    Args:
+        df (DataFrame): Transactions; amounts are in units of the asset.
+        amount_column (str): Column holding the amounts.
+        time_column (str): Column holding the timestamps (naive values are taken as UTC).
+        asset_column (str): Column holding the asset symbol ('BTC', 'ETH', 'LTC', 'XRP').
+        refresh (bool): First extend the cached series to cover the data's time range.
+        tolerance (int): Leave the value empty when the nearest earlier price is older
+            than this many seconds (None for no limit).
+
+    Returns:
+        DataFrame: A copy of df with the two extra columns (NaN where no price is known).
+    """
+    prices = np.full(len(df), np.nan)
+    for asset, rows, asset_ts in _asset_rows(df, time_column, asset_column):
+        if refresh:
+            _refresh_asset(asset, asset_ts)
+
+        series_ts, series_prices = _price_arrays(asset)
+        if len(series_ts) == 0:
+            continue
+        position = np.searchsorted(series_ts, asset_ts, side='right') - 1
+        found = position >= 0
+        if tolerance is not None:
+            found &= asset_ts - series_ts[np.maximum(position, 0)] <= tolerance
+        prices[rows[found]] = series_prices[position[found]]
+
+    valued = df.copy()
+    valued['price_usd'] = prices
+    valued['amount_usd'] = df[amount_column].to_numpy(dtype=np.float64) * prices
+    return valued
+
+def get_usd_valued(df, refresh=True):
+    """
+    attach_usd_value with the defaults, memoized per frame until new prices are stored.
+    With refresh=False only cached prices are used, so no network I/O happens; pair it
+    with refresh_frame_prices_async on interactive threads.
+    """
+    key = (frame_fingerprint(df), refresh, _prices_version)
+    valued = _valued_cache.get(key)
+    if valued is None:
+        valued = attach_usd_value(df, refresh=refresh)
+        _valued_cache[key] = valued
+        while len(_valued_cache) > MAX_CACHED_FRAMES:
+            _valued_cache.popitem(last=False)
+    else:
+        _valued_cache.move_to_end(key)
+    return valued
@@ -0,0 +1,120 @@
+import hashlib
+import hmac
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from column_crypto import load_or_generate_key
+
+# Pseudonym key, kept apart from the encryption key so either can be rotated alone
+PSEUDONYM_KEY_FILE = 'pseudonym_key.key'
+
+# Columns holding identifiers in transaction tables
+PSEUDONYM_COLUMNS = ('address', 'recipient')
+
+PSEUDONYM_PREFIX = 'p_'
+PSEUDONYM_LENGTH = 16  # Hex characters (64 bits) of the HMAC kept in each pseudonym
+
+MAX_MEMO_SIZE = 2_000_000  # Memoized values per pseudonymizer before the memo is reset
+
+_pseudonymizers = {}
+_pseudonymizers_lock = threading.Lock()
+
+def get_pseudonymizer(key_file=PSEUDONYM_KEY_FILE):
+    """
+    Return the shared Pseudonymizer for a key file, loading the key once per process.
+    """
+    with _pseudonymizers_lock:
+        pseudonymizer = _pseudonymizers.get(key_file)
+        if pseudonymizer is None:
+            pseudonymizer = _pseudonymizers[key_file] = Pseudonymizer(load_or_generate_key(key_file))
+        return pseudonymizer
+
+class Pseudonymizer:
+    """
+    Replaces identifiers with keyed-hash pseudonyms: HMAC-SHA256(key, value), truncated.
+
+    Unlike Fernet tokens, pseudonyms are deterministic, so equal addresses stay equal and
+    grouping, joins, graphs and clustering work on them unchanged. Without the key they
+    cannot be recomputed from guessed addresses. Each distinct value is hashed once per
+    column (columns are factorized first) and results are memoized across calls, so
+    repeated addresses cost a dictionary lookup.
+    """
+
+    def __init__(self, key, prefix=PSEUDONYM_PREFIX, length=PSEUDONYM_LENGTH):
+        self._key = key if isinstance(key, bytes) else key.encode()
+        self.prefix = prefix
+        self.length = length
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def pseudonym(self, value):
+        return self.prefix + hmac.new(self._key, str(value).encode(), hashlib.sha256).hexdigest()[:self.length]
+
+    def pseudonymize_values(self, values):
+        """
+        Pseudonymize a column of values; missing values stay missing.
+
+        Returns:
+            ndarray: Object array of pseudonyms in input order.
+        """
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        memo = self._memo
+        with self._lock:
+            pseudonyms = [memo.get(value) for value in uniques.tolist()]
+            missing = [i for i, pseudonym in enumerate(pseudonyms) if pseudonym is None]
+            if missing:
+                key, digest, prefix, length = self._key, hmac.digest, self.prefix, self.length
+                if len(memo) + len(missing) > MAX_MEMO_SIZE:
+                    memo.clear()
+                for i in missing:
+                    value = uniques[i]
+                    pseudonyms[i] = memo[value] = prefix + digest(key, str(value).encode(), 'sha256').hex()[:length]
+        lookup = np.empty(len(pseudonyms) + 1, dtype=object)
+        lookup[:-1] = pseudonyms
+        lookup[-1] = None
+        return lookup[codes]  # Code -1 (missing) picks the trailing None
+
+    def pseudonymize_frame(self, df, columns=None):
+        """
+        Return a copy of df with the identifier columns (default: PSEUDONYM_COLUMNS present)
+        replaced by pseudonyms.
+        """
+        pseudonymized = df.copy()
+        for column in columns if columns is not None else PSEUDONYM_COLUMNS:
+            if column in df.columns:
+                pseudonymized[column] = self.pseudonymize_values(df[column].to_numpy())
+        return pseudonymized
+
+    # Re-identification is a separate, explicit step that needs the raw data
+    def reidentify(self, pseudonyms, raw_values):
+        """
+        Map pseudonyms back to identifiers by re-keying a set of candidate raw values
+        (e.g. the original file), without using the memo.
+
+        Returns:
+            list: The raw value for each pseudonym, or None where no candidate matches.
+        """
+        candidates = pd.unique(pd.Series(raw_values, dtype=object).dropna())
+        reverse = {self.pseudonym(value): value for value in candidates}
+        return [reverse.get(pseudonym) for pseudonym in pseudonyms]
+
+def pseudonymize_frame(df, columns=None, key_file=PSEUDONYM_KEY_FILE):
+    return get_pseudonymizer(key_file).pseudonymize_frame(df, columns)
+
+if __name__ == "__main__":
+    # Benchmark: 5M rows over 500k distinct addresses, cold and with a warm memo
+    rng = np.random.default_rng(0)
+    addresses = np.char.add('1addr', rng.integers(0, 500000, 5000000).astype(str)).astype(object)
+    pseudonymizer = Pseudonymizer(b'benchmark key')
+    for label in ('cold', 'warm'):
+        start = time.perf_counter()
+        pseudonyms = pseudonymizer.pseudonymize_values(addresses)
+        print(f"{label}: {len(addresses)} values in {time.perf_counter() - start:.2f} s")
+    naive_count = 200000
+    start = time.perf_counter()
+    naive = [pseudonymizer.pseudonym(value) for value in addresses[:naive_count]]
+    print(f"per value: {naive_count} values in {time.perf_counter() - start:.2f} s "
+          f"({'matches' if naive == pseudonyms[:naive_count].tolist() else 'MISMATCH'})")
@@ -0,0 +1,336 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+from column_crypto import get_cipher
+
+# Encrypted case records
+RECORD_STORE_FILE = 'sensitive_records.seg'
+
+# Compact once dead bytes exceed both this size and the live bytes
+COMPACT_MIN_BYTES = 4 * 1024 * 1024
+
+_SEGMENT_MAGIC = b'RSEG1'
+_HINT_MAGIC = b'RIDX1'
+_SEGMENT_ID_SIZE = 16
+_SEGMENT_HEADER_SIZE = len(_SEGMENT_MAGIC) + _SEGMENT_ID_SIZE
+
+# Entry: crc32 of the rest, kind, key length, value length, then key and value bytes
+_ENTRY = struct.Struct('>IBHI')
+_PUT, _DELETE = 1, 2
+
+# Hint file: covered segment length, dead bytes, entry count, then (key length, offset, length, key) per entry
+_HINT_HEADER = struct.Struct('>QQQ')
+_HINT_ENTRY = struct.Struct('>HQI')
+
+def _entry_bytes(kind, key_bytes, value_bytes):
+    body = _ENTRY.pack(0, kind, len(key_bytes), len(value_bytes))[4:] + key_bytes + value_bytes
+    return struct.pack('>I', zlib.crc32(body)) + body
+
+class RecordStore:
+    """
+    Append-only store of individually encrypted records with an in-memory offset index.
+
+    Every put appends one entry (a Fernet token of the record) to the segment file and
+    points the index at it, so writes cost one append and reads one seek and one
+    decryption, whatever the number of records. Deletes append a tombstone. Superseded
+    entries are reclaimed by a background compaction that copies the live entries, still
+    encrypted, to a new segment while writes continue, then swaps it in. A hint file
+    saved on close and after compaction lets the next open skip rescanning the segment.
+    """
+
+    def __init__(self, path=RECORD_STORE_FILE, cipher=None, sync=False, auto_compact=True):
+        """
+        Args:
+            path (str): Segment file.
+            cipher: Object with Fernet's encrypt/decrypt (default: the shared encryption key).
+            sync (bool): fsync after every write instead of only flushing.
+            auto_compact (bool): Start a background compaction when enough space is dead.
+        """
+        self.path = path
+        self.cipher = cipher if cipher is not None else get_cipher().fernet
+        self.sync = sync
+        self.auto_compact = auto_compact
+        self._lock = threading.RLock()
+        self._compaction = None
+        self._open()
+
+    # Opening and recovery
+    def _open(self):
+        if not os.path.exists(self.path):
+            with open(self.path, 'wb') as segment:
+                segment.write(_SEGMENT_MAGIC + os.urandom(_SEGMENT_ID_SIZE))
+        self._file = open(self.path, 'r+b')
+        header = self._file.read(_SEGMENT_HEADER_SIZE)
+        if header[:len(_SEGMENT_MAGIC)] != _SEGMENT_MAGIC:
+            raise ValueError(f"{self.path} is not a record segment file.")
+        self._segment_id = header[len(_SEGMENT_MAGIC):]
+        self._index, self._dead_bytes, scan_from = self._load_hint()
+        self._end = self._scan(scan_from)
+
+    def _hint_path(self):
+        return self.path + '.idx'
+
+    def _load_hint(self):
+        size = os.path.getsize(self.path)
+        try:
+            with open(self._hint_path(), 'rb') as hint_file:
+                data = hint_file.read()
+        except FileNotFoundError:
+            return {}, 0, _SEGMENT_HEADER_SIZE
+        prefix = _HINT_MAGIC + self._segment_id
+        if not data.startswith(prefix):
+            return {}, 0, _SEGMENT_HEADER_SIZE  # Hint of an older segment
+        covered, dead_bytes, count = _HINT_HEADER.unpack_from(data, len(prefix))
+        if covered > size:
+            return {}, 0, _SEGMENT_HEADER_SIZE
+        index, position = {}, len(prefix) + _HINT_HEADER.size
+        for _ in range(count):
+            key_length, offset, length = _HINT_ENTRY.unpack_from(data, position)
+            position += _HINT_ENTRY.size
+            index[data[position:position + key_length].decode()] = (offset, length)
+            position += key_length
+        return index, dead_bytes, covered
+
+    def _scan(self, position):
+        # Index entries from position to the end; a torn final entry is cut off
+        segment = self._file
+        segment.seek(position)
+        while True:
+            header = segment.read(_ENTRY.size)
+            if len(header) < _ENTRY.size:
+                break
+            crc, kind, key_length, value_length = _ENTRY.unpack(header)
+            payload = segment.read(key_length + value_length)
+            if (len(payload) < key_length + value_length or kind not in (_PUT, _DELETE)
+                    or zlib.crc32(header[4:] + payload) != crc):
+                break
+            self._apply(kind, payload[:key_length].decode(), position + _ENTRY.size + key_length, value_length)
+            position += _ENTRY.size + key_length + value_length
+        segment.seek(position)
+        segment.truncate()
+        return position
+
+    def _apply(self, kind, key, value_offset, value_length):
+        entry_size = _ENTRY.size + len(key.encode()) + value_length
+        previous = self._index.pop(key, None)
+        if previous is not None:
+            self._dead_bytes += _ENTRY.size + len(key.encode()) + previous[1]
+        if kind == _PUT:
+            self._index[key] = (value_offset, value_length)
+        else:
+            self._dead_bytes += entry_size
+
+    # Records
+    def _encrypt(self, key, value):
+        # The key is sealed inside the token so a record can't be moved under another key
+        return self.cipher.encrypt(json.dumps({'key': key, 'value': value}).encode())
+
+    def _append(self, kind, key, value_bytes):
+        key_bytes = key.encode()
+        if len(key_bytes) > 0xFFFF:
+            raise ValueError("Record key is too long.")
+        entry = _entry_bytes(kind, key_bytes, value_bytes)
+        with self._lock:
+            self._file.seek(self._end)
+            self._file.write(entry)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self._apply(kind, key, self._end + _ENTRY.size + len(key_bytes), len(value_bytes))
+            self._end += len(entry)
+            if self._compaction is not None:
+                self._compaction['tail'].append((kind, key, value_bytes))
+        self._maybe_compact()
+
+    def put(self, key, value):
+        """
+        Encrypt and store a JSON-serializable value under key, replacing any earlier value.
+        """
+        self._append(_PUT, key, self._encrypt(key, value))
+
+    def get(self, key, default=None):
+        """
+        Fetch and decrypt one record; other records are not read.
+        """
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return default
+            self._file.seek(location[0])
+            token = self._file.read(location[1])
+        record = json.loads(self.cipher.decrypt(token))
+        if record.get('key') != key:
+            raise ValueError(f"Record stored under {key!r} belongs to {record.get('key')!r}.")
+        return record['value']
+
+    def delete(self, key):
+        with self._lock:
+            if key not in self._index:
+                return False
+        self._append(_DELETE, key, b'')
+        return True
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        with self._lock:
+            return list(self._index)
+
+    def stats(self):
+        with self._lock:
+            return {'records': len(self._index), 'segment_bytes': self._end, 'dead_bytes': self._dead_bytes,
+                    'compacting': self._compaction is not None}
+
+    # Compaction
+    def _maybe_compact(self):
+        if (self.auto_compact and self._compaction is None and self._dead_bytes > COMPACT_MIN_BYTES
+                and self._dead_bytes > self._end - self._dead_bytes):
+            self.compact(wait=False)
+
+    def compact(self, wait=True):
+        """
+        Rewrite the segment with only the live records. Runs on a background thread
+        unless wait is True; reads and writes continue meanwhile.
+        """
+        with self._lock:
+            if self._compaction is None:
+                self._compaction = {'snapshot': dict(self._index), 'tail': [],
+                                    'thread': threading.Thread(target=self._compact, name='record-compaction',
+                                                               daemon=True)}
+                self._compaction['thread'].start()
+            thread = self._compaction['thread']
+        if wait:
+            thread.join()
+
+    def _compact(self):
+        compaction = self._compaction
+        temp_path = self.path + '.compact'
+        segment_id = os.urandom(_SEGMENT_ID_SIZE)
+        try:
+            with open(temp_path, 'wb') as target:
+                target.write(_SEGMENT_MAGIC + segment_id)
+                position = _SEGMENT_HEADER_SIZE
+                index = {}
+                with open(self.path, 'rb') as source:
+                    for key, (offset, length) in compaction['snapshot'].items():
+                        source.seek(offset)
+                        key_bytes = key.encode()
+                        entry = _entry_bytes(_PUT, key_bytes, source.read(length))
+                        target.write(entry)
+                        index[key] = (position + _ENTRY.size + len(key_bytes), length)
+                        position += len(entry)
+
+                with self._lock:
+                    # Replay writes made while copying, then swap segments
+                    dead_bytes = 0
+                    for kind, key, value_bytes in compaction['tail']:
+                        key_bytes = key.encode()
+                        entry = _entry_bytes(kind, key_bytes, value_bytes)
+                        target.write(entry)
+                        previous = index.pop(key, None)
+                        if previous is not None:
+                            dead_bytes += _ENTRY.size + len(key_bytes) + previous[1]
+                        if kind == _PUT:
+                            index[key] = (position + _ENTRY.size + len(key_bytes), len(value_bytes))
+                        else:
+                            dead_bytes += len(entry)
+                        position += len(entry)
+                    target.flush()
+                    os.fsync(target.fileno())
+                    target.close()
+                    self._file.close()
+                    os.replace(temp_path, self.path)
+                    self._file = open(self.path, 'r+b')
+                    self._segment_id, self._index, self._dead_bytes, self._end = segment_id, index, dead_bytes, position
+                    self._write_hint()
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            with self._lock:
+                self._compaction = None
+
+    # Hint file
+    def _write_hint(self):
+        parts = [_HINT_MAGIC, self._segment_id, _HINT_HEADER.pack(self._end, self._dead_bytes, len(self._index))]
+        for key, (offset, length) in self._index.items():
+            key_bytes = key.encode()
+            parts.append(_HINT_ENTRY.pack(len(key_bytes), offset, length))
+            parts.append(key_bytes)
+        temp_path = self._hint_path() + '.tmp'
+        with open(temp_path, 'wb') as hint_file:
+            hint_file.write(b''.join(parts))
+        os.replace(temp_path, self._hint_path())
+
+    def close(self):
+        compaction = self._compaction
+        if compaction is not None:
+            compaction['thread'].join()
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._write_hint()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Benchmark: writes, random reads and a compaction over many records
+def benchmark(records=200000, path='record_store_benchmark.seg'):
+    import random
+
+    from cryptography.fernet import Fernet
+
+    for stale in (path, path + '.idx'):
+        if os.path.exists(stale):
+            os.remove(stale)
+    store = RecordStore(path, cipher=Fernet(Fernet.generate_key()))
+
+    start = time.perf_counter()
+    for i in range(records):
+        store.put(f"case-{i}", {'address': f"addr{i}", 'notes': 'suspicious activity', 'amount': i})
+    write_time = time.perf_counter() - start
+
+    keys = random.sample(range(records), min(records, 20000))
+    start = time.perf_counter()
+    ok = all(store.get(f"case-{i}")['amount'] == i for i in keys)
+    read_time = time.perf_counter() - start
+
+    for i in range(0, records, 2):
+        store.put(f"case-{i}", {'address': f"addr{i}", 'notes': 'updated', 'amount': -i})
+    before = store.stats()['segment_bytes']
+    start = time.perf_counter()
+    store.compact()
+    compact_time = time.perf_counter() - start
+    ok = ok and store.get('case-2')['amount'] == -2 and store.get('case-3')['amount'] == 3
+    store.close()
+
+    start = time.perf_counter()
+    reopened = RecordStore(path, cipher=store.cipher)
+    open_time = time.perf_counter() - start
+    ok = ok and len(reopened) == records and reopened.get(f"case-{records - 1}")['amount'] == records - 1
+    reopened.close()
+    for stale in (path, path + '.idx'):
+        os.remove(stale)
+
+    print(f"{records} puts in {write_time:.2f} s ({records / write_time:.0f}/s), "
+          f"{len(keys)} random gets in {read_time:.2f} s ({len(keys) / read_time:.0f}/s)")
+    print(f"Compacted {before} -> {store.stats()['segment_bytes']} bytes in {compact_time:.2f} s, "
+          f"reopened with hint in {open_time:.2f} s ({'ok' if ok else 'MISMATCH'})")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,263 @@
+import tempfile
+import zlib
+
+import pandas as pd
+from reportlab.lib.pagesizes import letter
+
+from summary_cube import get_summary_cube, status_summary
+
+# Page layout (points)
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 50
+ROW_HEIGHT = 12
+TABLE_FONT_SIZE = 9
+
+# Rows are pulled from the data source this many at a time
+DEFAULT_CHUNKSIZE = 10000
+
+# Reports stay in memory up to this size before spilling to a temp file
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+# (column, header, width) for the transaction details table
+REPORT_COLUMNS = [
+    ('transaction_id', 'ID', 60),
+    ('transaction_type', 'Type', 80),
+    ('amount', 'Amount', 80),
+    ('status', 'Status', 70),
+    ('is_fraudulent', 'Fraudulent', 70),
+    ('timestamp', 'Date', 150),
+]
+
+def _pdf_string(text):
+    escaped = str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return f"({escaped})"
+
+class StreamingPdfWriter:
+    """
+    Minimal PDF writer that flushes every page to the destination as soon as it is added.
+
+    reportlab's canvas keeps all pages in memory until save(), so large reports
+    are written page by page here instead. Only object offsets are kept.
+    """
+
+    FONTS = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold'}
+
+    def __init__(self, dest, title):
+        self._dest = dest
+        self._position = 0
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3 + len(self.FONTS) + 1  # Catalog, pages, fonts and info come first
+        self._title = title
+
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for index, base_font in enumerate(self.FONTS.values(), start=3):
+            self._write_object(index, f"<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} /Encoding /WinAnsiEncoding >>".encode())
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    def _write(self, data):
+        self._dest.write(data)
+        self._position += len(data)
+
+    def _write_object(self, object_id, body):
+        self._offsets[object_id] = self._position
+        self._write(f"{object_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _new_id(self):
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def add_page(self, commands):
+        content = zlib.compress('\n'.join(commands).encode('latin-1', 'replace'))
+        content_id = self._new_id()
+        self._write_object(content_id, f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode() + content + b"\nendstream")
+
+        fonts = ' '.join(f"/{name} {index} 0 R" for index, name in enumerate(self.FONTS, start=3))
+        page_id = self._new_id()
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH:g} {PAGE_HEIGHT:g}] "
+            f"/Resources << /Font << {fonts} >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self._page_ids.append(page_id)
+
+    def close(self):
+        info_id = 3 + len(self.FONTS)
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode())
+        self._write_object(info_id, f"<< /Title {_pdf_string(self._title)} /Producer (blockchain.pro report engine) >>".encode('latin-1', 'replace'))
+
+        xref_position = self._position
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        for object_id in range(1, self._next_id):
+            lines.append(f"{self._offsets[object_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {self._next_id} /Root 1 0 R /Info {info_id} 0 R >>\nstartxref\n{xref_position}\n%%EOF\n")
+        self._write(''.join(lines).encode())
+
+def _text(font, size, x, y, text):
+    return f"BT /{font} {size} Tf {x:g} {y:g} Td {_pdf_string(text)} Tj ET"
+
+def _line(x1, y1, x2, y2):
+    return f"{x1:g} {y1:g} m {x2:g} {y2:g} l S"
+
+def iter_row_chunks(source, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yield DataFrame chunks from a DataFrame, a CSV path or an iterable of DataFrames.
+
+    Iterables such as pd.read_csv(..., chunksize=n) or pd.read_sql_query(..., chunksize=n)
+    are consumed lazily, so only one chunk is in memory at a time.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+    elif isinstance(source, str):
+        yield from pd.read_csv(source, chunksize=chunksize)
+    else:
+        yield from source
+
+def _format_cell(column, value, max_chars):
+    if column == 'amount':
+        text = f"${value}"
+    elif isinstance(value, pd.Timestamp):
+        text = value.strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        text = str(value)
+    return text if len(text) <= max_chars else text[:max_chars - 3] + '...'
+
+class _ReportLayout:
+    def __init__(self, writer, title, columns):
+        self.writer = writer
+        self.title = title
+        self.columns = columns
+        self.max_chars = [max(4, int(width / (TABLE_FONT_SIZE * 0.5))) for _, _, width in columns]
+        self.commands = []
+        self.y = None
+
+    def start_page(self):
+        page_number = self.writer.page_count + 1
+        if page_number == 1:
+            self.commands = [_text('F2', 16, 100, 750, self.title)]
+            self.y = 720
+        else:
+            self.commands = [_text('F2', 12, MARGIN, PAGE_HEIGHT - MARGIN, f"{self.title} (continued)")]
+            self.y = PAGE_HEIGHT - MARGIN - 30
+        self.commands.append(_text('F1', 8, PAGE_WIDTH - MARGIN - 40, MARGIN / 2, f"Page {page_number}"))
+
+    def finish_page(self):
+        if self.commands:
+            self.writer.add_page(self.commands)
+        self.commands = []
+
+    def draw_summary(self, summary):
+        if self.y - ROW_HEIGHT * (len(summary) + 2) < MARGIN:
+            self.finish_page()
+            self.start_page()
+        for label, value in summary.items():
+            self.commands.append(_text('F1', 12, 100, self.y, f"{label}: {value}"))
+            self.y -= 20
+        self.y -= 20
+
+    def draw_table_header(self):
+        x = MARGIN
+        for _, header, width in self.columns:
+            self.commands.append(_text('F2', TABLE_FONT_SIZE, x, self.y, header))
+            x += width
+        self.commands.append(_line(MARGIN, self.y - 3, x, self.y - 3))
+        self.y -= ROW_HEIGHT + 2
+
+    def draw_row(self, values):
+        if self.y < MARGIN:
+            self.finish_page()
+            self.start_page()
+            self.draw_table_header()
+        x = MARGIN
+        for (column, _, width), value, max_chars in zip(self.columns, values, self.max_chars):
+            self.commands.append(_text('F1', TABLE_FONT_SIZE, x, self.y, _format_cell(column, value, max_chars)))
+            x += width
+        self.y -= ROW_HEIGHT
+
+# Stream a multi-page transaction report to a file or spooled buffer
+def write_transaction_report(source, dest=None, summary=None, columns=None, chunksize=DEFAULT_CHUNKSIZE,
+                             title='Transaction Report', progress=None):
+    """
+    Write a paginated transaction report, streaming rows from the data source in chunks.
+
+    Args:
+        source: DataFrame, CSV path or iterable of DataFrame chunks.
+        dest: File path or binary file object. Defaults to a spooled temp file.
+        summary (dict): Label -> value lines for the report header. When omitted for a
+            DataFrame source it is computed up front; for streamed sources the status
+            totals are accumulated while writing and printed after the table.
+        columns (list): (column, header, width) tuples; defaults to REPORT_COLUMNS.
+        chunksize (int): Rows pulled from the source at a time.
+        title (str): Report title.
+        progress (callable): Called with the number of rows written after each chunk.
+
+    Returns:
+        The destination (rewound to the start when it is a file object).
+    """
+    if dest is None:
+        dest = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
+    if summary is None and isinstance(source, pd.DataFrame) and 'status' in source.columns:
+        summary = status_summary(get_summary_cube(source))
+
+    if isinstance(dest, str):
+        with open(dest, 'wb') as output_file:
+            _write_report(source, output_file, summary, columns, chunksize, title, progress)
+        return dest
+
+    _write_report(source, dest, summary, columns, chunksize, title, progress)
+    if hasattr(dest, 'seek'):
+        dest.seek(0)
+    return dest
+
+def _write_report(source, output_file, summary, columns, chunksize, title, progress):
+    writer = StreamingPdfWriter(output_file, title)
+    layout = None
+    rows_written = 0
+    status_counts = {}
+
+    for chunk in iter_row_chunks(source, chunksize):
+        if layout is None:
+            layout_columns = [c for c in (columns or REPORT_COLUMNS) if c[0] in chunk.columns]
+            layout = _ReportLayout(writer, title, layout_columns)
+            layout.start_page()
+            if summary:
+                layout.draw_summary(summary)
+            layout.commands.append(_text('F1', 12, 100, layout.y, 'Transaction Details:'))
+            layout.y -= 20
+            layout.draw_table_header()
+
+        if summary is None and 'status' in chunk.columns:
+            for status, count in chunk['status'].value_counts().items():
+                status_counts[status] = status_counts.get(status, 0) + int(count)
+
+        for values in chunk[[c[0] for c in layout.columns]].itertuples(index=False, name=None):
+            layout.draw_row(values)
+
+        rows_written += len(chunk)
+        if progress is not None:
+            progress(rows_written)
+
+    if layout is None:
+        layout = _ReportLayout(writer, title, [])
+        layout.start_page()
+        if summary:
+            layout.draw_summary(summary)
+        layout.commands.append(_text('F1', 12, 100, layout.y, 'No transactions to report.'))
+    elif summary is None:
+        layout.y -= 20
+        layout.draw_summary({
+            'Total Transactions': rows_written,
+            'Completed Transactions': status_counts.get('completed', 0),
+            'Pending Transactions': status_counts.get('pending', 0),
+            'Failed Transactions': status_counts.get('failed', 0),
+        })
+
+    layout.finish_page()
+    writer.close()
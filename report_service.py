@@ -0,0 +1,154 @@
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import report_store
+from report_store import write_transaction
+
+# Group commit settings
+MAX_BATCH_SIZE = 256
+BATCH_WINDOW_SECONDS = 0.005  # How long the writer waits for more work before committing
+
+class ReportService:
+    """
+    Serializes report writes through one writer thread that owns the database connection.
+
+    Submissions are queued and committed in batches: under bursty load many reports
+    share one BEGIN IMMEDIATE transaction, and IDs come from the table's AUTOINCREMENT
+    inside that transaction, so they never collide. Writers in other processes are
+    serialized by SQLite's write lock.
+    """
+
+    def __init__(self, db_path=report_store.DATABASE_FILE, max_batch_size=MAX_BATCH_SIZE,
+                 batch_window=BATCH_WINDOW_SECONDS):
+        self._conn = report_store.connect(db_path, check_same_thread=False)
+        self._queue = queue.Queue()
+        self._max_batch_size = max_batch_size
+        self._batch_window = batch_window
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='report-writer', daemon=True)
+        self._writer.start()
+
+    def _enqueue(self, operation, *args):
+        if self._closed:
+            raise RuntimeError("Report service is closed.")
+        future = Future()
+        self._queue.put((operation, args, future))
+        return future
+
+    def submit_report_async(self, address, tx_hash, total_amount, reported_by, notes="", transaction_id=None):
+        return self._enqueue(report_store.insert_report, address, tx_hash, total_amount, reported_by, notes, transaction_id)
+
+    def submit_report(self, address, tx_hash, total_amount, reported_by, notes="", transaction_id=None):
+        return self.submit_report_async(address, tx_hash, total_amount, reported_by, notes, transaction_id).result()
+
+    def add_note_async(self, report_id, note, added_by):
+        return self._enqueue(report_store.insert_note, report_id, note, added_by)
+
+    def add_note(self, report_id, note, added_by):
+        return self.add_note_async(report_id, note, added_by).result()
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is None:
+            return None
+
+        batch = [item]
+        deadline = time.monotonic() + self._batch_window
+        while len(batch) < self._max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Finish this batch, then stop
+                break
+            batch.append(item)
+        return batch
+
+    def _write_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            try:
+                with write_transaction(self._conn):
+                    results = [operation(self._conn, *args) for operation, args, _ in batch]
+            except Exception:
+                # Commit one at a time so a single bad submission doesn't fail the rest
+                for operation, args, future in batch:
+                    try:
+                        with write_transaction(self._conn):
+                            result = operation(self._conn, *args)
+                    except Exception as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)  # Only once the COMMIT went through
+                continue
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._conn.close()
+
+# Load test: many concurrent submitters against one database
+def load_test(submitters=64, reports_per_submitter=200, notes_per_report=1, processes=2):
+    """
+    Hammer a scratch database from several processes, each with many submitter threads,
+    then check that every report and note landed with a unique ID.
+    """
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        db_path = os.path.join(scratch_dir, 'report_load_test.db')
+        report_store.connect(db_path).close()
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            runs = [pool.submit(_load_test_process, db_path, process_index, submitters, reports_per_submitter, notes_per_report)
+                    for process_index in range(processes)]
+            report_ids = [report_id for run in runs for report_id in run.result()]
+        elapsed = time.perf_counter() - start
+
+        conn = report_store.connect(db_path)
+        expected_reports = processes * submitters * reports_per_submitter
+        stored_reports = conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+        stored_notes = conn.execute("SELECT COUNT(*) FROM report_notes").fetchone()[0]
+        conn.close()
+
+        print(f"Submitted {expected_reports} reports from {processes * submitters} submitters in {elapsed:.2f}s "
+              f"({expected_reports / elapsed:.0f} reports/s)")
+        print(f"Stored reports: {stored_reports}, stored notes: {stored_notes}, unique IDs returned: {len(set(report_ids))}")
+
+        ok = (stored_reports == expected_reports and len(set(report_ids)) == expected_reports
+              and stored_notes == expected_reports * (1 + notes_per_report))  # Submission note + added notes
+        print("No lost updates." if ok else "LOST OR DUPLICATED UPDATES DETECTED!")
+    return ok
+
+def _load_test_process(db_path, process_index, submitters, reports_per_submitter, notes_per_report):
+    service = ReportService(db_path)
+
+    def submitter(submitter_index):
+        report_ids = []
+        for i in range(reports_per_submitter):
+            report_id = service.submit_report(f"addr{submitter_index}", f"tx-{process_index}-{submitter_index}-{i}",
+                                              0.5, f"analyst{submitter_index}", "load test")
+            for n in range(notes_per_report):
+                service.add_note(report_id, f"note {n}", f"analyst{submitter_index}")
+            report_ids.append(report_id)
+        return report_ids
+
+    with ThreadPoolExecutor(max_workers=submitters) as executor:
+        results = list(executor.map(submitter, range(submitters)))
+    service.close()
+    return [report_id for report_ids in results for report_id in report_ids]
+
+if __name__ == "__main__":
+    load_test()
@@ -0,0 +1,263 @@
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# SQLite database shared with the transactions table
+DATABASE_FILE = 'blockchain_data.db'
+
+# Reports saved by older versions of 5.py
+LEGACY_REPORTS_FILE = 'reports.csv'
+
+# How long a writer waits for another process's write lock (milliseconds)
+BUSY_TIMEOUT_MS = 30000
+
+# PRAGMA user_version once submission notes have been copied into report_notes
+SUBMISSION_NOTES_VERSION = 1
+
+# Columns added to the existing reports table
+REPORT_COLUMNS = {
+    'address': 'TEXT',
+    'tx_hash': 'TEXT',
+    'total_amount': 'REAL',
+    'timestamp': 'TEXT',
+}
+
+SEARCH_TERM_PATTERN = re.compile(r'\w+')
+
+LEGACY_NOTE_PATTERN = re.compile(r'^(?P<added_by>.*?) \((?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\): (?P<note>.*)$')
+
+def format_report_id(report_id):
+    return f"RPT-{report_id:04d}"
+
+def parse_report_id(report_id):
+    """
+    Accept either a numeric ID or the displayed "RPT-0001" form.
+
+    Returns:
+        int: Numeric report ID, or None if it can't be parsed.
+    """
+    text = str(report_id).strip().upper()
+    if text.startswith('RPT-'):
+        text = text[4:]
+    return int(text) if text.isdigit() else None
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# Create or upgrade the report tables and their lookup indexes
+def init_report_store(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS reports (
+                    report_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    transaction_id INTEGER,
+                    reported_by TEXT,
+                    notes TEXT)""")
+
+    existing_columns = {row[1] for row in conn.execute("PRAGMA table_info(reports)")}
+    for column, column_type in REPORT_COLUMNS.items():
+        if column not in existing_columns:
+            conn.execute(f"ALTER TABLE reports ADD COLUMN {column} {column_type}")
+
+    conn.execute("""CREATE TABLE IF NOT EXISTS report_notes (
+                    note_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    report_id INTEGER NOT NULL REFERENCES reports(report_id),
+                    added_by TEXT,
+                    note TEXT,
+                    timestamp TEXT)""")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_tx_hash ON reports(tx_hash)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_address ON reports(address)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_reported_by ON reports(reported_by)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_report_notes_report_id ON report_notes(report_id)")
+    init_note_search(conn)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SUBMISSION_NOTES_VERSION:
+        backfill_submission_notes(conn)
+        conn.execute(f"PRAGMA user_version = {SUBMISSION_NOTES_VERSION}")
+
+# Full-text index over report_notes, kept in sync by triggers
+def init_note_search(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'report_notes_fts'").fetchone() is not None:
+        return
+
+    conn.execute("""CREATE VIRTUAL TABLE report_notes_fts USING fts5(
+                    note, added_by,
+                    content='report_notes', content_rowid='note_id',
+                    tokenize='porter unicode61')""")
+    conn.execute("""CREATE TRIGGER report_notes_fts_insert AFTER INSERT ON report_notes BEGIN
+                    INSERT INTO report_notes_fts(rowid, note, added_by) VALUES (new.note_id, new.note, new.added_by);
+                    END""")
+    conn.execute("""CREATE TRIGGER report_notes_fts_delete AFTER DELETE ON report_notes BEGIN
+                    INSERT INTO report_notes_fts(report_notes_fts, rowid, note, added_by) VALUES ('delete', old.note_id, old.note, old.added_by);
+                    END""")
+    conn.execute("""CREATE TRIGGER report_notes_fts_update AFTER UPDATE ON report_notes BEGIN
+                    INSERT INTO report_notes_fts(report_notes_fts, rowid, note, added_by) VALUES ('delete', old.note_id, old.note, old.added_by);
+                    INSERT INTO report_notes_fts(rowid, note, added_by) VALUES (new.note_id, new.note, new.added_by);
+                    END""")
+    conn.execute("INSERT INTO report_notes_fts(report_notes_fts) VALUES ('rebuild')")
+
+# Notes given at submission time used to live only in reports.notes
+def backfill_submission_notes(conn):
+    """
+    Copy each report's submission note into report_notes unless it is already there.
+    Safe to run repeatedly; the triggers index the copied notes.
+    """
+    conn.execute("""INSERT INTO report_notes (report_id, added_by, note, timestamp)
+                    SELECT r.report_id, r.reported_by, r.notes, r.timestamp FROM reports r
+                    WHERE r.notes IS NOT NULL AND r.notes != ''
+                      AND NOT EXISTS (SELECT 1 FROM report_notes n
+                                      WHERE n.report_id = r.report_id AND n.note = r.notes)
+                    ORDER BY r.report_id""")
+
+@contextmanager
+def write_transaction(conn):
+    """
+    Run a block of writes in one BEGIN IMMEDIATE transaction.
+
+    The write lock is taken up front, so concurrent writers (threads or processes)
+    queue on busy_timeout instead of failing when upgrading a read lock.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:  # A failed COMMIT (e.g. SQLITE_BUSY) leaves the transaction open
+            conn.execute("ROLLBACK")
+        raise
+
+def connect(db_path=DATABASE_FILE, check_same_thread=True):
+    conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")  # Readers don't block the writer
+    with write_transaction(conn):
+        init_report_store(conn)
+    return conn
+
+# One-time import of reports.csv into the database
+def import_legacy_reports(conn, csv_path=LEGACY_REPORTS_FILE):
+    """
+    Copy reports from the old CSV file into an empty reports table.
+
+    Notes appended by the old add_note_to_report were concatenated into the notes
+    cell; those lines become separate report_notes rows.
+
+    Returns:
+        int: Number of reports imported.
+    """
+    if not os.path.exists(csv_path):
+        return 0
+
+    legacy_df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    with write_transaction(conn):
+        if conn.execute("SELECT 1 FROM reports LIMIT 1").fetchone() is not None:
+            return 0
+        for row in legacy_df.to_dict('records'):
+            note_lines = row.get('notes', '').split('\n')
+            report_id = parse_report_id(row.get('report_id', ''))
+            cursor = conn.execute(
+                "INSERT INTO reports (report_id, address, tx_hash, total_amount, reported_by, notes, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (report_id, row.get('address'), row.get('tx_hash'), float(row['total_amount']) if row.get('total_amount') else None,
+                 row.get('reported_by'), note_lines[0], row.get('timestamp')))
+            if note_lines[0]:
+                conn.execute("INSERT INTO report_notes (report_id, added_by, note, timestamp) VALUES (?, ?, ?, ?)",
+                             (cursor.lastrowid, row.get('reported_by'), note_lines[0], row.get('timestamp')))
+            for line in note_lines[1:]:
+                match = LEGACY_NOTE_PATTERN.match(line)
+                if match:
+                    conn.execute("INSERT INTO report_notes (report_id, added_by, note, timestamp) VALUES (?, ?, ?, ?)",
+                                 (cursor.lastrowid, match['added_by'], match['note'], match['timestamp']))
+                elif line.strip():
+                    conn.execute("INSERT INTO report_notes (report_id, note) VALUES (?, ?)", (cursor.lastrowid, line))
+    return len(legacy_df)
+
+# Insert a report inside the caller's transaction; returns its numeric ID
+def insert_report(conn, address, tx_hash, total_amount, reported_by, notes="", transaction_id=None):
+    timestamp = _now()
+    cursor = conn.execute(
+        "INSERT INTO reports (transaction_id, address, tx_hash, total_amount, reported_by, notes, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (transaction_id, address, tx_hash, total_amount, reported_by, notes, timestamp))
+    if notes:
+        conn.execute("INSERT INTO report_notes (report_id, added_by, note, timestamp) VALUES (?, ?, ?, ?)",
+                     (cursor.lastrowid, reported_by, notes, timestamp))
+    return cursor.lastrowid
+
+# Insert a note inside the caller's transaction; returns False if the report doesn't exist
+def insert_note(conn, report_id, note, added_by):
+    if conn.execute("SELECT 1 FROM reports WHERE report_id = ?", (report_id,)).fetchone() is None:
+        return False
+    conn.execute("INSERT INTO report_notes (report_id, added_by, note, timestamp) VALUES (?, ?, ?, ?)",
+                 (report_id, added_by, note, _now()))
+    return True
+
+# Append a new report; returns its numeric ID
+def submit_report(conn, address, tx_hash, total_amount, reported_by, notes="", transaction_id=None):
+    with write_transaction(conn):
+        return insert_report(conn, address, tx_hash, total_amount, reported_by, notes, transaction_id)
+
+# Append a note to an existing report; returns False if the report doesn't exist
+def add_note(conn, report_id, note, added_by):
+    with write_transaction(conn):
+        return insert_note(conn, report_id, note, added_by)
+
+def get_report(conn, report_id):
+    row = conn.execute("SELECT * FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+    if row is None:
+        return None
+
+    report = dict(row)
+    report['added_notes'] = [dict(note) for note in conn.execute(
+        "SELECT added_by, note, timestamp FROM report_notes WHERE report_id = ? ORDER BY note_id", (report_id,))]
+    return report
+
+def find_reports(conn, tx_hash=None, address=None, reported_by=None):
+    """
+    Look up reports through the tx_hash, address and reported_by indexes.
+
+    Returns:
+        list: Matching reports as dicts, oldest first.
+    """
+    conditions, params = [], []
+    for column, value in (('tx_hash', tx_hash), ('address', address), ('reported_by', reported_by)):
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if not conditions:
+        return []
+
+    query = f"SELECT * FROM reports WHERE {' AND '.join(conditions)} ORDER BY report_id"
+    return [dict(row) for row in conn.execute(query, params)]
+
+def search_notes(conn, query, limit=20, prefix=True):
+    """
+    Ranked keyword search over report notes.
+
+    Args:
+        conn (sqlite3.Connection): Report store connection.
+        query (str): Keywords; every keyword must match.
+        limit (int): Maximum number of notes to return.
+        prefix (bool): Match keywords as prefixes ("mix" finds "mixer").
+
+    Returns:
+        list: Matching notes as dicts, best match (BM25) first, with a highlighted snippet.
+    """
+    terms = SEARCH_TERM_PATTERN.findall(query)
+    if not terms:
+        return []
+    match = ' '.join(f'"{term}"*' if prefix else f'"{term}"' for term in terms)
+
+    rows = conn.execute("""SELECT n.note_id, n.report_id, n.added_by, n.note, n.timestamp,
+                                snippet(report_notes_fts, 0, '[', ']', '...', 12) AS snippet
+                         FROM report_notes_fts
+                         JOIN report_notes n ON n.note_id = report_notes_fts.rowid
+                         WHERE report_notes_fts MATCH ?
+                         ORDER BY rank
+                         LIMIT ?""", (match, limit))
+    return [dict(row) for row in rows]
+
+def list_reports(conn):
+    return pd.read_sql_query(
+        "SELECT report_id, address, tx_hash, total_amount, reported_by, timestamp FROM reports ORDER BY report_id", conn)
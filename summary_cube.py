@@ -0,0 +1,118 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from figure_cache import frame_fingerprint
+
+# Cube dimensions, in axis order
+DIMENSIONS = ('transaction_type', 'status', 'is_fraudulent', 'day')
+MEASURES = ('count', 'amount')
+
+# Recently built cubes, keyed by data fingerprint
+MAX_CACHED_CUBES = 8
+_cube_cache = OrderedDict()
+
+def _dimension_values(df, dim):
+    if dim == 'day':
+        if 'timestamp' not in df.columns:
+            return pd.Series(pd.NaT, index=df.index)
+        return pd.to_datetime(df['timestamp'], errors='coerce').dt.normalize()
+    if dim not in df.columns:
+        return pd.Series('unknown', index=df.index)
+    return df[dim]
+
+# Build the cube in one pass over the data
+def build_summary_cube(df):
+    """
+    Aggregate transactions into a dense type x status x fraud flag x day cube.
+
+    Args:
+        df (pd.DataFrame): Transaction data. Missing dimension columns fall into
+            a single "unknown" (or NaT) bucket.
+
+    Returns:
+        dict: 'labels' (dimension -> list of values), 'positions' (dimension ->
+            value -> axis index) and one ndarray per measure ('count', 'amount').
+    """
+    codes, labels = [], {}
+    for dim in DIMENSIONS:
+        dim_codes, dim_labels = pd.factorize(_dimension_values(df, dim), sort=True, use_na_sentinel=False)
+        codes.append(dim_codes)
+        labels[dim] = list(dim_labels) or [pd.NaT if dim == 'day' else 'unknown']
+
+    shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+    size = int(np.prod(shape))
+    flat_index = np.ravel_multi_index(codes, shape) if len(df) else np.zeros(0, dtype=np.intp)
+
+    amounts = pd.to_numeric(df['amount'], errors='coerce').fillna(0).to_numpy(dtype=float) if 'amount' in df.columns else None
+    return {
+        'labels': labels,
+        'positions': {dim: {value: i for i, value in enumerate(values)} for dim, values in labels.items()},
+        'count': np.bincount(flat_index, minlength=size).reshape(shape),
+        'amount': np.bincount(flat_index, weights=amounts, minlength=size).reshape(shape) if amounts is not None
+                  else np.zeros(shape),
+    }
+
+def get_summary_cube(df):
+    source_columns = ('transaction_type', 'status', 'is_fraudulent', 'timestamp', 'amount')
+    key = frame_fingerprint(df, [c for c in source_columns if c in df.columns])
+    cube = _cube_cache.get(key)
+    if cube is None:
+        cube = build_summary_cube(df)
+        _cube_cache[key] = cube
+        while len(_cube_cache) > MAX_CACHED_CUBES:
+            _cube_cache.popitem(last=False)
+    else:
+        _cube_cache.move_to_end(key)
+    return cube
+
+# Slice and roll up the cube
+def slice_cube(cube, measure='count', by=None, **filters):
+    """
+    Sum a measure over the cube, optionally filtered and grouped.
+
+    Args:
+        cube (dict): Cube from build_summary_cube.
+        measure (str): 'count' or 'amount'.
+        by (str or list): Dimension(s) to keep; all others are summed out.
+        **filters: dimension=value or dimension=[values] to restrict to.
+
+    Returns:
+        Scalar when by is None, otherwise a pd.Series indexed by the kept dimension(s).
+    """
+    data = cube[measure]
+    labels = dict(cube['labels'])
+    for axis, dim in enumerate(DIMENSIONS):
+        if dim not in filters:
+            continue
+        wanted = filters[dim] if isinstance(filters[dim], (list, tuple, set)) else [filters[dim]]
+        positions = [cube['positions'][dim][value] for value in wanted if value in cube['positions'][dim]]
+        data = np.take(data, positions, axis=axis)
+        labels[dim] = [labels[dim][p] for p in positions]
+
+    keep = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    summed_axes = tuple(axis for axis, dim in enumerate(DIMENSIONS) if dim not in keep)
+    result = data.sum(axis=summed_axes)
+    if not keep:
+        return result.item()
+
+    kept_dims = [dim for dim in DIMENSIONS if dim in keep]
+    if len(kept_dims) == 1:
+        index = pd.Index(labels[kept_dims[0]], name=kept_dims[0])
+    else:
+        index = pd.MultiIndex.from_product([labels[dim] for dim in kept_dims], names=kept_dims)
+    return pd.Series(result.reshape(-1), index=index, name=measure)
+
+def status_summary(cube):
+    status_counts = slice_cube(cube, by='status')
+    return {
+        'Total Transactions': int(cube['count'].sum()),
+        'Completed Transactions': int(status_counts.get('completed', 0)),
+        'Pending Transactions': int(status_counts.get('pending', 0)),
+        'Failed Transactions': int(status_counts.get('failed', 0)),
+    }
+
+def type_counts(cube, name='count'):
+    counts = slice_cube(cube, by='transaction_type')
+    return counts[counts > 0].rename(name).reset_index()
@@ -0,0 +1,30 @@
+import pytest
+
+import auth_service
+from auth_service import AuthService
+
+@pytest.fixture
+def service(tmp_path):
+    service = AuthService(str(tmp_path / 'users.json'), workers=2)
+    yield service
+    service.close()
+
+def test_dummy_hash_is_computed_on_first_unknown_login(service, monkeypatch):
+    monkeypatch.setattr(auth_service, '_dummy_hash', None)
+    assert service.register('alice', 'correct horse')
+    assert service.authenticate('alice', 'correct horse') is not None
+    assert auth_service._dummy_hash is None  # Known users never need it
+    assert service.authenticate('mallory', 'guess') is None
+    dummy_hash = auth_service._dummy_hash
+    assert dummy_hash is not None
+    service.authenticate('eve', 'guess')
+    assert auth_service._dummy_hash == dummy_hash
+
+def test_sessions(service):
+    assert service.register('alice', 'correct horse')
+    assert not service.register('alice', 'other')
+    assert service.authenticate('alice', 'wrong') is None
+    token = service.authenticate('alice', 'correct horse')
+    assert service.validate_session(token) == 'alice'
+    service.logout(token)
+    assert service.validate_session(token) is None
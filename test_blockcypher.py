@@ -0,0 +1,223 @@
+import asyncio
+import tempfile
+import time
+
+import pytest
+
+import blockcypher
+import chain_archive
+import http_cache
+from mock_api import _fake_address, address_history, run_load_test
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(blockcypher, 'BACKOFF_BASE', 0.01)
+
+def _addresses(count):
+    return [_fake_address('test', i) for i in range(count)]
+
+def test_concurrency_is_bounded(mock_server):
+    server = mock_server(latency=0.1, latency_jitter=0)
+    results = blockcypher.fetch_addresses(_addresses(30), concurrency=5, rate=1000, use_cache=False)
+    assert all('error' not in data for data in results.values())
+    assert server.peak_in_flight == 5
+
+def test_results_keep_input_order(mock_server):
+    mock_server(latency=0.01)
+    addresses = _addresses(20)
+    results = blockcypher.fetch_addresses(addresses + addresses[:5], concurrency=8, rate=1000, use_cache=False)
+    assert list(results) == addresses
+    assert all(data['address'] == address for address, data in results.items())
+
+def test_server_errors_are_retried(mock_server):
+    mock_server(latency=0.005, error_rate=0.3)
+    stats = {}
+    results = blockcypher.fetch_addresses(_addresses(40), concurrency=10, rate=1000, max_retries=10, stats=stats,
+                                          use_cache=False)
+    assert all('error' not in data for data in results.values())
+    assert stats.get('retries', 0) > 0
+    assert stats.get('errors', 0) == 0
+
+def test_persistent_errors_give_up_after_max_retries(mock_server):
+    server = mock_server(latency=0, error_rate=1.0)
+    stats = {}
+    results = blockcypher.fetch_addresses(_addresses(3), concurrency=3, rate=1000, max_retries=2, stats=stats,
+                                          use_cache=False)
+    assert all(data['error'].startswith('Request failed after 3 attempts: HTTP 500') for data in results.values())
+    assert server.request_count == 9
+    assert stats['retries'] == 6
+    assert stats['errors'] == 3
+
+def test_rate_limited_requests_wait_for_retry_after(mock_server):
+    server = mock_server(latency=0, rate_limit=5)
+    stats = {}
+    start = time.perf_counter()
+    results = blockcypher.fetch_addresses(_addresses(12), concurrency=12, rate=1000, max_retries=5, stats=stats,
+                                          use_cache=False)
+    elapsed = time.perf_counter() - start
+    assert all('error' not in data for data in results.values())
+    assert stats['retries'] > 0
+    assert server.request_count == 12 + stats['retries']
+    assert elapsed >= 1  # The server's Retry-After: 1 is honoured instead of the short backoff
+
+def test_token_bucket_paces_requests(mock_server):
+    server = mock_server(latency=0)
+    start = time.perf_counter()
+    results = blockcypher.fetch_addresses(_addresses(30), concurrency=30, rate=10, use_cache=False)
+    elapsed = time.perf_counter() - start
+    assert all('error' not in data for data in results.values())
+    assert server.request_count == 30
+    # A burst of 10, then 20 more at 10 per second
+    assert 1.8 <= elapsed < 5
+
+def test_token_bucket_allows_burst_then_refills():
+    async def acquire_all(bucket, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.perf_counter() - start
+
+    assert asyncio.run(acquire_all(blockcypher.TokenBucket(rate=20, capacity=5), 5)) < 0.05
+    assert asyncio.run(acquire_all(blockcypher.TokenBucket(rate=20, capacity=5), 15)) >= 0.45
+
+# Paged address history
+def _history(server, address):
+    return address_history(address, server.config)
+
+def test_history_follows_has_more(mock_server):
+    server = mock_server(latency=0, txs_per_address=120)
+    address = _addresses(1)[0]
+    summary = {}
+    txs = list(blockcypher.iter_address_transactions(address, summary=summary, page_limit=50))
+    assert [tx['hash'] for tx in txs] == [tx['hash'] for tx in _history(server, address)]
+    assert server.request_count >= 3
+    assert summary['n_tx'] == 120
+    assert 'txs' not in summary and 'hasMore' not in summary and 'error' not in summary
+
+@pytest.mark.parametrize('page_limit', [6, 7, 10, 13, 50])
+def test_history_pages_overlap_without_duplicates(mock_server, page_limit):
+    server = mock_server(latency=0, txs_per_address=120)
+    address = _addresses(1)[0]
+    history = _history(server, address)
+    txs = list(blockcypher.iter_address_transactions(address, page_limit=page_limit))
+    assert [tx['hash'] for tx in txs] == [tx['hash'] for tx in history]
+
+def test_history_page_boundaries_split_blocks(mock_server):
+    # Guards the test above: with these limits some pages must end partway through a block
+    server = mock_server(latency=0, txs_per_address=120)
+    heights = [tx['block_height'] for tx in _history(server, _addresses(1)[0])]
+    assert any(heights[end - 1] == heights[end] for end in range(6, len(heights), 6))
+
+def test_history_skips_rest_of_block_larger_than_page(mock_server):
+    server = mock_server(latency=0, txs_per_address=120)
+    address = _addresses(1)[0]
+    history = _history(server, address)
+    summary = {}
+    txs = list(blockcypher.iter_address_transactions(address, summary=summary, page_limit=2))
+    hashes = [tx['hash'] for tx in txs]
+    assert len(hashes) == len(set(hashes))
+    assert set(hashes) <= {tx['hash'] for tx in history}
+    # Only blocks with more transactions than a page lose any
+    block_sizes = {}
+    for tx in history:
+        block_sizes[tx['block_height']] = block_sizes.get(tx['block_height'], 0) + 1
+    assert all(block_sizes[tx['block_height']] > 2 for tx in history if tx['hash'] not in set(hashes))
+    assert 'some were skipped' in summary['error']  # Callers know the history is incomplete
+
+def test_history_reports_page_without_confirmed_transactions(mock_server):
+    server = mock_server(latency=0)
+    address = _addresses(1)[0]
+    first_page = {'address': address, 'n_tx': 60, 'hasMore': True,
+                  'txs': [{'hash': f"{i:064x}", 'block_height': -1, 'inputs': [], 'outputs': []} for i in range(50)]}
+    summary = {}
+    txs = list(blockcypher.iter_address_transactions(address, summary=summary, first_page=first_page))
+    assert len(txs) == 50
+    assert 'unconfirmed' in summary['error']
+    assert server.request_count == 0
+
+def test_history_uses_first_page_and_after(mock_server):
+    server = mock_server(latency=0, txs_per_address=120)
+    address = _addresses(1)[0]
+    history = _history(server, address)
+    after = history[60]['block_height']
+    first_page = blockcypher.fetch_addresses([address], rate=1000, use_cache=False,
+                                             params_by_address={address: {'limit': 20, 'after': after}})[address]
+    requests_before = server.request_count
+    txs = list(blockcypher.iter_address_transactions(address, first_page=first_page, page_limit=20, after=after))
+    assert [tx['hash'] for tx in txs] == [tx['hash'] for tx in history if tx['block_height'] > after]
+    pages_with_first = server.request_count - requests_before
+
+    http_cache.CACHE_FILE += '.cold'  # Fetch every page again
+    requests_before = server.request_count
+    assert list(blockcypher.iter_address_transactions(address, page_limit=20, after=after)) == txs
+    assert pages_with_first == server.request_count - requests_before - 1  # The first page wasn't fetched again
+
+def test_history_stops_with_error_partway(mock_server):
+    server = mock_server(latency=0, txs_per_address=120)
+    address = _addresses(1)[0]
+    summary = {}
+    transactions = blockcypher.iter_address_transactions(address, summary=summary, page_limit=50)
+    first_page = [next(transactions) for _ in range(50)]
+    server.config['error_rate'] = 1.0
+    rest = list(transactions)
+    assert rest == []
+    assert summary['error'] == 'Internal server error.'
+    assert summary['n_tx'] == 120  # Fields from the first page are kept
+
+    # The failed page was not cached, so a later walk gets the whole history
+    server.config['error_rate'] = 0.0
+    txs = list(blockcypher.iter_address_transactions(address, page_limit=50))
+    assert txs[:50] == first_page
+    assert len(txs) == 120
+
+def test_history_requests_all_inputs_and_outputs(mock_server, monkeypatch):
+    server = mock_server(latency=0, txs_per_address=120)
+    address = _addresses(1)[0]
+    history = _history(server, address)
+    large = [tx['hash'] for tx in history if len(tx['outputs']) > 20]
+    assert large  # Guards the test: some transactions exceed BlockCypher's default of 20 outputs
+
+    summary = {}
+    txs = list(blockcypher.iter_address_transactions(address, summary=summary))
+    assert [tx['outputs'] for tx in txs] == [tx['outputs'] for tx in history]
+    assert 'truncated' not in summary
+
+    # Transactions larger than the limit are reported, so callers don't trust local balances
+    monkeypatch.setattr(blockcypher, 'TX_IO_LIMIT', 20)
+    http_cache.CACHE_FILE += '.cold'
+    summary = {}
+    txs = list(blockcypher.iter_address_transactions(address, summary=summary))
+    assert [tx['hash'] for tx in txs if blockcypher.is_truncated(tx)] == large
+    assert summary['truncated'] == len(large)
+
+def test_address_snapshots_are_stored_once(mock_server):
+    server = mock_server(latency=0)
+    addresses = _addresses(4)
+    results = blockcypher.fetch_addresses(addresses[:3], rate=1000)
+    assert blockcypher.get_transaction_data(addresses[3])['address'] == addresses[3]
+    assert all(chain_archive.get_address_snapshot(address) is not None for address in addresses)
+    assert http_cache._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+    requests_before = server.request_count
+    assert blockcypher.fetch_addresses(addresses[:3], rate=1000) == results
+    assert blockcypher.get_transaction_data(addresses[3])['address'] == addresses[3]
+    assert server.request_count == requests_before
+
+    # Partial (parameterized) responses aren't address snapshots; they use the response cache
+    params = {addresses[0]: {'after': 849990}}
+    partial = blockcypher.fetch_addresses(addresses[:1], rate=1000, params_by_address=params)[addresses[0]]
+    assert chain_archive.get_address_snapshot(addresses[0]) == results[addresses[0]]
+    assert blockcypher.fetch_addresses(addresses[:1], rate=1000, params_by_address=params)[addresses[0]] == partial
+    assert server.request_count == requests_before + 1
+
+def test_load_harness_removes_its_scratch_caches(tmp_path, monkeypatch):
+    # run_load_test points the fetch modules at its own server; restore them afterwards
+    monkeypatch.setattr(blockcypher, 'BLOCKCYPHER_API', blockcypher.BLOCKCYPHER_API)
+    monkeypatch.setattr(http_cache, 'CACHE_FILE', http_cache.CACHE_FILE)
+    monkeypatch.setattr(chain_archive, 'ARCHIVE_FILE', chain_archive.ARCHIVE_FILE)
+    monkeypatch.setenv('BLOCKCHAIN_INFO_API', '')
+    monkeypatch.setenv('COINGECKO_API', '')
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    stats = run_load_test(addresses=10, latency=0, error_rate=0, history_addresses=1)
+    assert len(stats['latencies']) == 10
+    assert list(tmp_path.iterdir()) == []
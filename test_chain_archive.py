@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+import chain_archive
+
+@pytest.fixture
+def failing_connection(tmp_path, monkeypatch, failing_commit):
+    monkeypatch.setattr(chain_archive, 'ARCHIVE_FILE', str(tmp_path / 'chain_archive.db'))
+    connection = failing_commit(chain_archive._connection())
+    monkeypatch.setattr(chain_archive, '_connection', lambda: connection)
+    return connection
+
+def _block(block_hash, height):
+    return {'hash': block_hash, 'height': height, 'time': 1700000000,
+            'tx': [{'hash': f"{block_hash}-tx", 'inputs': [], 'out': [{'addr': 'addr1', 'value': 1}]}]}
+
+def test_failed_block_commit_is_rolled_back(failing_connection):
+    with pytest.raises(sqlite3.OperationalError):
+        chain_archive.archive_block(_block('a' * 64, 1))
+    assert not failing_connection.in_transaction
+    assert chain_archive.get_block('a' * 64) is None
+
+    chain_archive.archive_block(_block('b' * 64, 2))  # The thread's connection still works
+    assert chain_archive.get_block('b' * 64)['height'] == 2
+    assert chain_archive.get_transaction(f"{'b' * 64}-tx") is not None
+
+def test_failed_transaction_commit_is_rolled_back(failing_connection):
+    with pytest.raises(sqlite3.OperationalError):
+        chain_archive.archive_transaction({'hash': 'tx1', 'block_height': 5, 'inputs': [], 'out': []})
+    assert not failing_connection.in_transaction
+    assert chain_archive.get_transaction('tx1') is None
+    chain_archive.archive_transaction({'hash': 'tx2', 'block_height': 5, 'inputs': [], 'out': []})
+    assert chain_archive.get_transaction('tx2') is not None
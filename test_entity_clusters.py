@@ -0,0 +1,72 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from entity_clusters import AddressClusters, cluster_frame, is_likely_coinjoin
+
+def _partition(clusters):
+    return set(pd.Series(clusters.addresses, dtype=object).groupby(clusters.cluster_ids()).agg(frozenset))
+
+def _components(input_groups, extra_addresses=()):
+    graph = nx.Graph()
+    graph.add_nodes_from(extra_addresses)
+    for group in input_groups:
+        graph.add_nodes_from(group)
+        graph.add_edges_from(zip(group, group[1:]))
+    return {frozenset(component) for component in nx.connected_components(graph)}
+
+def _random_input_groups(seed, n_tx=3000, n_addresses=2000):
+    # Small address space, so transactions chain clusters together
+    rng = np.random.default_rng(seed)
+    return [[f"addr{a}" for a in rng.choice(n_addresses, size=rng.integers(1, 5), replace=False)] for _ in range(n_tx)]
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_add_inputs_matches_networkx(seed):
+    groups = _random_input_groups(seed)
+    clusters = AddressClusters()
+    for group in groups:
+        clusters.add_inputs(group)
+    assert _partition(clusters) == _components(groups)
+    assert clusters.cluster_count == len(_components(groups))
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_add_input_groups_matches_networkx_incrementally(seed):
+    groups = _random_input_groups(seed)
+    clusters = AddressClusters()
+    for start in range(0, len(groups), 1000):  # Merged in three batches, like successive blocks
+        batch = groups[start:start + 1000]
+        keys = np.repeat(np.arange(start, start + len(batch)), [len(group) for group in batch])
+        clusters.add_input_groups(keys, [address for group in batch for address in group])
+    assert _partition(clusters) == _components(groups)
+
+def test_coinjoins_are_not_merged():
+    coinjoin = {'inputs': [{'addresses': [f"mix{i}"]} for i in range(5)],
+                'outputs': [{'value': 100000, 'addresses': [f"out{i}"]} for i in range(5)]}
+    payment = {'inputs': [{'addresses': ['a']}, {'addresses': ['b']}],
+               'outputs': [{'value': 70000, 'addresses': ['c']}, {'value': 3000, 'addresses': ['a']}]}
+    clusters = AddressClusters()
+    clusters.add_transactions([coinjoin, payment])
+    assert clusters.skipped_coinjoins == 1
+    assert clusters.members('a') == ['a', 'b']
+    assert clusters.members('mix0') == ['mix0']
+    assert is_likely_coinjoin(5, [100000] * 5)
+    assert not is_likely_coinjoin(2, [70000, 3000])
+
+def test_cluster_frame_labels_shared_inputs():
+    df = pd.DataFrame({'transaction_id': [1, 1, 2, 2, 3], 'address': ['a', 'b', 'b', 'c', 'd']})
+    clustered, clusters = cluster_frame(df)
+    labels = clustered.groupby('address')['cluster_id'].first()
+    assert labels['a'] == labels['b'] == labels['c'] != labels['d']
+    assert clusters.cluster_count == 2
+
+def test_missing_addresses_are_skipped():
+    df = pd.DataFrame({'transaction_id': ['tx1', 'tx1', 'tx2', 'tx3'], 'address': ['a', np.nan, 'z', 'q']})
+    clustered, clusters = cluster_frame(df)
+    assert clusters.cluster_of('a') != clusters.cluster_of('q')
+    assert clusters.cluster_count == 3
+    assert clustered['cluster_id'].iloc[1] == -1
+
+    clusters = AddressClusters()
+    clusters.add_input_groups(np.array(['tx1', 'tx1']), np.array([None, np.nan], dtype=object))
+    assert clusters.cluster_count == 0
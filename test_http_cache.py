@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+import chain_archive
+import http_cache
+from mock_api import start_mock_server
+
+@pytest.fixture(autouse=True)
+def scratch_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, 'CACHE_FILE', str(tmp_path / 'http_cache.db'))
+    monkeypatch.setattr(chain_archive, 'ARCHIVE_FILE', str(tmp_path / 'chain_archive.db'))
+    monkeypatch.setattr(http_cache, '_writes_since_check', 0)
+
+def _cached_urls():
+    return [url for url, in http_cache._connection().execute("SELECT url FROM responses")]
+
+def test_eviction_checks_counted_across_threads(monkeypatch):
+    checks = []
+    monkeypatch.setattr(http_cache, 'evict', lambda max_bytes=None: checks.append(1))
+    threads, writes_per_thread = 8, 250
+
+    def writer(thread):
+        for i in range(writes_per_thread):
+            http_cache.put_cached(f"https://example.test/{thread}/{i}", None, {'i': i}, http_cache.ADDRESS_TTL)
+
+    workers = [threading.Thread(target=writer, args=(thread,)) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(checks) == threads * writes_per_thread // http_cache.EVICTION_CHECK_INTERVAL
+
+def test_blocks_and_confirmed_transactions_are_stored_once(monkeypatch):
+    import P2P
+
+    server = start_mock_server(latency=0, txs_per_block=5)
+    try:
+        monkeypatch.setattr(P2P, 'BLOCKCHAIN_INFO_API', server.base_url)
+        block_hash = P2P.get_block_info(f"{7:064x}")['hash']  # Mock blocks carry their own hash
+        assert chain_archive.get_block(block_hash) is not None
+        tx_hash = 'ab' * 32
+        assert P2P.get_transaction_details(tx_hash, verbose=False)['hash'] == tx_hash
+        assert chain_archive.get_transaction(tx_hash) is not None
+        assert _cached_urls() == []  # Archived objects aren't cached a second time
+
+        requests_before = server.request_count
+        P2P.get_block_info(block_hash)
+        P2P.get_transaction_details(tx_hash, verbose=False)
+        assert server.request_count == requests_before
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,51 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from job_queue import JobQueue, fraud_training_job
+
+def write_job(artifact_path, text, progress=None):
+    with open(artifact_path, 'w') as artifact:
+        artifact.write(text)
+    progress(1, 1)
+    return len(text)
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(max_workers=1, artifact_dir=str(tmp_path / 'artifacts'))
+    yield queue
+    queue.shutdown()
+
+def _wait(queue, job_id):
+    queue._jobs[job_id]['future'].result(timeout=60)
+    status = queue.status(job_id)
+    while status['finished'] is None:  # Set by the future's done callback
+        time.sleep(0.01)
+        status = queue.status(job_id)
+    return status
+
+def test_artifacts_expire_after_finishing(queue):
+    job_id = queue.submit('write', write_job, 'hello', filename='out.txt')
+    status = _wait(queue, job_id)
+    assert status['state'] == 'done' and status['result'] == 5
+    assert status['finished'] >= status['submitted']
+
+    # A job that sat in the queue for longer than the TTL keeps its fresh artifact
+    queue._jobs[job_id]['submitted'] -= 2 * 60 * 60
+    queue.cleanup()
+    assert queue.status(job_id) is not None and os.path.exists(status['artifact_path'])
+
+    queue._jobs[job_id]['finished'] -= 2 * 60 * 60
+    queue.cleanup()
+    assert queue.status(job_id) is None and not os.path.exists(status['artifact_path'])
+
+def test_fraud_training_job_flags_outliers(tmp_path):
+    pytest.importorskip('sklearn')
+    amounts = np.r_[np.random.default_rng(0).normal(100, 5, 990), np.full(10, 10000.0)]
+    artifact_path = str(tmp_path / 'predictions.npy')
+    flagged = fraud_training_job(artifact_path, amounts, progress=lambda done, total: None)
+    predictions = np.load(artifact_path)
+    assert flagged == (predictions == -1).sum() == 50
+    assert (predictions[-10:] == -1).all()
@@ -0,0 +1,48 @@
+import pytest
+
+import merkle
+
+CHUNK_ROWS = 64
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / 'transactions.csv'
+    path.write_text("transaction_id,amount,address\n" + ''.join(f"{i},{i % 50},addr{i % 7}\n" for i in range(1000)))
+    merkle.build_index(str(path), chunk_rows=CHUNK_ROWS)
+    return path
+
+def _replace_header(path, header):
+    path.write_text(header + "\n" + path.read_text().split("\n", 1)[1])
+
+def test_intact_file(dataset):
+    assert merkle.verify_file(str(dataset)) == {'tampered_chunks': [], 'header_changed': False, 'unindexed_rows': 0}
+
+def test_changed_row_flags_its_chunk(dataset):
+    lines = dataset.read_text().split("\n")
+    lines[1 + 300] = "300,49,addr0"  # Data row 300
+    dataset.write_text("\n".join(lines))
+    result = merkle.verify_file(str(dataset))
+    assert result['tampered_chunks'] == [300 // CHUNK_ROWS]
+    assert not result['header_changed']
+
+@pytest.mark.parametrize('header', ["transaction_id,amount,addresS", "id,amount_btc,address,notes"])
+def test_header_edit_is_not_row_tampering(dataset, header):
+    _replace_header(dataset, header)
+    result = merkle.verify_file(str(dataset))
+    assert result == {'tampered_chunks': [], 'header_changed': True, 'unindexed_rows': 0}
+    assert merkle.verify_file(str(dataset), sample=4)['tampered_chunks'] == []  # Seeks to the indexed offsets
+    proof = merkle.record_proof(str(dataset), 500)
+    assert proof['record'] == "500,0,addr3"
+    assert merkle.verify_record(proof['record'], 500, proof['size'], proof['proof'], proof['root'])
+    with pytest.raises(ValueError):
+        merkle.update_index(str(dataset))
+
+def test_appended_rows_are_reported_until_indexed(dataset):
+    with open(dataset, 'a') as data_file:
+        data_file.write(''.join(f"{i},1,new{i}\n" for i in range(1000, 1010)))
+    assert merkle.verify_file(str(dataset)) == {'tampered_chunks': [], 'header_changed': False, 'unindexed_rows': 10}
+
+    index = merkle.update_index(str(dataset))
+    assert index['rows'] == 1010
+    assert index['root'] == merkle.build_index(str(dataset), chunk_rows=CHUNK_ROWS, save=False)['root']
+    assert merkle.verify_file(str(dataset))['unindexed_rows'] == 0
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+import http_cache
+import price_service
+from mock_api import start_mock_server
+
+HOUR = 3600
+START = 1_700_000_000
+
+@pytest.fixture(autouse=True)
+def scratch_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_service, 'PRICE_FILE', str(tmp_path / 'prices.db'))
+    monkeypatch.setattr(http_cache, 'CACHE_FILE', str(tmp_path / 'http_cache.db'))
+    monkeypatch.setattr(price_service, '_valued_cache', price_service.OrderedDict())
+    monkeypatch.setattr(price_service, '_refreshes', price_service.OrderedDict())
+
+def _coverage(asset):
+    return price_service._connection().execute("SELECT start_ts, end_ts FROM coverage WHERE asset = ?",
+                                                (asset,)).fetchone()
+
+def _fake_fetch(empty_before=None):
+    calls = []
+
+    def fetch(asset, start, end):
+        calls.append((start, end))
+        if empty_before is not None and end <= empty_before:
+            return []
+        return [(asset, ts, 100.0) for ts in range(start - start % HOUR + HOUR, end, HOUR)]
+    return fetch, calls
+
+def test_empty_response_is_not_marked_covered(monkeypatch):
+    fetch, calls = _fake_fetch(empty_before=START + 10 * HOUR)
+    monkeypatch.setattr(price_service, '_fetch_range', fetch)
+    assert price_service.refresh_prices('BTC', START, START + 5 * HOUR) == 0
+    assert _coverage('BTC') is None
+    assert price_service.refresh_prices('BTC', START, START + 5 * HOUR) == 0
+    assert len(calls) == 2  # Asked again instead of treating the gap as known
+
+def test_only_gaps_with_prices_extend_coverage(monkeypatch):
+    fetch, calls = _fake_fetch(empty_before=START + 10 * HOUR)
+    monkeypatch.setattr(price_service, '_fetch_range', fetch)
+    assert price_service.refresh_prices('BTC', START + 10 * HOUR, START + 20 * HOUR) > 0
+    assert _coverage('BTC') == (START + 10 * HOUR, START + 20 * HOUR)
+
+    # The earlier gap comes back empty, the later one with prices
+    assert price_service.refresh_prices('BTC', START, START + 30 * HOUR) > 0
+    assert _coverage('BTC') == (START + 10 * HOUR, START + 30 * HOUR)
+    calls.clear()
+    price_service.refresh_prices('BTC', START, START + 30 * HOUR)
+    assert calls == [(START, START + 10 * HOUR)]
+
+def test_background_refresh_updates_cached_valuation(monkeypatch):
+    server = start_mock_server(latency=0.05)
+    try:
+        monkeypatch.setattr(price_service, 'COINGECKO_API', f"{server.base_url}/api/v3")
+        df = pd.DataFrame({'timestamp': pd.to_datetime([START, START + 5 * HOUR], unit='s'),
+                           'transaction_type': ['BTC', 'ETH'], 'amount': [2.0, 1.0]})
+
+        before = price_service.get_usd_valued(df, refresh=False)
+        assert server.request_count == 0  # Valuing with cached prices does no I/O
+        assert before['amount_usd'].isna().all()
+
+        future = price_service.refresh_frame_prices_async(df)
+        assert price_service.refresh_frame_prices_async(df) is future
+        assert future.result(timeout=30)
+        after = price_service.get_usd_valued(df, refresh=False)
+        assert after['amount_usd'].notna().all()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_fetched_ranges_are_stored_once(monkeypatch):
+    server = start_mock_server(latency=0)
+    try:
+        monkeypatch.setattr(price_service, 'COINGECKO_API', f"{server.base_url}/api/v3")
+        assert price_service.refresh_prices('BTC', START, START + 5 * HOUR) > 0
+        assert _coverage('BTC') is not None
+        # The price store already keeps the range; the HTTP response cache stays empty
+        assert http_cache._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
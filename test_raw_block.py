@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+
+from raw_block import GENESIS_BLOCK_HEX, RawBlock, parse_block_hex, script_address, validate_against_json
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Output scripts and addresses from the BIP173/BIP350 test vectors, Bitcoin Core's
+# key_io tests and the genesis block; independent of raw_block's encoders
+ADDRESS_VECTORS = {
+    'p2pkh': ('76a91462e907b15cbf27d5425399ebf6f0fb50ebb88f1888ac', '1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa'),
+    'p2sh': ('a914e9c3dd0c07aac76179ebc76a6c78d4d67c6c160a87', '3P14159f73E4gFr7JterCCQh9QjiTjiZrG'),
+    'p2wpkh': ('0014751e76e8199196d454941c45d1b3a323f1433bd6', 'bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4'),
+    'p2wsh': ('00201863143c14c5166804bd19203356da136c985678cd4d27a1b8c6329604903262',
+              'bc1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3qccfmv3'),
+    'p2tr': ('512079be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798',
+             'bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0'),
+}
+
+def _load_json(name):
+    with open(os.path.join(FIXTURE_DIR, name)) as fixture:
+        return json.load(fixture)
+
+def _load_hex(name):
+    with open(os.path.join(FIXTURE_DIR, name)) as fixture:
+        return fixture.read()
+
+@pytest.mark.parametrize('script_type', sorted(ADDRESS_VECTORS))
+def test_script_address_vectors(script_type):
+    script, address = ADDRESS_VECTORS[script_type]
+    assert script_address(bytes.fromhex(script)) == address
+
+def test_non_standard_scripts_have_no_address():
+    assert script_address(bytes.fromhex('6a0766697874757265')) is None  # OP_RETURN
+    assert script_address(b'') is None
+
+def test_genesis_block_matches_json():
+    block = parse_block_hex(GENESIS_BLOCK_HEX)
+    block_data = _load_json('genesis_block.json')
+    assert validate_against_json(block, block_data) == []
+    assert block.header['hash'] == block_data['hash']
+    assert block.header['mrkl_root'] == block_data['mrkl_root']
+    assert block.output_addresses() == ['1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa']
+
+def test_output_types_block_matches_json():
+    block = parse_block_hex(_load_hex('output_types_block.hex'))
+    block_data = _load_json('output_types_block.json')
+    assert validate_against_json(block, block_data) == []
+    assert block.size == block_data['size']
+    assert block.txids() == [tx['hash'] for tx in block_data['tx']]
+
+    json_addresses = [output.get('addr') for tx in block_data['tx'] for output in tx['out']]
+    assert block.output_addresses() == json_addresses
+    scripts = {output['script']: output.get('addr') for tx in block_data['tx'] for output in tx['out']}
+    for script, address in ADDRESS_VECTORS.values():
+        assert scripts[script] == address  # Every script type appears in the fixture
+
+def test_validation_reports_mismatched_addresses():
+    block = RawBlock(bytes.fromhex(_load_hex('output_types_block.hex').strip()))
+    block_data = _load_json('output_types_block.json')
+    block_data['tx'][1]['out'][3]['addr'] = ADDRESS_VECTORS['p2wsh'][1]
+    assert validate_against_json(block, block_data) == ['outputs.address: 1 mismatched rows']
+
+# Fetching and archiving raw blocks
+@pytest.fixture
+def block_server(tmp_path, monkeypatch):
+    import chain_archive
+    import P2P
+    from mock_api import start_mock_server
+
+    server = start_mock_server(latency=0, txs_per_block=20)
+    monkeypatch.setattr(chain_archive, 'ARCHIVE_FILE', str(tmp_path / 'chain_archive.db'))
+    monkeypatch.setattr(P2P, 'BLOCKCHAIN_INFO_API', server.base_url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_fetched_raw_block_is_verified_and_archived(block_server):
+    import chain_archive
+    import P2P
+
+    block_hash = block_server.block(f"{7:064x}")[0]['hash']
+    block = P2P.get_raw_block_info(block_hash)
+    assert block.header['hash'] == block_hash
+    assert chain_archive.get_raw_block(block_hash) is not None
+
+    requests_before = block_server.request_count
+    assert P2P.get_raw_block_info(block_hash).header['hash'] == block_hash
+    assert block_server.request_count == requests_before  # Served from the archive
+
+def test_block_with_wrong_hash_is_not_archived(block_server):
+    import chain_archive
+    import P2P
+
+    name = f"{8:064x}"  # The mock's block for this name hashes to something else
+    assert P2P.get_raw_block_info(name) is None
+    assert chain_archive.get_raw_block(name) is None
+
+def test_truncated_block_is_rejected(block_server, monkeypatch):
+    import chain_archive
+    import P2P
+
+    block_data, serialization = block_server.block(f"{9:064x}")
+    monkeypatch.setattr(block_server, 'block', lambda name: (block_data, serialization[:len(serialization) // 2]))
+    assert P2P.get_raw_block_info(block_data['hash']) is None
+    assert chain_archive.get_raw_block(block_data['hash']) is None
+
+def test_bad_archived_copy_is_fetched_again(block_server):
+    import chain_archive
+    import P2P
+
+    block_data, serialization = block_server.block(f"{10:064x}")
+    block_hash = block_data['hash']
+    chain_archive.archive_raw_block(block_hash, serialization[:200])
+    assert P2P.get_raw_block_info(block_hash).header['hash'] == block_hash
+    assert chain_archive.get_raw_block(block_hash) == serialization
@@ -0,0 +1,70 @@
+import sqlite3
+import tempfile
+
+import pytest
+
+import report_service
+import report_store
+from report_service import ReportService
+from report_store import write_transaction
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'reports.db')
+
+@pytest.fixture
+def conn(db_path):
+    conn = report_store.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    # Deferred foreign keys are only checked at COMMIT, which lets a test make COMMIT fail
+    conn.execute("CREATE TABLE parents (id INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE children (parent_id INTEGER REFERENCES parents(id) DEFERRABLE INITIALLY DEFERRED)")
+    yield conn
+    conn.close()
+
+def test_write_transaction_commits(conn):
+    with write_transaction(conn):
+        conn.execute("INSERT INTO parents (id) VALUES (1)")
+        conn.execute("INSERT INTO children (parent_id) VALUES (1)")
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM children").fetchone()[0] == 1
+
+def test_write_transaction_rolls_back_on_error(conn):
+    with pytest.raises(ValueError):
+        with write_transaction(conn):
+            conn.execute("INSERT INTO parents (id) VALUES (1)")
+            raise ValueError("boom")
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0] == 0
+
+def test_write_transaction_rolls_back_when_commit_fails(conn):
+    with pytest.raises(sqlite3.IntegrityError):
+        with write_transaction(conn):
+            conn.execute("INSERT INTO parents (id) VALUES (1)")
+            conn.execute("INSERT INTO children (parent_id) VALUES (2)")
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0] == 0
+    with write_transaction(conn):  # The connection is usable again
+        conn.execute("INSERT INTO parents (id) VALUES (1)")
+    assert conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0] == 1
+
+def test_submissions_get_unique_ids_and_notes(db_path):
+    service = ReportService(db_path)
+    try:
+        futures = [service.submit_report_async(f"addr{i}", f"tx{i}", 0.5, "analyst", "suspicious") for i in range(50)]
+        report_ids = [future.result() for future in futures]
+        service.add_note(report_ids[0], "follow-up", "analyst")
+    finally:
+        service.close()
+    assert len(set(report_ids)) == 50
+    conn = report_store.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 50
+        assert conn.execute("SELECT COUNT(*) FROM report_notes").fetchone()[0] == 51
+    finally:
+        conn.close()
+
+def test_load_test_has_no_lost_updates(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    assert report_service.load_test(submitters=4, reports_per_submitter=25, notes_per_report=1, processes=2)
+    assert list(tmp_path.iterdir()) == []  # The scratch database is removed
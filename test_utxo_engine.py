@@ -0,0 +1,104 @@
+import hashlib
+import random
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from utxo_engine import UtxoEngine
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = UtxoEngine(str(tmp_path / 'utxo.db'))
+    yield engine
+    engine.close()
+
+def _payment(tx_hash, address, value, height):
+    # BlockCypher-shaped transaction paying one address
+    return {'hash': tx_hash, 'block_height': height, 'confirmed': '2024-01-01T00:00:00+00:00',
+            'inputs': [], 'outputs': [{'addresses': [address], 'value': value}]}
+
+def test_failed_commit_is_rolled_back(engine, failing_commit):
+    engine.conn = failing_commit(engine.conn)
+    with pytest.raises(sqlite3.OperationalError):
+        engine.ingest_transactions([_payment('aa' * 32, 'addr1', 5000, 100)])
+    assert not engine.conn.in_transaction
+    assert engine._address_ids == {}  # Ids from the rolled-back transaction are forgotten
+    assert engine.balances(['addr1']) == {}
+
+    assert engine.ingest_transactions([_payment('bb' * 32, 'addr2', 700, 101),
+                                       _payment('aa' * 32, 'addr1', 5000, 100)]) == 2
+    assert engine.balance('addr1') == 5000
+    assert engine.balance('addr2') == 700
+
+def _simulated_chain(seed, n_tx=2000, n_addresses=60):
+    # Coinbase and spending transactions over a small address set, spends only of earlier outputs
+    rng = random.Random(seed)
+    addresses = [f"addr{i}" for i in range(n_addresses)]
+    unspent, chain = [], []
+    for i in range(n_tx):
+        height = 100 + i // 10
+        tx = {'hash': hashlib.sha256(f"{seed}-{i}".encode()).hexdigest(), 'tx_index': 10**6 + i,
+              'height': height, 'time': 1600000000 + height * 600, 'inputs': [], 'outputs': []}
+        if i % 10 == 0 or len(unspent) < 2:
+            value = 5000000000
+        else:
+            spent = [unspent.pop(rng.randrange(len(unspent))) for _ in range(rng.randint(1, 2))]
+            tx['inputs'] = spent
+            value = max(0, sum(output[3] for output in spent) - rng.randint(0, 2000))
+        for n in range(rng.randint(1, 3)):
+            output_value = value if n == 2 else rng.randint(0, value)
+            value -= output_value
+            output = (tx, n, rng.choice(addresses), output_value)
+            tx['outputs'].append(output)
+            unspent.append(output)
+        chain.append(tx)
+    return addresses, chain
+
+def _blockcypher_format(tx):
+    return {'hash': tx['hash'], 'block_height': tx['height'],
+            'confirmed': datetime.fromtimestamp(tx['time'], timezone.utc).isoformat(),
+            'inputs': [{'prev_hash': prev['hash'], 'output_index': n, 'addresses': [address], 'output_value': value}
+                       for prev, n, address, value in tx['inputs']],
+            'outputs': [{'addresses': [address], 'value': value} for _, _, address, value in tx['outputs']]}
+
+def _blockchain_info_format(tx):
+    return {'hash': tx['hash'], 'tx_index': tx['tx_index'], 'block_height': tx['height'], 'time': tx['time'],
+            'inputs': [{'prev_out': {'tx_index': prev['tx_index'], 'n': n, 'addr': address, 'value': value}}
+                       for prev, n, address, value in tx['inputs']],
+            'out': [{'n': n, 'addr': address, 'value': value} for _, n, address, value in tx['outputs']]}
+
+def _expected_balances(addresses, chain, height=None):
+    spent_at = {(prev['hash'], n): tx['height'] for tx in chain for prev, n, _, _ in tx['inputs']}
+    balances = dict.fromkeys(addresses, 0)
+    for tx in chain:
+        if height is not None and tx['height'] > height:
+            continue
+        for _, n, address, value in tx['outputs']:
+            spend_height = spent_at.get((tx['hash'], n))
+            if spend_height is None or (height is not None and spend_height > height):
+                balances[address] += value
+    return balances
+
+@pytest.mark.parametrize('to_format', [_blockcypher_format, _blockchain_info_format])
+def test_shuffled_chain_matches_simulation(engine, to_format):
+    addresses, chain = _simulated_chain(seed=7)
+    shuffled = [to_format(tx) for tx in chain]
+    random.Random(1).shuffle(shuffled)
+    for start in range(0, len(shuffled), 150):  # Histories arrive newest first, in pages
+        engine.ingest_transactions(shuffled[start:start + 150])
+
+    current = engine.balances(addresses)
+    assert {address: current.get(address, {}).get('balance', 0) for address in addresses} == \
+        _expected_balances(addresses, chain)
+    n_tx = {address: sum(1 for tx in chain if address in {output[2] for output in tx['inputs'] + tx['outputs']})
+            for address in addresses}
+    assert {address: current.get(address, {}).get('n_tx', 0) for address in addresses} == n_tx
+
+    for height in (100, 150, 199, 250, 299):
+        assert engine.balances_at(addresses, height=height) == _expected_balances(addresses, chain, height)
+        timestamp = 1600000000 + height * 600
+        assert engine.balances_at(addresses, timestamp=timestamp) == _expected_balances(addresses, chain, height)
+
+    assert engine.ingest_transactions(shuffled[:300]) == 0  # Re-ingesting is a no-op
+    assert engine.balances(addresses) == current
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pytest
+
+import blockcypher
+from mock_api import _fake_address, address_history
+from watch_monitor import WatchMonitor, amount_threshold
+
+THRESHOLD = 2.0  # BTC; the mock's transactions total between 0.0001 and 5 BTC
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(blockcypher, 'BACKOFF_BASE', 0.01)
+
+@pytest.fixture
+def monitor(tmp_path):
+    monitor = WatchMonitor({'amount': amount_threshold(THRESHOLD)}, db_path=str(tmp_path / 'monitor.db'),
+                           rate=1000)
+    yield monitor
+    monitor.close()
+
+def _addresses(count):
+    return [_fake_address('watch', i) for i in range(count)]
+
+def _cursor_heights(monitor):
+    return dict(monitor.conn.execute("SELECT address, last_height FROM cursors"))
+
+def _new_transactions(server, addresses):
+    return {address: [tx for tx in address_history(address, server.config) if tx['block_height'] > 850000]
+            for address in addresses}
+
+def test_first_poll_sets_cursors_without_alerts(mock_server, monitor):
+    server = mock_server(txs_per_address=120, latency=0)
+    addresses = _addresses(10)
+    stats = monitor.poll_once(addresses)
+    assert stats.get('failed', 0) == 0
+    assert stats.get('new_transactions', 0) == 0 and stats.get('alerts', 0) == 0
+    assert _cursor_heights(monitor) == {address: 850000 for address in addresses}
+    assert monitor.alerts() == []
+    assert server.request_count == len(addresses)  # History is not paged through without backfill
+
+def test_polls_fetch_only_the_delta(mock_server, monitor):
+    server = mock_server(txs_per_address=120, latency=0)
+    addresses = _addresses(20)
+    monitor.poll_once(addresses)
+
+    server.config['new_blocks'] = 30
+    new_txs = _new_transactions(server, addresses)
+    expected_alerts = {(address, tx['hash']) for address, txs in new_txs.items() for tx in txs
+                       if tx['total'] / 1e8 >= THRESHOLD}
+    requests_before = server.request_count
+    stats = monitor.poll_once(addresses)
+    assert stats['new_transactions'] == sum(len(txs) for txs in new_txs.values())
+    assert server.request_count - requests_before == len(addresses)  # One after= page per address
+    assert _cursor_heights(monitor) == {address: max((tx['block_height'] for tx in new_txs[address]), default=850000)
+                                        for address in addresses}
+    assert stats['alerts'] == len(expected_alerts)
+    assert {(alert['address'], alert['tx_hash']) for alert in monitor.alerts()} == expected_alerts
+
+    # Nothing new: no transactions and no duplicate alerts
+    stats = monitor.poll_once(addresses)
+    assert stats.get('new_transactions', 0) == 0 and stats.get('alerts', 0) == 0
+    assert len(monitor.alerts()) == len(expected_alerts)
+
+    # Further blocks append alerts after the existing ones
+    last_id = monitor.alerts()[-1]['id'] if expected_alerts else 0
+    server.config['new_blocks'] = 60
+    later_alerts = {(address, tx['hash']) for address, txs in _new_transactions(server, addresses).items()
+                    for tx in txs if tx['total'] / 1e8 >= THRESHOLD} - expected_alerts
+    stats = monitor.poll_once(addresses)
+    assert stats['alerts'] == len(later_alerts)
+    assert {(alert['address'], alert['tx_hash']) for alert in monitor.alerts(since_id=last_id)} == later_alerts
+
+def test_backfill_evaluates_full_history(mock_server, tmp_path):
+    server = mock_server(txs_per_address=120, latency=0)
+    addresses = _addresses(5)
+    monitor = WatchMonitor({'amount': amount_threshold(THRESHOLD)}, db_path=str(tmp_path / 'backfill.db'),
+                           rate=1000, backfill=True)
+    try:
+        stats = monitor.poll_once(addresses)
+    finally:
+        alerts = monitor.alerts()
+        monitor.close()
+    histories = {address: address_history(address, server.config) for address in addresses}
+    assert stats['new_transactions'] == sum(len(txs) for txs in histories.values())
+    assert {(alert['address'], alert['tx_hash']) for alert in alerts} == {
+        (address, tx['hash']) for address, txs in histories.items() for tx in txs if tx['total'] / 1e8 >= THRESHOLD}
+
+def test_failed_commit_keeps_cursors_and_recovers(mock_server, monitor, failing_commit):
+    server = mock_server(txs_per_address=50, latency=0)
+    addresses = _addresses(10)
+    monitor.poll_once(addresses)
+    server.config['new_blocks'] = 30
+
+    monitor.conn = failing_commit(monitor.conn)
+    with pytest.raises(sqlite3.OperationalError):
+        monitor.poll_once(addresses)
+    assert not monitor.conn.in_transaction
+    assert _cursor_heights(monitor) == {address: 850000 for address in addresses}  # The delta is retried
+    assert monitor.alerts() == []
+
+    stats = monitor.poll_once(addresses)
+    assert stats['new_transactions'] == sum(len(txs) for txs in _new_transactions(server, addresses).values())
+    assert max(_cursor_heights(monitor).values()) > 850000
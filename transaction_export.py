@@ -0,0 +1,120 @@
+import gzip
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from report_engine import iter_row_chunks
+
+EXPORT_FORMATS = ('csv', 'parquet', 'jsonl')
+DEFAULT_CHUNKSIZE = 100000
+ENCODE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Row filters (module level so they can be sent to job workers)
+def fraudulent_rows(chunk):
+    return chunk[chunk['is_fraudulent'].astype(bool)]
+
+def suspicious_rows(chunk):
+    return chunk[chunk['is_suspicious'].astype(bool)]
+
+def export_filename(stem, fmt, compressed=False):
+    if fmt == 'parquet' or not compressed:
+        return f"{stem}.{fmt}"
+    return f"{stem}.{fmt}.gz"
+
+def _encode_text_chunk(chunk, fmt, include_header):
+    if fmt == 'csv':
+        return chunk.to_csv(index=False, header=include_header).encode()
+    text = chunk.to_json(orient='records', lines=True, date_format='iso')
+    return (text if text.endswith('\n') or not text else text + '\n').encode()
+
+def _selected_chunks(source, row_filter, columns, chunksize):
+    for chunk in iter_row_chunks(source, chunksize):
+        if row_filter is not None:
+            chunk = row_filter(chunk)
+        if columns is not None:
+            chunk = chunk[list(columns)]
+        yield chunk
+
+def ordered_parallel_map(executor, func, items, max_in_flight):
+    """Map func over items on the executor, yielding results in order with bounded look-ahead."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# Stream a filtered selection of rows to CSV, Parquet or JSON Lines
+def export_rows(source, dest, fmt='csv', row_filter=None, columns=None, compression=None,
+                chunksize=DEFAULT_CHUNKSIZE, workers=ENCODE_WORKERS, progress=None):
+    """
+    Export rows chunk by chunk without materializing the whole selection.
+
+    Args:
+        source: DataFrame, CSV path or iterable of DataFrame chunks.
+        dest (str): Output file path.
+        fmt (str): 'csv', 'parquet' or 'jsonl'.
+        row_filter (callable): Applied to every chunk, returns the rows to keep.
+        columns (list): Columns to export (default: all).
+        compression (str): 'gzip' for csv/jsonl; a Parquet codec ('snappy', 'zstd', 'gzip') for parquet.
+        chunksize (int): Rows read from the source at a time.
+        workers (int): Threads encoding chunks in parallel.
+        progress (callable): Called with the number of source rows processed so far.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    source_rows = 0
+    rows_written = 0
+
+    def counted_chunks():
+        nonlocal source_rows
+        for chunk in iter_row_chunks(source, chunksize):
+            source_rows += len(chunk)
+            yield chunk
+
+    chunks = _selected_chunks(counted_chunks(), row_filter, columns, chunksize)
+
+    if fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow).")
+
+        writer = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            tables = ordered_parallel_map(executor, lambda c: pa.Table.from_pandas(c, preserve_index=False), chunks, workers * 2)
+            try:
+                for table in tables:
+                    if writer is None:
+                        writer = pq.ParquetWriter(dest, table.schema, compression=compression or 'none')
+                    writer.write_table(table)
+                    rows_written += table.num_rows
+                    if progress is not None:
+                        progress(source_rows)
+            finally:
+                if writer is not None:
+                    writer.close()
+        if writer is None:
+            pq.write_table(pa.table({}), dest)
+        return rows_written
+
+    if compression not in (None, 'gzip'):
+        raise ValueError(f"Unsupported compression for {fmt}: {compression}")
+
+    opener = gzip.open if compression == 'gzip' else open
+    with opener(dest, 'wb') as output_file, ThreadPoolExecutor(max_workers=workers) as executor:
+        indexed_chunks = ((chunk, index == 0) for index, chunk in enumerate(chunks))
+        encoded = ordered_parallel_map(executor, lambda item: (len(item[0]), _encode_text_chunk(item[0], fmt, item[1])),
+                                        indexed_chunks, workers * 2)
+        for row_count, data in encoded:
+            output_file.write(data)
+            rows_written += row_count
+            if progress is not None:
+                progress(source_rows)
+    return rows_written
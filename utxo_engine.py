@@ -0,0 +1,359 @@
+import sqlite3
+from datetime import datetime
+
+# Local UTXO set and balance store
+UTXO_FILE = 'utxo.db'
+
+COINBASE_PREV_N = 0xFFFFFFFF
+UNCONFIRMED = -1
+INGEST_BATCH_SIZE = 1000
+
+def _parse_time(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+def _txid(tx_hash):
+    return bytes.fromhex(tx_hash)
+
+def _alias(tx_index):
+    # blockchain.info inputs name the spent transaction by tx_index, not hash
+    return b'#' + str(tx_index).encode()
+
+def normalize_transaction(tx, block_height=None, block_time=None):
+    """
+    Bring a BlockCypher or blockchain.info transaction into one shape.
+
+    Returns:
+        dict: txid (bytes), alias (bytes or None), height, time, inputs as
+            (prev_ref, prev_n, address, value) and outputs as (n, address, value).
+            Unknown input addresses/values are None; coinbase inputs are dropped.
+    """
+    if 'out' in tx:  # blockchain.info
+        height = tx.get('block_height', block_height)
+        inputs = []
+        for tx_input in tx.get('inputs', []):
+            prev_out = tx_input.get('prev_out')
+            if not prev_out or prev_out.get('n') == COINBASE_PREV_N or 'tx_index' not in prev_out:
+                continue
+            inputs.append((_alias(prev_out['tx_index']), prev_out['n'], prev_out.get('addr'), prev_out.get('value')))
+        outputs = [(tx_output.get('n', n), tx_output.get('addr'), tx_output.get('value', 0))
+                   for n, tx_output in enumerate(tx.get('out', []))]
+        alias = _alias(tx['tx_index']) if 'tx_index' in tx else None
+        tx_time = tx.get('time', block_time)
+    else:  # BlockCypher
+        height = tx.get('block_height', block_height)
+        inputs = []
+        for tx_input in tx.get('inputs', []):
+            if 'prev_hash' not in tx_input or tx_input.get('output_index', -1) < 0:
+                continue
+            addresses = tx_input.get('addresses') or [None]
+            inputs.append((_txid(tx_input['prev_hash']), tx_input['output_index'], addresses[0], tx_input.get('output_value')))
+        outputs = [(n, (tx_output.get('addresses') or [None])[0], tx_output.get('value', 0))
+                   for n, tx_output in enumerate(tx.get('outputs', []))]
+        alias = None
+        tx_time = _parse_time(tx.get('confirmed') or tx.get('received') or block_time)
+
+    if height is None:
+        height = UNCONFIRMED
+    return {'txid': _txid(tx['hash']), 'alias': alias, 'height': height, 'time': _parse_time(tx_time),
+            'inputs': inputs, 'outputs': outputs}
+
+def connect(db_path=UTXO_FILE):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 30000")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS addresses (
+                    id INTEGER PRIMARY KEY,
+                    address TEXT UNIQUE)""")
+    # Every output ever seen. Spent outputs stay (with spent_height) for point-in-time queries;
+    # the UTXO set is the rows with spent_by IS NULL.
+    conn.execute("""CREATE TABLE IF NOT EXISTS outputs (
+                    tx_ref BLOB,
+                    n INTEGER,
+                    address_id INTEGER,
+                    value INTEGER,
+                    height INTEGER,
+                    time INTEGER,
+                    spent_by BLOB,
+                    spent_height INTEGER,
+                    spent_time INTEGER,
+                    PRIMARY KEY (tx_ref, n)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS balances (
+                    address_id INTEGER PRIMARY KEY,
+                    balance INTEGER DEFAULT 0,
+                    received INTEGER DEFAULT 0,
+                    sent INTEGER DEFAULT 0,
+                    n_tx INTEGER DEFAULT 0,
+                    utxo_count INTEGER DEFAULT 0,
+                    last_height INTEGER DEFAULT -1)""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS tx_aliases (
+                    alias BLOB PRIMARY KEY,
+                    txid BLOB) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS ingested (
+                    txid BLOB PRIMARY KEY,
+                    height INTEGER) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outputs_address ON outputs(address_id)")
+    return conn
+
+class UtxoEngine:
+    """
+    Builds a UTXO set and per-address balances from ingested transactions.
+
+    Transactions can arrive in any order (address histories come newest first):
+    spending an output that hasn't been seen yet records it from the input's data
+    and the funding transaction fills in the rest later. Re-ingesting a transaction
+    is a no-op, except that a confirmation updates the heights of its outputs and
+    spends. Balances are updated incrementally per transaction batch, so current
+    balances are a primary-key lookup; point-in-time balances are computed from
+    the outputs' creation and spend heights.
+
+    Balances are exact for addresses whose full history has been ingested.
+    """
+
+    def __init__(self, db_path=UTXO_FILE):
+        self.conn = connect(db_path)
+        self._address_ids = {}
+
+    def _address_id(self, address):
+        if address is None:
+            return None
+        address_id = self._address_ids.get(address)
+        if address_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO addresses (address) VALUES (?)", (address,))
+            address_id = self.conn.execute("SELECT id FROM addresses WHERE address = ?", (address,)).fetchone()[0]
+            self._address_ids[address] = address_id
+        return address_id
+
+    def _confirm(self, tx):
+        self.conn.execute("UPDATE outputs SET height = ?, time = COALESCE(?, time) WHERE tx_ref = ?",
+                          (tx['height'], tx['time'], tx['txid']))
+        self.conn.execute("UPDATE outputs SET spent_height = ?, spent_time = COALESCE(?, spent_time) WHERE spent_by = ?",
+                          (tx['height'], tx['time'], tx['txid']))
+        self.conn.execute("UPDATE ingested SET height = ? WHERE txid = ?", (tx['height'], tx['txid']))
+        self.conn.execute("""UPDATE balances SET last_height = MAX(last_height, ?) WHERE address_id IN
+                               (SELECT address_id FROM outputs WHERE tx_ref = ? OR spent_by = ?)""",
+                          (tx['height'], tx['txid'], tx['txid']))
+
+    def _apply(self, tx, deltas):
+        conn = self.conn
+        txid, height, tx_time = tx['txid'], tx['height'], tx['time']
+        touched = set()
+
+        def delta(address_id):
+            return deltas.setdefault(address_id, [0, 0, 0, 0, 0, UNCONFIRMED])  # balance, received, sent, n_tx, utxos, height
+
+        if tx['alias'] is not None:
+            # Placeholders created from blockchain.info inputs now get the real hash
+            conn.execute("INSERT OR REPLACE INTO tx_aliases (alias, txid) VALUES (?, ?)", (tx['alias'], txid))
+            conn.execute("UPDATE outputs SET tx_ref = ? WHERE tx_ref = ?", (txid, tx['alias']))
+
+        for n, address, value in tx['outputs']:
+            address_id = self._address_id(address)
+            row = conn.execute("SELECT address_id, spent_by FROM outputs WHERE tx_ref = ? AND n = ?", (txid, n)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO outputs (tx_ref, n, address_id, value, height, time) VALUES (?, ?, ?, ?, ?, ?)",
+                             (txid, n, address_id, value, height, tx_time))
+                if address_id is not None:
+                    entry = delta(address_id)
+                    entry[0] += value
+                    entry[1] += value
+                    entry[4] += 1
+            else:
+                # Already spent by a transaction ingested earlier
+                conn.execute("UPDATE outputs SET address_id = ?, value = ?, height = ?, time = ? WHERE tx_ref = ? AND n = ?",
+                             (address_id, value, height, tx_time, txid, n))
+                if address_id is not None:
+                    entry = delta(address_id)
+                    entry[1] += value
+                    if row[0] is None:
+                        entry[2] += value  # The spend couldn't be attributed until now
+                    else:
+                        entry[0] += value
+            if address_id is not None:
+                touched.add(address_id)
+
+        for prev_ref, prev_n, address, value in tx['inputs']:
+            if prev_ref[:1] == b'#':
+                resolved = conn.execute("SELECT txid FROM tx_aliases WHERE alias = ?", (prev_ref,)).fetchone()
+                prev_ref = resolved[0] if resolved is not None else prev_ref
+            row = conn.execute("SELECT address_id, value, spent_by FROM outputs WHERE tx_ref = ? AND n = ?",
+                               (prev_ref, prev_n)).fetchone()
+            if row is None:
+                address_id = self._address_id(address)
+                conn.execute("""INSERT INTO outputs (tx_ref, n, address_id, value, spent_by, spent_height, spent_time)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                             (prev_ref, prev_n, address_id, value, txid, height, tx_time))
+                if address_id is not None and value is not None:
+                    entry = delta(address_id)
+                    entry[0] -= value
+                    entry[2] += value
+            elif row[2] is None:
+                address_id = row[0]
+                conn.execute("UPDATE outputs SET spent_by = ?, spent_height = ?, spent_time = ? WHERE tx_ref = ? AND n = ?",
+                             (txid, height, tx_time, prev_ref, prev_n))
+                if address_id is not None:
+                    entry = delta(address_id)
+                    entry[0] -= row[1]
+                    entry[2] += row[1]
+                    entry[4] -= 1
+            else:
+                continue
+            if address_id is not None:
+                touched.add(address_id)
+
+        for address_id in touched:
+            entry = delta(address_id)
+            entry[3] += 1
+            entry[5] = max(entry[5], height)
+
+    # Ingest transactions (BlockCypher or blockchain.info format)
+    def ingest_transactions(self, transactions, block_height=None, block_time=None):
+        """
+        Add transactions to the UTXO set and update the balances they touch, in one
+        database transaction.
+
+        Returns:
+            int: Number of transactions that were new.
+        """
+        conn = self.conn
+        deltas = {}
+        added = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for tx in transactions:
+                tx = tx if isinstance(tx, dict) and 'txid' in tx else normalize_transaction(tx, block_height, block_time)
+                known = conn.execute("SELECT height FROM ingested WHERE txid = ?", (tx['txid'],)).fetchone()
+                if known is not None:
+                    if known[0] == UNCONFIRMED and tx['height'] != UNCONFIRMED:
+                        self._confirm(tx)
+                    continue
+                self._apply(tx, deltas)
+                conn.execute("INSERT INTO ingested (txid, height) VALUES (?, ?)", (tx['txid'], tx['height']))
+                added += 1
+
+            conn.executemany("""INSERT INTO balances (address_id, balance, received, sent, n_tx, utxo_count, last_height)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)
+                                ON CONFLICT(address_id) DO UPDATE SET
+                                    balance = balance + excluded.balance,
+                                    received = received + excluded.received,
+                                    sent = sent + excluded.sent,
+                                    n_tx = n_tx + excluded.n_tx,
+                                    utxo_count = utxo_count + excluded.utxo_count,
+                                    last_height = MAX(last_height, excluded.last_height)""",
+                             [(address_id, *entry) for address_id, entry in deltas.items()])
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:  # Also after a failed COMMIT, which leaves the transaction open
+                conn.execute("ROLLBACK")
+            self._address_ids.clear()  # Rolled-back address ids may be reused
+            raise
+        return added
+
+    def ingesting(self, transactions, batch_size=INGEST_BATCH_SIZE):
+        """
+        Yield transactions unchanged while ingesting them in batches, so a streaming
+        loop over an address history fills the UTXO set as it goes.
+        """
+        batch = []
+        for tx in transactions:
+            batch.append(tx)
+            if len(batch) >= batch_size:
+                self.ingest_transactions(batch)
+                batch = []
+            yield tx
+        if batch:
+            self.ingest_transactions(batch)
+
+    def ingest_block(self, block):
+        """
+        Ingest a blockchain.info rawblock payload.
+        """
+        return self.ingest_transactions(block.get('tx', []), block.get('height'), block.get('time'))
+
+    def ingest_raw_block(self, raw_block, height=None):
+        """
+        Ingest a raw_block.RawBlock. Its inputs carry no address or value, so spends
+        are attributed from outputs already in the set.
+        """
+        height = raw_block.header['height'] if height is None else height
+        block_time = raw_block.header['time']
+        txids = [row.tobytes()[::-1] for row in raw_block.txid]
+        prev_txids = [bytes.fromhex(prev) for prev in raw_block.prev_txids()]
+        addresses = raw_block.output_addresses()
+        values = raw_block.value.tolist()
+        prev_n = raw_block.prev_n.tolist()
+        input_start = raw_block.input_start.tolist()
+        output_start = raw_block.output_start.tolist()
+
+        transactions = []
+        for position, txid in enumerate(txids):
+            inputs = [(prev_txids[i], prev_n[i], None, None) for i in range(input_start[position], input_start[position + 1])
+                      if prev_n[i] != COINBASE_PREV_N]
+            outputs = [(i - output_start[position], addresses[i], values[i])
+                       for i in range(output_start[position], output_start[position + 1])]
+            transactions.append({'txid': txid, 'alias': None, 'height': height, 'time': block_time,
+                                 'inputs': inputs, 'outputs': outputs})
+        return self.ingest_transactions(transactions)
+
+    # Queries (no API calls)
+    def _with_query_addresses(self, addresses):
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_addresses (address TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM query_addresses")
+        self.conn.executemany("INSERT OR IGNORE INTO query_addresses (address) VALUES (?)", ((a,) for a in addresses))
+
+    def balances(self, addresses):
+        """
+        Current balances (including unconfirmed transactions), like BlockCypher's final_balance.
+
+        Returns:
+            dict: Address -> {'balance', 'received', 'sent', 'n_tx', 'utxo_count', 'last_height'} (satoshis).
+                Addresses never seen are omitted.
+        """
+        self._with_query_addresses(addresses)
+        rows = self.conn.execute("""SELECT a.address, b.balance, b.received, b.sent, b.n_tx, b.utxo_count, b.last_height
+                                    FROM query_addresses q JOIN addresses a ON a.address = q.address
+                                    JOIN balances b ON b.address_id = a.id""")
+        return {row[0]: dict(zip(('balance', 'received', 'sent', 'n_tx', 'utxo_count', 'last_height'), row[1:]))
+                for row in rows}
+
+    def balance(self, address):
+        return self.balances([address]).get(address, {}).get('balance', 0)
+
+    def balances_at(self, addresses, height=None, timestamp=None):
+        """
+        Confirmed balances as of a block height or a Unix timestamp (inclusive).
+
+        Returns:
+            dict: Address -> balance in satoshis (0 for addresses with no outputs by then).
+        """
+        if (height is None) == (timestamp is None):
+            raise ValueError("Pass exactly one of height or timestamp.")
+        created, spent, point = ('height', 'spent_height', height) if height is not None else ('time', 'spent_time', timestamp)
+
+        self._with_query_addresses(addresses)
+        # Outputs whose creation is unknown existed no later than their spend
+        rows = self.conn.execute(f"""
+            SELECT a.address, COALESCE(SUM(o.value), 0)
+            FROM query_addresses q JOIN addresses a ON a.address = q.address
+            JOIN outputs o ON o.address_id = a.id
+            WHERE (o.height IS NULL OR o.height != {UNCONFIRMED})
+              AND COALESCE(o.{created}, o.{spent}) <= :point
+              AND (o.spent_by IS NULL OR o.spent_height = {UNCONFIRMED} OR o.{spent} > :point)
+            GROUP BY a.address""", {'point': point})
+        result = dict.fromkeys(addresses, 0)
+        result.update(rows)
+        return result
+
+    def utxos(self, address):
+        """
+        Unspent outputs of an address as (txid hex, n, value, height) tuples.
+        """
+        rows = self.conn.execute("""SELECT o.tx_ref, o.n, o.value, o.height FROM outputs o JOIN addresses a ON a.id = o.address_id
+                                    WHERE a.address = ? AND o.spent_by IS NULL ORDER BY o.height""", (address,))
+        return [(tx_ref.hex(), n, value, height) for tx_ref, n, value, height in rows]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,260 @@
+import argparse
+import sqlite3
+import time
+
+from blockcypher import DEFAULT_CONCURRENCY, DEFAULT_RATE, fetch_addresses, iter_address_transactions
+
+# Cursor and alert store for the watchlist monitor
+MONITOR_FILE = 'watch_monitor.db'
+
+POLL_INTERVAL = 60  # Seconds between polling cycles
+POLL_BATCH_SIZE = 1000  # Addresses fetched (and committed) together
+
+SATOSHI = 1e8
+
+# Alert rules: callables taking (address, tx) and returning a reason string or None
+def amount_threshold(threshold_amount=0.5):
+    def rule(address, tx):
+        total_amount = tx['total'] / SATOSHI
+        if total_amount >= threshold_amount:
+            return f"Amount {total_amount:.8f} BTC >= {threshold_amount} BTC"
+    return rule
+
+def fee_threshold(threshold_fee=0.001):
+    def rule(address, tx):
+        fee_amount = tx.get('fee', 0) / SATOSHI
+        if fee_amount >= threshold_fee:
+            return f"Fee {fee_amount:.8f} BTC >= {threshold_fee} BTC"
+    return rule
+
+def large_outflow(threshold_amount=1.0):
+    def rule(address, tx):
+        spent = sum(tx_input.get('output_value', 0) for tx_input in tx.get('inputs', [])
+                    if address in (tx_input.get('addresses') or []))
+        if spent / SATOSHI >= threshold_amount:
+            return f"Address spent {spent / SATOSHI:.8f} BTC >= {threshold_amount} BTC"
+    return rule
+
+def default_rules(threshold_amount=0.5):
+    return {'amount': amount_threshold(threshold_amount)}
+
+def connect(db_path=MONITOR_FILE):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 30000")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS cursors (
+                    address TEXT PRIMARY KEY,
+                    last_height INTEGER,
+                    last_tx_hash TEXT,
+                    last_polled REAL,
+                    tx_seen INTEGER DEFAULT 0)""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    address TEXT,
+                    tx_hash TEXT,
+                    rule TEXT,
+                    reason TEXT,
+                    total_amount REAL,
+                    fee_amount REAL,
+                    block_height INTEGER,
+                    time TEXT,
+                    created_at REAL,
+                    UNIQUE (address, tx_hash, rule))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_address ON alerts(address)")
+    return conn
+
+class WatchMonitor:
+    """
+    Polls a watchlist for new activity using a persisted per-address cursor.
+
+    Every address keeps the height and hash of the newest confirmed transaction seen.
+    Polls request only transactions above that height (BlockCypher's after= parameter),
+    so the cost of a cycle grows with new activity rather than with history length.
+    Rules run on the delta only; alerts are appended to the store, and the unique
+    (address, tx_hash, rule) key keeps an unconfirmed transaction from alerting again
+    once it confirms.
+    """
+
+    def __init__(self, rules=None, db_path=MONITOR_FILE, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                 batch_size=POLL_BATCH_SIZE, backfill=False):
+        """
+        Args:
+            rules (dict): Rule name -> rule callable (default: 0.5 BTC amount threshold).
+            db_path (str): SQLite file holding cursors and alerts.
+            concurrency (int): Maximum requests in flight.
+            rate (float): Maximum requests per second.
+            batch_size (int): Addresses polled per batch.
+            backfill (bool): Run the rules over the full history of newly added addresses;
+                otherwise they start from their current newest transaction.
+        """
+        self.rules = rules if rules is not None else default_rules()
+        self.conn = connect(db_path)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.batch_size = batch_size
+        self.backfill = backfill
+
+    def _cursors(self, addresses):
+        cursors = {}
+        for start in range(0, len(addresses), 900):  # Stay below SQLite's bound-parameter limit
+            batch = addresses[start:start + 900]
+            placeholders = ','.join('?' * len(batch))
+            cursors.update((address, height) for address, height in self.conn.execute(
+                f"SELECT address, last_height FROM cursors WHERE address IN ({placeholders})", batch))
+        return cursors
+
+    def _evaluate(self, address, tx):
+        alerts = []
+        for name, rule in self.rules.items():
+            reason = rule(address, tx)
+            if reason:
+                alerts.append((address, tx['hash'], name, reason, tx['total'] / SATOSHI, tx.get('fee', 0) / SATOSHI,
+                               tx.get('block_height', -1), tx.get('received'), time.time()))
+        return alerts
+
+    def _poll_batch(self, addresses, stats):
+        cursors = self._cursors(addresses)
+        params_by_address = {address: {'after': cursors[address]} for address in addresses
+                             if cursors.get(address) is not None}
+        fetched = fetch_addresses(addresses, self.concurrency, self.rate, params_by_address, stats=stats,
+                                  use_cache=False)
+
+        now = time.time()
+        alerts, cursor_rows = [], []
+        for address in addresses:
+            data = fetched[address]
+            if 'error' in data:
+                print(f"Error fetching data for {address}: {data['error']}")
+                stats['failed'] = stats.get('failed', 0) + 1
+                continue
+
+            known = address in cursors
+            after = cursors.get(address)
+            evaluate = known or self.backfill
+            newest, seen, history = (after, None), 0, {}
+            first_page = data if evaluate else {key: value for key, value in data.items() if key != 'hasMore'}
+
+            for tx in iter_address_transactions(address, summary=history, first_page=first_page, after=after):
+                seen += 1
+                height = tx.get('block_height', -1)
+                if height >= 0 and (newest[0] is None or height > newest[0]):
+                    newest = (height, tx['hash'])
+                if evaluate:
+                    alerts.extend(self._evaluate(address, tx))
+
+            if 'error' in history:
+                # Keep the old cursor so the missed range is retried next cycle
+                print(f"Error fetching history for {address}: {history['error']} (will retry)")
+                stats['failed'] = stats.get('failed', 0) + 1
+                continue
+            cursor_rows.append((address, newest[0], newest[1], now, seen))
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany("""INSERT OR IGNORE INTO alerts (address, tx_hash, rule, reason, total_amount,
+                                     fee_amount, block_height, time, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                                  alerts)
+            new_alerts = self.conn.total_changes - before
+            self.conn.executemany("""INSERT INTO cursors (address, last_height, last_tx_hash, last_polled, tx_seen)
+                                     VALUES (?, ?, ?, ?, ?)
+                                     ON CONFLICT(address) DO UPDATE SET
+                                         last_height = COALESCE(excluded.last_height, last_height),
+                                         last_tx_hash = COALESCE(excluded.last_tx_hash, last_tx_hash),
+                                         last_polled = excluded.last_polled,
+                                         tx_seen = tx_seen + excluded.tx_seen""", cursor_rows)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            if self.conn.in_transaction:  # A failed COMMIT would otherwise break every later poll
+                self.conn.execute("ROLLBACK")
+            raise
+
+        stats['new_transactions'] = stats.get('new_transactions', 0) + sum(row[4] for row in cursor_rows
+                                                                             if row[0] in cursors or self.backfill)
+        stats['alerts'] = stats.get('alerts', 0) + new_alerts
+
+    # One polling cycle over the whole watchlist
+    def poll_once(self, addresses):
+        """
+        Fetch new activity for every address, apply the rules and advance the cursors.
+
+        Returns:
+            dict: Cycle statistics ('new_transactions', 'alerts', 'failed', 'retries', ...).
+        """
+        addresses = list(dict.fromkeys(addresses))
+        stats = {}
+        for start in range(0, len(addresses), self.batch_size):
+            self._poll_batch(addresses[start:start + self.batch_size], stats)
+        return stats
+
+    def run(self, addresses, interval=POLL_INTERVAL, iterations=None):
+        """
+        Poll the watchlist every `interval` seconds until interrupted (or for `iterations` cycles),
+        printing alerts as they are stored.
+        """
+        last_alert_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM alerts").fetchone()[0]
+        cycle = 0
+        try:
+            while iterations is None or cycle < iterations:
+                started = time.monotonic()
+                stats = self.poll_once(addresses)
+                new_alerts = self.alerts(since_id=last_alert_id)
+                if new_alerts:
+                    last_alert_id = new_alerts[-1]['id']
+                    display_alerts(new_alerts)
+                print(f"Polled {len(addresses)} addresses in {time.monotonic() - started:.1f} s: "
+                      f"{stats.get('new_transactions', 0)} new transactions, {stats.get('alerts', 0)} alerts, "
+                      f"{stats.get('failed', 0)} failed")
+
+                cycle += 1
+                if iterations is None or cycle < iterations:
+                    time.sleep(max(0, interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            print("Monitor stopped.")
+
+    def alerts(self, since_id=0, address=None, limit=None):
+        query = "SELECT * FROM alerts WHERE id > ?"
+        params = [since_id]
+        if address is not None:
+            query += " AND address = ?"
+            params.append(address)
+        query += " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        cursor = self.conn.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def close(self):
+        self.conn.close()
+
+def display_alerts(alerts):
+    print(f"{'Address':<45} {'Transaction Hash':<66} {'Total Amount (BTC)':<20} {'Rule':<10} {'Time'}")
+    print("=" * 170)
+    for alert in alerts:
+        print(f"{alert['address']:<45} {alert['tx_hash']:<66} {alert['total_amount']:<20.8f} {alert['rule']:<10} {alert['time']}")
+
+def load_watchlist(path):
+    with open(path) as watchlist_file:
+        return [line.strip() for line in watchlist_file if line.strip() and not line.startswith('#')]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously monitor a watchlist of Bitcoin addresses.")
+    parser.add_argument('watchlist', help="File with one address per line.")
+    parser.add_argument('--threshold', type=float, default=0.5, help="Amount threshold in BTC.")
+    parser.add_argument('--fee-threshold', type=float, default=None, help="Also alert on fees above this (BTC).")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL)
+    parser.add_argument('--backfill', action='store_true', help="Apply the rules to the history of new addresses.")
+    parser.add_argument('--db', default=MONITOR_FILE)
+    args = parser.parse_args()
+
+    rules = default_rules(args.threshold)
+    if args.fee_threshold is not None:
+        rules['fee'] = fee_threshold(args.fee_threshold)
+
+    monitor = WatchMonitor(rules, db_path=args.db, backfill=args.backfill)
+    try:
+        monitor.run(load_watchlist(args.watchlist), interval=args.interval)
+    finally:
+        monitor.close()